@@ -0,0 +1,115 @@
+"""
+Benchmark del tiempo de arranque en frío del CLI
+
+Mide, en procesos nuevos, el tiempo de pared de `clicode --help` y de
+`clicode chat` (con y sin herramientas) hasta que la sesión termina con
+'/bye', y lista qué dependencias opcionales pesadas (gramáticas de
+tree-sitter, PyMuPDF, PyPDF2, python-docx, NumPy, rapidfuzz, fuzzywuzzy)
+se importaron durante el arranque. Tras la carga perezosa ninguna debería
+aparecer.
+
+Uso:
+    python -m benchmarks.bench_startup [--runs 5]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Módulos opcionales que el arranque no debería importar
+OPTIONAL_MODULES = (
+    "fitz",
+    "pymupdf",
+    "PyPDF2",
+    "docx",
+    "tree_sitter",
+    "tree_sitter_python",
+    "tree_sitter_javascript",
+    "tree_sitter_typescript",
+    "tree_sitter_java",
+    "tree_sitter_cpp",
+    "tree_sitter_c",
+    "tree_sitter_rust",
+    "tree_sitter_go",
+    "numpy",
+    "rapidfuzz",
+    "fuzzywuzzy",
+    "Levenshtein",
+)
+
+# (nombre, argumentos del CLI, entrada estándar)
+SCENARIOS = [
+    ("clicode --help", ["--help"], None),
+    ("clicode chat", ["chat", "--nuevo"], "/bye\n"),
+    ("clicode chat --tools", ["chat", "--nuevo", "--tools"], "/bye\n"),
+]
+
+
+def _run_cli(args, stdin, workdir, importtime=False):
+    """Ejecuta el CLI en un proceso nuevo y retorna (segundos, proceso)"""
+    command = [sys.executable]
+    if importtime:
+        command += ["-X", "importtime"]
+    command += ["-m", "src.cli_coding_agent", *args]
+
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT, PYTHONDONTWRITEBYTECODE="1")
+    start = time.perf_counter()
+    process = subprocess.run(
+        command,
+        input=stdin,
+        capture_output=True,
+        text=True,
+        cwd=workdir,
+        env=env,
+        timeout=120,
+    )
+    return time.perf_counter() - start, process
+
+
+def _imported_optional_modules(importtime_output: str) -> list:
+    """Módulos opcionales que aparecen en la salida de -X importtime"""
+    imported = set()
+    for line in importtime_output.splitlines():
+        if line.startswith("import time:"):
+            name = line.rsplit("|", 1)[-1].strip()
+            if name in OPTIONAL_MODULES:
+                imported.add(name)
+    return sorted(imported)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    # Directorio de trabajo aislado: la base de datos de sesión se crea aquí
+    with tempfile.TemporaryDirectory() as workdir:
+        for name, cli_args, stdin in SCENARIOS:
+            print(f"{name} ({args.runs} ejecuciones)")
+
+            # Una ejecución de calentamiento (caché de bytecode y del sistema)
+            _, process = _run_cli(cli_args, stdin, workdir)
+            if process.returncode != 0:
+                error = (process.stderr or process.stdout).strip().splitlines()
+                print(f"  error (código {process.returncode}): {error[-1:]}\n")
+                continue
+
+            timings = [_run_cli(cli_args, stdin, workdir)[0] for _ in range(args.runs)]
+            print(
+                f"  mediana: {statistics.median(timings) * 1000:8.1f} ms   "
+                f"mín: {min(timings) * 1000:8.1f} ms"
+            )
+
+            _, process = _run_cli(cli_args, stdin, workdir, importtime=True)
+            optional = _imported_optional_modules(process.stderr)
+            print(f"  opcionales importados: {', '.join(optional) or 'ninguno'}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Benchmark del overhead por llamada de los wrappers de herramientas
+
+Compara el coste fijo de ejecutar `read_file` y `list_files` creando un event
+loop nuevo en cada llamada (`asyncio.run`, comportamiento anterior) frente al
+loop persistente compartido del runtime de herramientas.
+
+Uso:
+    python -m benchmarks.bench_tool_overhead [--calls 200]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+from src.cli_coding_agent.agent.tools import list_files_tool, read_file_tool
+from src.cli_coding_agent.agent.tools.runtime import (
+    run_tool_coroutine,
+    shutdown_tool_runtime,
+)
+
+
+def _time_calls(run, tool_instance, calls: int, **kwargs) -> list:
+    """Ejecuta la herramienta `calls` veces y retorna las duraciones en segundos"""
+    timings = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        result = run(tool_instance.execute(**kwargs))
+        timings.append(time.perf_counter() - start)
+        assert result.success, result.error
+    return timings
+
+
+def _report(label: str, timings: list) -> float:
+    """Imprime estadísticas de una serie y retorna la media en microsegundos"""
+    mean_us = statistics.mean(timings) * 1e6
+    p95_us = sorted(timings)[int(len(timings) * 0.95) - 1] * 1e6
+    print(f"  {label:<22} media: {mean_us:9.1f} µs   p95: {p95_us:9.1f} µs")
+    return mean_us
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workspace:
+        file_path = os.path.join(workspace, "sample.py")
+        with open(file_path, "w", encoding="utf-8") as f:
+            f.write("def sample():\n    return 42\n" * 200)
+        for i in range(50):
+            open(os.path.join(workspace, f"file_{i}.txt"), "w").close()
+
+        cases = [
+            ("read_file", read_file_tool, {"path": file_path}),
+            ("list_files", list_files_tool, {"path": workspace}),
+        ]
+
+        for name, tool_instance, kwargs in cases:
+            print(f"{name} ({args.calls} llamadas)")
+            # Calentar ambos caminos para excluir imports y cachés frías
+            _time_calls(asyncio.run, tool_instance, 5, **kwargs)
+            _time_calls(run_tool_coroutine, tool_instance, 5, **kwargs)
+
+            before = _report(
+                "asyncio.run por llamada",
+                _time_calls(asyncio.run, tool_instance, args.calls, **kwargs),
+            )
+            after = _report(
+                "loop persistente",
+                _time_calls(run_tool_coroutine, tool_instance, args.calls, **kwargs),
+            )
+            print(f"  ahorro por llamada: {before - after:9.1f} µs\n")
+
+    shutdown_tool_runtime()
+
+
+if __name__ == "__main__":
+    main()
@@ -14,6 +14,24 @@ class AgentConfigSettings(BaseSettings):
     DB_FILE: str = "database/code_agent.db"
     TABLE_NAME: str = "code_agent"
 
+    # Índice de trigramas para search_files (por defecto junto a DB_FILE); se
+    # construye en segundo plano y search_files no lo usa hasta que está listo
+    SEARCH_INDEX_ENABLED: bool = True
+    SEARCH_INDEX_FILE: Optional[str] = None
+
+    # Embeddings locales para search_workspace_files (modelo solo desde caché local)
+    EMBEDDING_MODEL: Optional[str] = None
+    EMBEDDING_DIMENSIONS: int = 512
+
+    # Caché de definiciones de código (por defecto junto a DB_FILE)
+    DEFINITIONS_CACHE_FILE: Optional[str] = None
+
+    # Caché del texto extraído de PDFs y DOCX (por defecto junto a DB_FILE)
+    DOCUMENT_CACHE_FILE: Optional[str] = None
+
+    # fsync de las escrituras de archivos: "always", "file" o "never"
+    WRITE_FSYNC_POLICY: str = "always"
+
     # Modelo base a utilizar
     ANTHROPIC_MODEL_ID: str = "claude-sonnet-4-20250514"
     OPENROUTER_MODEL_ID: str = "gpt-4.1-mini"
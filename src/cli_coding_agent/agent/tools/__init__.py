@@ -17,6 +17,8 @@ from .search_operations import (
     search_files_tool,
     file_search_tool,
     search_workspace_files_tool,
+    find_definition_tool,
+    find_references_tool,
 )
 
 # Importar herramientas de comandos
@@ -32,6 +34,9 @@ from .system_operations import (
 # Importar clase base y registro
 from .base import ToolRegistry, BaseTool, ToolResult, ToolType
 
+# Importar runtime compartido (loop persistente de las herramientas)
+from .runtime import tool_runtime, shutdown_tool_runtime
+
 # Crear registro global de herramientas
 tool_registry = ToolRegistry()
 
@@ -46,6 +51,8 @@ tool_registry.register_tool(list_code_definition_names_tool)
 tool_registry.register_tool(search_files_tool)
 tool_registry.register_tool(file_search_tool)
 tool_registry.register_tool(search_workspace_files_tool)
+tool_registry.register_tool(find_definition_tool)
+tool_registry.register_tool(find_references_tool)
 
 # Registrar herramientas de comandos
 tool_registry.register_tool(execute_command_tool)
@@ -66,6 +73,8 @@ __all__ = [
     "search_files_tool",
     "file_search_tool",
     "search_workspace_files_tool",
+    "find_definition_tool",
+    "find_references_tool",
     "execute_command_tool",
     "ask_followup_question_tool",
     "attempt_completion_tool",
@@ -77,6 +86,9 @@ __all__ = [
     "ToolRegistry",
     # Registro global
     "tool_registry",
+    # Runtime compartido
+    "tool_runtime",
+    "shutdown_tool_runtime",
 ]
 
 
@@ -3,8 +3,7 @@ Wrappers con decorador @tool de agno para las herramientas fragmentadas potentes
 Mantiene toda la funcionalidad avanzada pero en formato compatible con agno
 """
 
-import asyncio
-from typing import Optional
+from typing import Dict, List, Optional
 
 from agno.tools import tool
 
@@ -18,18 +17,21 @@ from . import (
     search_files_tool,
     file_search_tool,
     search_workspace_files_tool,
+    find_definition_tool,
+    find_references_tool,
     execute_command_tool,
     ask_followup_question_tool,
     attempt_completion_tool,
     system_status_tool,
 )
+from .runtime import run_tool_coroutine
 
 
 def _run_async_tool(tool_instance, **kwargs):
     """Helper para ejecutar herramientas asíncronas en formato síncrono"""
     try:
-        # Ejecutar la herramienta fragmentada
-        result = asyncio.run(tool_instance.execute(**kwargs))
+        # Ejecutar la herramienta fragmentada en el loop persistente compartido
+        result = run_tool_coroutine(tool_instance.execute(**kwargs))
 
         if result.success:
             # Si el contenido es un dict/list, formatearlo como string
@@ -37,6 +39,9 @@ def _run_async_tool(tool_instance, **kwargs):
                 import json
 
                 return json.dumps(result.content, indent=2, ensure_ascii=False)
+            # El contenido de texto se devuelve tal cual, sin copiarlo
+            if isinstance(result.content, str):
+                return result.content
             return str(result.content)
         else:
             return f"Error: {result.error}"
@@ -64,9 +69,28 @@ def system_status() -> str:
 
 
 @tool(show_result=True)
-def read_file(file_path: str) -> str:
-    """Lee el contenido de un archivo (soporta texto, PDF, DOCX) con análisis avanzado."""
-    return _run_async_tool(read_file_tool, path=file_path)
+def read_file(
+    file_path: str,
+    start_line: Optional[int] = None,
+    end_line: Optional[int] = None,
+    offset: Optional[int] = None,
+    length: Optional[int] = None,
+    start_page: Optional[int] = None,
+    end_page: Optional[int] = None,
+) -> str:
+    """Lee el contenido de un archivo (soporta texto, PDF, DOCX); start_line/end_line, offset/length o start_page/end_page (PDF) leen solo un rango."""
+    kwargs = {"path": file_path}
+    for name, value in (
+        ("start_line", start_line),
+        ("end_line", end_line),
+        ("offset", offset),
+        ("length", length),
+        ("start_page", start_page),
+        ("end_page", end_page),
+    ):
+        if value is not None:
+            kwargs[name] = value
+    return _run_async_tool(read_file_tool, **kwargs)
 
 
 @tool(show_result=True)
@@ -83,6 +107,12 @@ def replace_in_file(file_path: str, old_str: str, new_str: str) -> str:
     )
 
 
+@tool(show_result=True)
+def multi_replace_in_file(file_path: str, edits: List[Dict[str, str]]) -> str:
+    """Aplica varios reemplazos exactos ({'old_str', 'new_str'}) en un archivo con una sola escritura; todos o ninguno."""
+    return _run_async_tool(replace_in_file_tool, path=file_path, edits=edits)
+
+
 @tool(show_result=True)
 def list_files(
     directory_path: str = ".", recursive: bool = False, limit: int = 1000
@@ -104,9 +134,9 @@ def search_files(
     directory_path: str, pattern: str, file_extension: Optional[str] = None
 ) -> str:
     """Busca archivos que contengan un patrón de texto específico."""
-    kwargs = {"path": directory_path, "pattern": pattern}
+    kwargs = {"path": directory_path, "regex": pattern}
     if file_extension:
-        kwargs["file_extension"] = file_extension
+        kwargs["file_pattern"] = f"*.{file_extension.lstrip('.*')}"
     return _run_async_tool(search_files_tool, **kwargs)
 
 
@@ -117,10 +147,38 @@ def file_search(query: str) -> str:
 
 
 @tool(show_result=True)
-def search_workspace_files(query: str, max_results: int = 20) -> str:
-    """Búsqueda avanzada en todo el workspace con indexación inteligente."""
+def search_workspace_files(
+    query: str, max_results: int = 20, mode: str = "content"
+) -> str:
+    """Búsqueda avanzada en todo el workspace por nombre, ruta y contenido (mode='content', 'embedding' o 'name')."""
+    return _run_async_tool(
+        search_workspace_files_tool, query=query, limit=max_results, mode=mode
+    )
+
+
+@tool(show_result=True)
+def find_definition(
+    symbol: str, directory_path: str = ".", max_results: int = 100
+) -> str:
+    """Encuentra dónde se define un símbolo (clase, función, método, tipo) con el índice de símbolos."""
+    return _run_async_tool(
+        find_definition_tool,
+        symbol=symbol,
+        path=directory_path,
+        max_results=max_results,
+    )
+
+
+@tool(show_result=True)
+def find_references(
+    symbol: str, directory_path: str = ".", max_results: int = 100
+) -> str:
+    """Encuentra las líneas que hacen referencia a un símbolo con el índice de símbolos."""
     return _run_async_tool(
-        search_workspace_files_tool, query=query, max_results=max_results
+        find_references_tool,
+        symbol=symbol,
+        path=directory_path,
+        max_results=max_results,
     )
 
 
@@ -168,11 +226,14 @@ ALL_TOOLS = [
     read_file,
     write_to_file,
     replace_in_file,
+    multi_replace_in_file,
     list_files,
     list_code_definitions,
     search_files,
     file_search,
     search_workspace_files,
+    find_definition,
+    find_references,
     execute_command,
     # ask_followup_question,
     attempt_completion,
@@ -0,0 +1,130 @@
+"""
+Escritura atómica y duradera de archivos de texto
+
+El contenido se escribe en un archivo temporal del mismo directorio y se
+sustituye el original con os.replace, de modo que un fallo o un Ctrl-C a
+mitad de la escritura deja el archivo anterior intacto. Se conservan el modo,
+el propietario y el estilo de saltos de línea del archivo existente, y si el
+contenido resultante es idéntico byte a byte no se escribe nada.
+"""
+
+import os
+import stat
+import tempfile
+from dataclasses import dataclass
+from typing import Optional
+
+from ..agent_config import agent_config
+
+# Políticas de fsync: "always" sincroniza el archivo y el directorio (el
+# renombrado sobrevive a un corte de luz), "file" solo el archivo y "never"
+# deja la sincronización al sistema operativo
+FSYNC_POLICIES = ("always", "file", "never")
+
+
+@dataclass(frozen=True)
+class WriteResult:
+    """Resultado de una escritura atómica"""
+
+    path: str
+    size: int
+    created: bool
+    changed: bool
+    newline: str
+
+
+def detect_newline(data: bytes) -> str:
+    """Salto de línea predominante de un contenido ("\\r\\n" o "\\n")"""
+    crlf = data.count(b"\r\n")
+    return "\r\n" if crlf and crlf * 2 >= data.count(b"\n") else "\n"
+
+
+def _current_umask() -> int:
+    """Umask del proceso (solo puede leerse cambiándola)"""
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+
+# Se lee una vez al importar: cambiarla durante una escritura no es seguro
+# con otros hilos creando archivos
+_UMASK = _current_umask()
+
+
+def _fsync_directory(directory: str) -> None:
+    """Sincroniza la entrada de directorio tras el renombrado (solo POSIX)"""
+    if os.name != "posix":
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def write_text_atomic(
+    path: str,
+    content: str,
+    encoding: str = "utf-8",
+    fsync_policy: Optional[str] = None,
+) -> WriteResult:
+    """Escribe `content` en `path` de forma atómica conservando sus atributos"""
+    policy = fsync_policy or agent_config.WRITE_FSYNC_POLICY
+    if policy not in FSYNC_POLICIES:
+        raise ValueError(f"Política de fsync desconocida: {policy}")
+
+    # Escribir sobre el destino real para no sustituir un enlace simbólico
+    target = os.path.realpath(path)
+    directory = os.path.dirname(target)
+
+    try:
+        with open(target, "rb") as f:
+            current_stat = os.fstat(f.fileno())
+            current = f.read()
+    except FileNotFoundError:
+        current_stat, current = None, None
+
+    # Mantener los saltos de línea del archivo si el contenido nuevo usa "\n"
+    newline = detect_newline(current) if current else "\n"
+    if newline == "\r\n" and "\r\n" not in content:
+        content = content.replace("\n", "\r\n")
+    data = content.encode(encoding)
+
+    if current is not None and data == current:
+        return WriteResult(target, len(data), False, False, newline)
+
+    fd, temp_path = tempfile.mkstemp(
+        dir=directory, prefix=f".{os.path.basename(target)}.", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            if current_stat is not None:
+                os.chmod(temp_path, stat.S_IMODE(current_stat.st_mode))
+                if hasattr(os, "chown") and (
+                    current_stat.st_uid != os.getuid()
+                    or current_stat.st_gid != os.getgid()
+                ):
+                    try:
+                        os.chown(temp_path, current_stat.st_uid, current_stat.st_gid)
+                    except PermissionError:
+                        pass
+            else:
+                # mkstemp crea con 0600; un archivo nuevo lleva los permisos normales
+                os.chmod(temp_path, 0o666 & ~_UMASK)
+            if policy != "never":
+                os.fsync(f.fileno())
+
+        os.replace(temp_path, target)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+
+    if policy == "always":
+        _fsync_directory(directory)
+
+    return WriteResult(target, len(data), current is None, True, newline)
@@ -6,6 +6,7 @@ from abc import ABC, abstractmethod
 from typing import Any, Dict, List, Optional, Union, Callable, Tuple
 from dataclasses import dataclass
 from enum import Enum
+import importlib.util
 import os
 from pathlib import Path
 
@@ -200,6 +201,14 @@ class ToolRegistry:
             )
 
 
+def module_available(name: str) -> bool:
+    """Comprueba si un módulo opcional está instalado sin importarlo"""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
 # Decorador para crear herramientas de forma más simple
 def create_tool(
     name: str,
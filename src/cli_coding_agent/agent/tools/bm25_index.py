@@ -0,0 +1,207 @@
+"""
+Índice BM25 del contenido para el ranking de search_workspace_files
+
+Cada archivo de texto se tokeniza en palabras e identificadores (partidos
+también por '_' y camelCase) y se guarda un diccionario de términos y sus
+postings (término -> archivo, frecuencia) en la misma base SQLite que el
+índice de trigramas. Las postings de un término se leen como un rango
+contiguo de la tabla agrupada por término, y la carga útil de cada archivo
+es un array compacto de pares (id de término, frecuencia) que permite
+retirar sus postings al reindexarlo.
+"""
+
+import math
+import re
+import sqlite3
+from array import array
+from collections import Counter
+from typing import Dict, Optional, Tuple
+
+from .content_index import ContentIndex, default_index_path
+from .workspace_index import IndexedFile, WorkspaceIndex
+
+# Parámetros estándar de BM25
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Longitud máxima de un término indexado (descarta hashes y blobs)
+MAX_TERM_LENGTH = 64
+
+_WORD_PATTERN = re.compile(r"[^\W_]+")
+_CAMEL_CASE_PARTS = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+")
+
+
+def tokenize(text: str) -> Counter:
+    """Frecuencia de términos de un texto: palabras en minúsculas y partes camelCase"""
+    counts: Counter = Counter()
+
+    for word, count in Counter(_WORD_PATTERN.findall(text)).items():
+        if len(word) > MAX_TERM_LENGTH:
+            continue
+        lower = word.lower()
+        if len(lower) > 1:
+            counts[lower] += count
+        if not word.islower() and not word.isupper():
+            parts = _CAMEL_CASE_PARTS.findall(word)
+            if len(parts) > 1:
+                for part in parts:
+                    if len(part) > 1:
+                        counts[part.lower()] += count
+
+    return counts
+
+
+class BM25Index(ContentIndex):
+    """Índice BM25 persistente en SQLite"""
+
+    NAME = "bm25"
+    SCHEMA_VERSION = 1
+
+    def __init__(self, db_path: str):
+        super().__init__(db_path)
+        self._term_ids: Optional[Dict[str, int]] = None
+        self._doc_lengths: Optional[Dict[int, int]] = None
+        self._total_length = 0
+
+    def scores(
+        self, workspace_index: WorkspaceIndex, under: str, query: str
+    ) -> Dict[str, float]:
+        """Puntuación BM25 de los archivos bajo `under` que contienen algún término"""
+        with self._lock:
+            self.sync(workspace_index)
+            self._load_statistics()
+
+            document_count = len(self._doc_lengths)
+            if not document_count:
+                return {}
+            average_length = self._total_length / document_count or 1.0
+
+            scores: Dict[int, float] = {}
+            for term in tokenize(query):
+                term_id = self._term_ids.get(term)
+                if term_id is None:
+                    continue
+
+                postings = self._connection.execute(
+                    "SELECT file_id, tf FROM bm25_postings WHERE term_id = ?",
+                    (term_id,),
+                ).fetchall()
+                frequency = len(postings)
+                idf = math.log(
+                    1 + (document_count - frequency + 0.5) / (frequency + 0.5)
+                )
+
+                for file_id, tf in postings:
+                    length = self._doc_lengths.get(file_id, 0)
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * length / average_length)
+                    scores[file_id] = scores.get(file_id, 0.0) + idf * (
+                        tf * (BM25_K1 + 1) / (tf + norm)
+                    )
+
+            paths = self._paths_under(scores, under)
+            return {path: scores[file_id] for file_id, path in paths.items()}
+
+    def _reset_state(self) -> None:
+        super()._reset_state()
+        self._term_ids = None
+        self._doc_lengths = None
+        self._total_length = 0
+
+    def _table_names(self) -> Tuple[str, ...]:
+        return ("bm25_postings", "bm25_terms", "bm25_docs")
+
+    def _create_tables(self, connection: sqlite3.Connection) -> None:
+        connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS bm25_terms (
+                id INTEGER PRIMARY KEY,
+                term TEXT UNIQUE NOT NULL
+            )
+            """
+        )
+        connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS bm25_postings (
+                term_id INTEGER NOT NULL,
+                file_id INTEGER NOT NULL,
+                tf INTEGER NOT NULL,
+                PRIMARY KEY (term_id, file_id)
+            ) WITHOUT ROWID
+            """
+        )
+        connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS bm25_docs (
+                file_id INTEGER PRIMARY KEY,
+                length INTEGER NOT NULL
+            )
+            """
+        )
+
+    def _load_statistics(self) -> None:
+        """Carga el diccionario de términos y las longitudes de documento"""
+        connection = self._connect()
+        if self._term_ids is None:
+            self._term_ids = dict(connection.execute("SELECT term, id FROM bm25_terms"))
+        if self._doc_lengths is None:
+            self._doc_lengths = dict(
+                connection.execute("SELECT file_id, length FROM bm25_docs")
+            )
+            self._total_length = sum(self._doc_lengths.values())
+
+    def _build_payload(self, entry: IndexedFile, data: bytes) -> bytes:
+        """Pares (id de término, frecuencia) del archivo como array de uint32"""
+        self._load_statistics()
+        counts = tokenize(data.decode("utf-8", errors="ignore"))
+
+        payload = array("I")
+        for term, tf in counts.items():
+            term_id = self._term_ids.get(term)
+            if term_id is None:
+                term_id = self._connection.execute(
+                    "INSERT INTO bm25_terms (term) VALUES (?)", (term,)
+                ).lastrowid
+                self._term_ids[term] = term_id
+            payload.append(term_id)
+            payload.append(tf)
+        return payload.tobytes()
+
+    def _apply_payload(
+        self,
+        connection: sqlite3.Connection,
+        file_id: int,
+        old_payload: Optional[bytes],
+        new_payload: Optional[bytes],
+    ) -> None:
+        """Sustituye las postings y la longitud de documento de un archivo"""
+        self._load_statistics()
+
+        if old_payload is not None:
+            old_terms = array("I", old_payload)
+            connection.executemany(
+                "DELETE FROM bm25_postings WHERE term_id = ? AND file_id = ?",
+                ((term_id, file_id) for term_id in old_terms[::2]),
+            )
+            connection.execute("DELETE FROM bm25_docs WHERE file_id = ?", (file_id,))
+            self._total_length -= self._doc_lengths.pop(file_id, 0)
+
+        if new_payload is not None:
+            new_terms = array("I", new_payload)
+            connection.executemany(
+                "INSERT INTO bm25_postings (term_id, file_id, tf) VALUES (?, ?, ?)",
+                (
+                    (term_id, file_id, tf)
+                    for term_id, tf in zip(new_terms[::2], new_terms[1::2])
+                ),
+            )
+            length = sum(new_terms[1::2])
+            connection.execute(
+                "INSERT INTO bm25_docs (file_id, length) VALUES (?, ?)",
+                (file_id, length),
+            )
+            self._doc_lengths[file_id] = length
+            self._total_length += length
+
+
+# Índice compartido por la búsqueda del workspace
+bm25_index = BM25Index(default_index_path())
@@ -0,0 +1,90 @@
+"""
+Caché en memoria del contenido decodificado de los archivos leídos
+
+Las entradas se guardan por (ruta absoluta, mtime_ns, tamaño): si el stat
+del archivo no cambió, read_file devuelve el texto ya decodificado sin ir a
+disco. La caché es LRU y está acotada por el tamaño en memoria de los textos,
+no por el número de entradas. Las herramientas de escritura invalidan la
+ruta al modificarla.
+"""
+
+import os
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+# Memoria máxima ocupada por los textos cacheados
+CONTENT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+
+class ContentCache:
+    """LRU de contenidos decodificados acotada en bytes"""
+
+    def __init__(self, max_bytes: int = CONTENT_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        # ruta -> (mtime_ns, tamaño, texto, bytes ocupados)
+        self._entries: "OrderedDict[str, Tuple[int, int, str, int]]" = OrderedDict()
+        self._total_bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, path: str, stat: os.stat_result) -> Optional[str]:
+        """Texto cacheado de la ruta si su stat no cambió, o None"""
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None or entry[:2] != (stat.st_mtime_ns, stat.st_size):
+                self._misses += 1
+                return None
+            self._entries.move_to_end(path)
+            self._hits += 1
+            return entry[2]
+
+    def put(self, path: str, stat: os.stat_result, content: str) -> None:
+        """Guarda el texto de la ruta, descartando los menos usados si no cabe"""
+        size = sys.getsizeof(content)
+        with self._lock:
+            self._discard(path)
+            if size > self.max_bytes:
+                return
+            self._entries[path] = (stat.st_mtime_ns, stat.st_size, content, size)
+            self._total_bytes += size
+            while self._total_bytes > self.max_bytes:
+                _, (_, _, _, evicted) = self._entries.popitem(last=False)
+                self._total_bytes -= evicted
+
+    def invalidate(self, path: str) -> None:
+        """Descarta la entrada de una ruta (tras escribir en ella)"""
+        with self._lock:
+            self._discard(path)
+
+    def clear(self) -> None:
+        """Vacía la caché y reinicia las estadísticas"""
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+            self._hits = 0
+            self._misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Aciertos, fallos y ocupación de la caché"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def _discard(self, path: str) -> None:
+        entry = self._entries.pop(path, None)
+        if entry is not None:
+            self._total_bytes -= entry[3]
+
+
+# Caché compartida por read_file y las herramientas de escritura
+content_cache = ContentCache()
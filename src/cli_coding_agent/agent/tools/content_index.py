@@ -0,0 +1,346 @@
+"""
+Base común de los índices de contenido persistentes
+
+Los índices de contenido (trigramas para search_files, BM25 para
+search_workspace_files) comparten la misma mecánica: una tabla de archivos
+en SQLite con su (mtime, tamaño) y una carga útil serializada por archivo,
+sincronizada de forma incremental con el índice de archivos del workspace.
+Cada subclase decide qué extrae del contenido y cómo mantiene sus postings.
+
+La primera sincronización de una raíz lee todos sus archivos, así que se
+hace en un hilo de fondo: hasta que termina, las herramientas responden con
+su camino sin índice en lugar de esperar a que se construya.
+"""
+
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from ..agent_config import agent_config
+from .file_classifier import SNIFF_BLOCK_SIZE, file_classifier, is_binary_block
+from .workspace_index import IndexedFile, WorkspaceIndex
+
+# Archivos indexados por transacción durante la sincronización
+SYNC_BATCH_SIZE = 256
+
+
+def read_indexable_bytes(entry: IndexedFile) -> Optional[bytes]:
+    """Contenido de un archivo a indexar, o None si es binario, enorme o ilegible"""
+    if entry.size > file_classifier.max_file_size:
+        return None
+    if file_classifier.precheck(entry.path) is False:
+        return None
+
+    try:
+        with open(entry.path, "rb") as f:
+            head = f.read(SNIFF_BLOCK_SIZE)
+            if is_binary_block(head):
+                return None
+            return head + f.read()
+    except OSError:
+        return None
+
+
+def default_index_path() -> str:
+    """Ruta de los índices: la configurada o junto a la base de datos de sesión"""
+    if agent_config.SEARCH_INDEX_FILE:
+        return agent_config.SEARCH_INDEX_FILE
+    return os.path.join(os.path.dirname(agent_config.DB_FILE), "search_index.db")
+
+
+class ContentIndex(ABC):
+    """Índice persistente de contenido invalidado por archivo según mtime y tamaño
+
+    Las subclases definen NAME (prefijo de sus tablas), SCHEMA_VERSION y los
+    métodos `_create_tables`, `_table_names`, `_build_payload` y
+    `_apply_payload`.
+    """
+
+    NAME = ""
+    SCHEMA_VERSION = 1
+    # Extensiones a indexar (None: todos los archivos de texto)
+    EXTENSIONS: Optional[frozenset] = None
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.RLock()
+        self._connection: Optional[sqlite3.Connection] = None
+        # Ruta -> (id, mtime_ns, tamaño, indexado)
+        self._files: Optional[Dict[str, Tuple[int, int, int, bool]]] = None
+        self._paths_by_id: Dict[int, str] = {}
+        self._synced_generations: Dict[str, int] = {}
+        # Raíces sincronizadas al menos una vez y construcciones en curso
+        self._ready_roots: Set[str] = set()
+        self._builds: Dict[str, threading.Thread] = {}
+        self._builds_lock = threading.Lock()
+
+    @property
+    def files_table(self) -> str:
+        return f"{self.NAME}_files"
+
+    def is_ready(self, workspace_index: WorkspaceIndex) -> bool:
+        """Indica si el índice cubre la raíz; si no, lanza su construcción de fondo
+
+        Una vez construida, las consultas sincronizan solo los cambios. Los
+        errores de la construcción se descartan: la siguiente llamada la
+        vuelve a intentar.
+        """
+        root = workspace_index.root
+        if root in self._ready_roots:
+            return True
+
+        with self._builds_lock:
+            if root not in self._builds:
+                thread = threading.Thread(
+                    target=self._build_in_background,
+                    args=(workspace_index,),
+                    name=f"{self.NAME}-index-build",
+                    daemon=True,
+                )
+                self._builds[root] = thread
+                thread.start()
+        return False
+
+    def wait_until_ready(
+        self, workspace_index: WorkspaceIndex, timeout: Optional[float] = None
+    ) -> bool:
+        """Espera a que termine la construcción de fondo de la raíz"""
+        if not self.is_ready(workspace_index):
+            with self._builds_lock:
+                thread = self._builds.get(workspace_index.root)
+            if thread is not None:
+                thread.join(timeout)
+        return workspace_index.root in self._ready_roots
+
+    def _build_in_background(self, workspace_index: WorkspaceIndex) -> None:
+        """Primera sincronización de una raíz, ejecutada en un hilo daemon"""
+        try:
+            self.sync(workspace_index)
+        except (sqlite3.Error, OSError):
+            pass
+        finally:
+            with self._builds_lock:
+                self._builds.pop(workspace_index.root, None)
+
+    def sync(self, workspace_index: WorkspaceIndex) -> None:
+        """Reindexa los archivos nuevos o modificados y olvida los eliminados"""
+        with self._lock:
+            if workspace_index.watch_mode == "polling":
+                # Sin inotify, las modificaciones en sitio no cambian el mtime
+                # del directorio: comprobar el stat de cada archivo
+                workspace_index.restat_files()
+            else:
+                workspace_index.refresh()
+
+            root = workspace_index.root
+            if self._synced_generations.get(root) == workspace_index.generation:
+                return
+            files = workspace_index.files(include_hidden=True)
+
+            known = self._load_files()
+            prefix = root.rstrip(os.sep) + os.sep
+            current = {entry.path for entry in files}
+
+            removed = [
+                path
+                for path in known
+                if path.startswith(prefix) and path not in current
+            ]
+            changed = [
+                entry
+                for entry in files
+                if known.get(entry.path, (None, None, None))[1:3]
+                != (entry.mtime_ns, entry.size)
+            ]
+
+            connection = self._connect()
+            try:
+                for path in removed:
+                    with connection:
+                        self._remove_file(connection, path)
+                    self._after_commit()
+                for start in range(0, len(changed), SYNC_BATCH_SIZE):
+                    with connection:
+                        for entry in changed[start : start + SYNC_BATCH_SIZE]:
+                            self._index_file(connection, entry)
+                    self._after_commit()
+            except BaseException:
+                # La transacción fallida se deshizo: el estado en memoria ya
+                # no refleja la base de datos y se recarga en la próxima consulta
+                self._reset_state()
+                raise
+
+            if removed:
+                # Un índice anidado o que contiene a este comparte archivos:
+                # debe volver a sincronizarse en su próxima consulta
+                for other_root in list(self._synced_generations):
+                    other_prefix = other_root.rstrip(os.sep) + os.sep
+                    if other_root.startswith(prefix) or root.startswith(other_prefix):
+                        del self._synced_generations[other_root]
+
+            self._synced_generations[root] = workspace_index.generation
+            self._ready_roots.add(root)
+
+    def close(self) -> None:
+        """Cierra la conexión con la base de datos"""
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+            self._reset_state()
+
+    def _reset_state(self) -> None:
+        """Descarta el estado cargado en memoria desde la base de datos"""
+        self._files = None
+        self._paths_by_id.clear()
+        self._synced_generations.clear()
+        self._ready_roots.clear()
+
+    def _paths_under(self, file_ids: Iterable[int], under: str) -> Dict[int, str]:
+        """Filtra ids de archivo a los que cuelgan de `under`"""
+        prefix = os.path.abspath(under).rstrip(os.sep) + os.sep
+        result = {}
+        for file_id in file_ids:
+            path = self._paths_by_id.get(file_id)
+            if path is not None and path.startswith(prefix):
+                result[file_id] = path
+        return result
+
+    def _connect(self) -> sqlite3.Connection:
+        """Abre la base de datos y crea (o migra) el esquema del índice"""
+        if self._connection is not None:
+            return self._connection
+
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        connection = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+
+        with connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS index_meta "
+                "(name TEXT PRIMARY KEY, version INTEGER NOT NULL)"
+            )
+            row = connection.execute(
+                "SELECT version FROM index_meta WHERE name = ?", (self.NAME,)
+            ).fetchone()
+            if row is None or row[0] != self.SCHEMA_VERSION:
+                for table in (*self._table_names(), self.files_table):
+                    connection.execute(f"DROP TABLE IF EXISTS {table}")
+                connection.execute(
+                    "INSERT OR REPLACE INTO index_meta (name, version) VALUES (?, ?)",
+                    (self.NAME, self.SCHEMA_VERSION),
+                )
+
+            connection.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS {self.files_table} (
+                    id INTEGER PRIMARY KEY,
+                    path TEXT UNIQUE NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    size INTEGER NOT NULL,
+                    payload BLOB
+                )
+                """
+            )
+            self._create_tables(connection)
+
+        self._connection = connection
+        return connection
+
+    def _load_files(self) -> Dict[str, Tuple[int, int, int, bool]]:
+        """Carga en memoria la tabla de archivos indexados (una vez por sesión)"""
+        if self._files is None:
+            rows = self._connect().execute(
+                f"SELECT id, path, mtime_ns, size, payload IS NOT NULL "
+                f"FROM {self.files_table}"
+            )
+            self._files = {}
+            for file_id, path, mtime_ns, size, indexed in rows:
+                self._files[path] = (file_id, mtime_ns, size, bool(indexed))
+                self._paths_by_id[file_id] = path
+        return self._files
+
+    def _index_file(self, connection: sqlite3.Connection, entry: IndexedFile) -> None:
+        """Recalcula la carga útil de un archivo y actualiza sus postings"""
+        data = None
+        if self.EXTENSIONS is None or entry.extension in self.EXTENSIONS:
+            data = read_indexable_bytes(entry)
+        payload = self._build_payload(entry, data) if data is not None else None
+        previous = self._files.get(entry.path)
+
+        old_payload = None
+        if previous is not None:
+            file_id = previous[0]
+            row = connection.execute(
+                f"SELECT payload FROM {self.files_table} WHERE id = ?", (file_id,)
+            ).fetchone()
+            old_payload = row[0] if row else None
+            connection.execute(
+                f"UPDATE {self.files_table} "
+                f"SET mtime_ns = ?, size = ?, payload = ? WHERE id = ?",
+                (entry.mtime_ns, entry.size, payload, file_id),
+            )
+        else:
+            file_id = connection.execute(
+                f"INSERT INTO {self.files_table} (path, mtime_ns, size, payload) "
+                f"VALUES (?, ?, ?, ?)",
+                (entry.path, entry.mtime_ns, entry.size, payload),
+            ).lastrowid
+
+        self._apply_payload(connection, file_id, old_payload, payload)
+
+        self._files[entry.path] = (
+            file_id,
+            entry.mtime_ns,
+            entry.size,
+            payload is not None,
+        )
+        self._paths_by_id[file_id] = entry.path
+
+    def _remove_file(self, connection: sqlite3.Connection, path: str) -> None:
+        """Elimina un archivo y sus postings del índice"""
+        file_id = self._files.pop(path)[0]
+        self._paths_by_id.pop(file_id, None)
+
+        row = connection.execute(
+            f"SELECT payload FROM {self.files_table} WHERE id = ?", (file_id,)
+        ).fetchone()
+        self._apply_payload(connection, file_id, row[0] if row else None, None)
+        connection.execute(f"DELETE FROM {self.files_table} WHERE id = ?", (file_id,))
+
+    def _after_commit(self) -> None:
+        """Aplica los cambios fuera de SQLite una vez confirmada la transacción
+
+        Las subclases que guardan datos fuera de la base de datos no deben
+        sobrescribir en la transacción nada que esta aún referencie: si se
+        deshace, la base de datos volvería a apuntar a datos ya modificados.
+        """
+
+    def _table_names(self) -> Tuple[str, ...]:
+        """Tablas propias de la subclase (se eliminan al cambiar de versión)"""
+        return ()
+
+    def _create_tables(self, connection: sqlite3.Connection) -> None:
+        """Crea las tablas propias de la subclase"""
+
+    @abstractmethod
+    def _build_payload(self, entry: IndexedFile, data: bytes) -> bytes:
+        """Serializa lo que el índice extrae del contenido de un archivo"""
+        pass
+
+    @abstractmethod
+    def _apply_payload(
+        self,
+        connection: sqlite3.Connection,
+        file_id: int,
+        old_payload: Optional[bytes],
+        new_payload: Optional[bytes],
+    ) -> None:
+        """Sustituye las postings derivadas de `old_payload` por las de `new_payload`"""
+        pass
@@ -0,0 +1,128 @@
+"""
+Caché persistente de definiciones de código para list_code_definition_names
+
+Guarda en SQLite, junto a la base de datos de sesión, las definiciones
+extraídas de cada archivo con la clave (ruta, mtime, tamaño, hash del
+contenido). Si el stat coincide, las definiciones se sirven sin leer el
+archivo; si solo cambió el stat pero el hash es el mismo (un `touch`, un
+checkout sin cambios), se reutilizan sin volver a parsear.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..agent_config import agent_config
+
+# Versión del formato de las definiciones (invalida la caché al cambiar)
+DEFINITIONS_VERSION = 2
+
+# Fila de la caché: (mtime_ns, tamaño, hash, definiciones)
+CachedDefinitions = Tuple[int, int, str, List[Dict[str, Any]]]
+
+
+def default_cache_path() -> str:
+    """Ruta de la caché: la configurada o junto a la base de datos de sesión"""
+    if agent_config.DEFINITIONS_CACHE_FILE:
+        return agent_config.DEFINITIONS_CACHE_FILE
+    return os.path.join(os.path.dirname(agent_config.DB_FILE), "definitions_cache.db")
+
+
+class DefinitionsCache:
+    """Definiciones por archivo persistidas en SQLite"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+
+    def get(self, path: str) -> Optional[CachedDefinitions]:
+        """Entrada guardada para una ruta absoluta, o None"""
+        with self._lock:
+            row = (
+                self._connect()
+                .execute(
+                    "SELECT mtime_ns, size, content_hash, definitions "
+                    "FROM definitions WHERE path = ?",
+                    (path,),
+                )
+                .fetchone()
+            )
+        if row is None:
+            return None
+        mtime_ns, size, content_hash, definitions = row
+        return mtime_ns, size, content_hash, json.loads(definitions)
+
+    def store(
+        self,
+        path: str,
+        mtime_ns: int,
+        size: int,
+        content_hash: str,
+        definitions: List[Dict[str, Any]],
+    ) -> None:
+        """Guarda (o sustituye) las definiciones de una ruta"""
+        self.store_many([(path, mtime_ns, size, content_hash, definitions)])
+
+    def store_many(
+        self, rows: List[Tuple[str, int, int, str, List[Dict[str, Any]]]]
+    ) -> None:
+        """Guarda varias entradas (ruta, mtime_ns, tamaño, hash, definiciones) a la vez"""
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO definitions "
+                    "(path, mtime_ns, size, content_hash, definitions) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (
+                        (path, mtime_ns, size, content_hash, json.dumps(definitions))
+                        for path, mtime_ns, size, content_hash, definitions in rows
+                    ),
+                )
+
+    def close(self) -> None:
+        """Cierra la conexión con la base de datos"""
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def _connect(self) -> sqlite3.Connection:
+        """Abre la base de datos y descarta la caché si cambió el formato"""
+        if self._connection is not None:
+            return self._connection
+
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        connection = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+
+        with connection:
+            version = connection.execute("PRAGMA user_version").fetchone()[0]
+            if version != DEFINITIONS_VERSION:
+                connection.execute("DROP TABLE IF EXISTS definitions")
+                connection.execute(f"PRAGMA user_version = {DEFINITIONS_VERSION}")
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS definitions (
+                    path TEXT PRIMARY KEY,
+                    mtime_ns INTEGER NOT NULL,
+                    size INTEGER NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    definitions TEXT NOT NULL
+                )
+                """
+            )
+
+        self._connection = connection
+        return connection
+
+
+# Caché compartida por la herramienta de definiciones
+definitions_cache = DefinitionsCache(default_cache_path())
@@ -0,0 +1,304 @@
+"""
+Extracción de texto de PDFs y documentos DOCX fuera del event loop
+
+El parseo con PyMuPDF/PyPDF2 y python-docx es intensivo en CPU, así que se
+ejecuta en un pool de procesos del runtime de herramientas. Los PDFs se
+extraen por lotes de páginas (solo las del rango pedido) y las páginas se
+entregan en orden a medida que terminan. El texto extraído se guarda en una
+caché SQLite con clave el hash del contenido del archivo, de modo que
+releer un documento, aunque se haya copiado o tocado, no vuelve a parsearlo.
+"""
+
+import asyncio
+import functools
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from ..agent_config import agent_config
+from .base import module_available
+from .runtime import tool_runtime
+
+
+# Dependencias opcionales: se detectan sin importarlas y se cargan en el
+# primer uso, para no pagar su importación al arrancar el CLI
+PDF_AVAILABLE = module_available("fitz") and module_available("PyPDF2")
+DOCX_AVAILABLE = module_available("docx")
+
+# Páginas que extrae cada tarea del pool
+PDF_PAGES_PER_TASK = 16
+
+# Versión del formato de la caché (invalida el texto guardado al cambiar)
+DOCUMENT_CACHE_VERSION = 1
+
+
+@functools.lru_cache(maxsize=None)
+def _pdf_modules():
+    """Importa PyMuPDF y PyPDF2 (una sola vez)"""
+    import fitz  # PyMuPDF
+    import PyPDF2
+
+    return fitz, PyPDF2
+
+
+@functools.lru_cache(maxsize=None)
+def _docx_document_class():
+    """Importa python-docx (una sola vez)"""
+    from docx import Document
+
+    return Document
+
+
+def _pdf_page_count(file_path: str) -> int:
+    """Número de páginas de un PDF (se ejecuta en un proceso del pool)"""
+    fitz, PyPDF2 = _pdf_modules()
+    try:
+        with fitz.open(file_path) as doc:
+            return doc.page_count
+    except Exception:
+        with open(file_path, "rb") as f:
+            return len(PyPDF2.PdfReader(f).pages)
+
+
+def _extract_pdf_pages(file_path: str, pages: List[int]) -> List[Tuple[int, str]]:
+    """Texto de las páginas indicadas (desde 1) de un PDF, en un proceso del pool"""
+    fitz, PyPDF2 = _pdf_modules()
+    try:
+        # Intentar con PyMuPDF primero (mejor para texto complejo)
+        with fitz.open(file_path) as doc:
+            return [(page, doc[page - 1].get_text()) for page in pages]
+    except Exception:
+        # Fallback a PyPDF2
+        with open(file_path, "rb") as f:
+            reader = PyPDF2.PdfReader(f)
+            return [(page, reader.pages[page - 1].extract_text()) for page in pages]
+
+
+def _extract_docx_text(file_path: str) -> str:
+    """Texto de los párrafos de un DOCX (se ejecuta en un proceso del pool)"""
+    doc = _docx_document_class()(file_path)
+    return "".join(paragraph.text + "\n" for paragraph in doc.paragraphs)
+
+
+def default_cache_path() -> str:
+    """Ruta de la caché: la configurada o junto a la base de datos de sesión"""
+    if agent_config.DOCUMENT_CACHE_FILE:
+        return agent_config.DOCUMENT_CACHE_FILE
+    return os.path.join(os.path.dirname(agent_config.DB_FILE), "document_cache.db")
+
+
+class DocumentCache:
+    """Texto extraído por página, persistido en SQLite por hash del archivo"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+
+    def page_count(self, content_hash: str) -> Optional[int]:
+        """Número de páginas guardado para un documento, o None"""
+        with self._lock:
+            row = (
+                self._connect()
+                .execute(
+                    "SELECT page_count FROM documents WHERE content_hash = ?",
+                    (content_hash,),
+                )
+                .fetchone()
+            )
+        return row[0] if row else None
+
+    def pages(self, content_hash: str, first: int, last: int) -> Dict[int, str]:
+        """Páginas guardadas del rango [first, last]"""
+        with self._lock:
+            rows = (
+                self._connect()
+                .execute(
+                    "SELECT page, text FROM pages "
+                    "WHERE content_hash = ? AND page BETWEEN ? AND ?",
+                    (content_hash, first, last),
+                )
+                .fetchall()
+            )
+        return dict(rows)
+
+    def store(
+        self,
+        content_hash: str,
+        page_count: int,
+        pages: List[Tuple[int, str]],
+    ) -> None:
+        """Guarda el número de páginas y el texto de algunas de ellas"""
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO documents (content_hash, page_count) "
+                    "VALUES (?, ?)",
+                    (content_hash, page_count),
+                )
+                connection.executemany(
+                    "INSERT OR REPLACE INTO pages (content_hash, page, text) "
+                    "VALUES (?, ?, ?)",
+                    ((content_hash, page, text) for page, text in pages),
+                )
+
+    def close(self) -> None:
+        """Cierra la conexión con la base de datos"""
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def _connect(self) -> sqlite3.Connection:
+        """Abre la base de datos y descarta la caché si cambió el formato"""
+        if self._connection is not None:
+            return self._connection
+
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        connection = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+
+        with connection:
+            version = connection.execute("PRAGMA user_version").fetchone()[0]
+            if version != DOCUMENT_CACHE_VERSION:
+                connection.execute("DROP TABLE IF EXISTS pages")
+                connection.execute("DROP TABLE IF EXISTS documents")
+                connection.execute(f"PRAGMA user_version = {DOCUMENT_CACHE_VERSION}")
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS documents (
+                    content_hash TEXT PRIMARY KEY,
+                    page_count INTEGER NOT NULL
+                )
+                """
+            )
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS pages (
+                    content_hash TEXT NOT NULL,
+                    page INTEGER NOT NULL,
+                    text TEXT NOT NULL,
+                    PRIMARY KEY (content_hash, page)
+                ) WITHOUT ROWID
+                """
+            )
+
+        self._connection = connection
+        return connection
+
+
+class DocumentExtractor:
+    """Extrae PDFs y DOCX en el pool de procesos con caché por hash"""
+
+    def __init__(self, cache: DocumentCache):
+        self.cache = cache
+        # Hashes ya calculados por (ruta, mtime, tamaño) para no releer el archivo
+        self._hashes: "OrderedDict[Tuple[str, int, int], str]" = OrderedDict()
+        self._hashes_lock = threading.Lock()
+
+    async def pdf_page_count(self, file_path: str) -> Tuple[str, int]:
+        """(hash, número de páginas) de un PDF"""
+        content_hash = await asyncio.to_thread(self._file_hash, file_path)
+        page_count = await asyncio.to_thread(self.cache.page_count, content_hash)
+        if page_count is None:
+            page_count = await self._run_in_pool(_pdf_page_count, file_path)
+            await asyncio.to_thread(self.cache.store, content_hash, page_count, [])
+        return content_hash, page_count
+
+    async def iter_pdf_pages(
+        self, file_path: str, first: int, last: int
+    ) -> AsyncIterator[Tuple[int, str]]:
+        """
+        Genera en orden (página, texto) del rango [first, last]. Las páginas
+        cacheadas salen sin parsear; las demás se reparten en lotes entre los
+        procesos del pool y se guardan en la caché al terminar cada lote.
+        """
+        content_hash, page_count = await self.pdf_page_count(file_path)
+        last = min(last, page_count)
+        if first > last:
+            return
+
+        cached = await asyncio.to_thread(self.cache.pages, content_hash, first, last)
+        missing = [page for page in range(first, last + 1) if page not in cached]
+        batches = [
+            asyncio.ensure_future(
+                self._run_in_pool(
+                    _extract_pdf_pages,
+                    file_path,
+                    missing[start : start + PDF_PAGES_PER_TASK],
+                )
+            )
+            for start in range(0, len(missing), PDF_PAGES_PER_TASK)
+        ]
+        pending_by_page = {
+            page: batches[index // PDF_PAGES_PER_TASK]
+            for index, page in enumerate(missing)
+        }
+
+        stored = set()
+        try:
+            for page in range(first, last + 1):
+                batch = pending_by_page.get(page)
+                if batch is not None and batch not in stored:
+                    extracted = await batch
+                    await asyncio.to_thread(
+                        self.cache.store, content_hash, page_count, extracted
+                    )
+                    cached.update(extracted)
+                    stored.add(batch)
+                yield page, cached[page]
+        finally:
+            for batch in batches:
+                batch.cancel()
+
+    async def docx_text(self, file_path: str) -> str:
+        """Texto de un DOCX, desde la caché si el contenido no cambió"""
+        content_hash = await asyncio.to_thread(self._file_hash, file_path)
+        cached = await asyncio.to_thread(self.cache.pages, content_hash, 1, 1)
+        if 1 in cached:
+            return cached[1]
+
+        text = await self._run_in_pool(_extract_docx_text, file_path)
+        await asyncio.to_thread(self.cache.store, content_hash, 1, [(1, text)])
+        return text
+
+    async def _run_in_pool(self, function, *args):
+        """Ejecuta una función de extracción en el pool de procesos de documentos"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            tool_runtime.process_pool("documents"), function, *args
+        )
+
+    def _file_hash(self, file_path: str) -> str:
+        """SHA-256 del archivo, memorizado mientras no cambie su stat"""
+        stat = os.stat(file_path)
+        key = (file_path, stat.st_mtime_ns, stat.st_size)
+        with self._hashes_lock:
+            content_hash = self._hashes.get(key)
+            if content_hash is not None:
+                self._hashes.move_to_end(key)
+                return content_hash
+
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        content_hash = digest.hexdigest()
+
+        with self._hashes_lock:
+            self._hashes[key] = content_hash
+            while len(self._hashes) > 1024:
+                self._hashes.popitem(last=False)
+        return content_hash
+
+
+# Extractor compartido por read_file
+document_extractor = DocumentExtractor(DocumentCache(default_cache_path()))
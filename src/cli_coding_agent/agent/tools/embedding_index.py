@@ -0,0 +1,482 @@
+"""
+Recuperación por embeddings locales para search_workspace_files
+
+Los archivos de código se trocean por las definiciones que extrae
+ListCodeDefinitionNamesTool (y los de texto en ventanas de líneas), cada
+trozo se convierte en un vector con un modelo local en CPU o, sin modelo,
+con un vectorizador por hashing, y los vectores se guardan en una matriz
+float32 mapeada en memoria junto a la base de datos de sesión. Una consulta
+se responde con un único producto matricial contra todas las filas.
+
+Cada trozo se identifica por el hash de su texto: al reindexar un archivo
+solo se calculan los embeddings de los trozos nuevos o modificados.
+Requiere NumPy; sin él el backend no está disponible y la herramienta usa
+el ranking BM25.
+"""
+
+import functools
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import zlib
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from ..agent_config import agent_config
+from .base import module_available
+from .bm25_index import tokenize
+from .content_index import ContentIndex, default_index_path
+from .file_operations import LANGUAGE_BY_EXTENSION, list_code_definition_names_tool
+from .workspace_index import IndexedFile, WorkspaceIndex
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# NumPy se detecta sin importarlo y se carga al usar el índice por primera vez
+NUMPY_AVAILABLE = module_available("numpy")
+
+
+@functools.lru_cache(maxsize=None)
+def _numpy():
+    """Importa NumPy (una sola vez)"""
+    import numpy
+
+    return numpy
+
+
+# Archivos que se trocean y se indexan por embeddings
+EMBEDDABLE_EXTENSIONS = frozenset(
+    {
+        *LANGUAGE_BY_EXTENSION,
+        ".php",
+        ".rb",
+        ".cs",
+        ".swift",
+        ".kt",
+        ".scala",
+        ".md",
+        ".rst",
+        ".txt",
+    }
+)
+
+# Tamaño máximo de un trozo y ventana para archivos sin definiciones
+MAX_CHUNK_LINES = 80
+TEXT_CHUNK_LINES = 40
+
+# Trozos por llamada al modelo
+EMBEDDING_BATCH_SIZE = 64
+
+# Trozos más similares que se consideran al agregar por archivo
+TOP_CHUNKS = 256
+
+
+@dataclass(frozen=True)
+class CodeChunk:
+    """Fragmento contiguo de un archivo (líneas 1-based, inclusivas)"""
+
+    start_line: int
+    end_line: int
+    text: str
+
+    @property
+    def digest(self) -> str:
+        return hashlib.sha1(self.text.encode("utf-8")).hexdigest()
+
+
+def chunk_source(content: str, file_extension: str) -> List[CodeChunk]:
+    """Trocea un archivo en los límites de sus definiciones
+
+    Cada definición abre un trozo que llega hasta la siguiente; lo anterior
+    a la primera (imports, cabecera) forma su propio trozo. Los archivos sin
+    definiciones se trocean en ventanas fijas, y ningún trozo supera
+    MAX_CHUNK_LINES.
+    """
+    lines = content.splitlines()
+    if not lines:
+        return []
+
+    definition_lines = {
+        definition["line"]
+        for definition in list_code_definition_names_tool.definitions_for_content(
+            content, file_extension
+        )
+        if 1 <= definition["line"] <= len(lines)
+    }
+    if definition_lines:
+        starts = sorted(definition_lines | {1})
+        window = MAX_CHUNK_LINES
+    else:
+        starts = [1]
+        window = TEXT_CHUNK_LINES
+
+    chunks = []
+    for i, start in enumerate(starts):
+        end = starts[i + 1] - 1 if i + 1 < len(starts) else len(lines)
+        for chunk_start in range(start, end + 1, window):
+            chunk_end = min(end, chunk_start + window - 1)
+            text = "\n".join(lines[chunk_start - 1 : chunk_end])
+            if text.strip():
+                chunks.append(CodeChunk(chunk_start, chunk_end, text))
+    return chunks
+
+
+class HashingEmbedder:
+    """Vectorizador por hashing de términos: sin modelo, sin descargas"""
+
+    def __init__(self, dimensions: int = 512):
+        self.dimensions = dimensions
+        self.name = f"hashing-{dimensions}"
+
+    def embed(self, texts: List[str]) -> "np.ndarray":
+        """Vectores L2-normalizados de los textos (float32)"""
+        np = _numpy()
+        matrix = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+
+        for row, text in enumerate(texts):
+            for term, count in tokenize(text).items():
+                digest = zlib.crc32(term.encode("utf-8"))
+                sign = -1.0 if digest & 0x80000000 else 1.0
+                matrix[row, digest % self.dimensions] += sign * (1.0 + math.log(count))
+
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
+
+
+class SentenceTransformerEmbedder:
+    """Modelo local de sentence-transformers en CPU, cargado solo desde caché"""
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(
+            model_name, device="cpu", local_files_only=True
+        )
+        self.dimensions = self.model.get_sentence_embedding_dimension()
+        self.name = f"sentence-transformers-{model_name}"
+
+    def embed(self, texts: List[str]) -> "np.ndarray":
+        vectors = self.model.encode(
+            texts,
+            batch_size=EMBEDDING_BATCH_SIZE,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+        )
+        return vectors.astype(_numpy().float32, copy=False)
+
+
+def create_embedder():
+    """Modelo local configurado o, si no está disponible, el vectorizador por hashing"""
+    if agent_config.EMBEDDING_MODEL:
+        try:
+            return SentenceTransformerEmbedder(agent_config.EMBEDDING_MODEL)
+        except Exception:
+            pass
+    return HashingEmbedder(agent_config.EMBEDDING_DIMENSIONS)
+
+
+class VectorMatrix:
+    """Matriz float32 (filas x dimensiones) respaldada por un archivo memmap"""
+
+    def __init__(self, path: str, dimensions: int):
+        self.path = path
+        self.dimensions = dimensions
+        self.capacity = 0
+        self._matrix = None
+
+        if os.path.exists(path):
+            capacity = os.path.getsize(path) // (4 * dimensions)
+            if capacity:
+                self._map(capacity)
+
+    def ensure_capacity(self, rows: int) -> None:
+        """Amplía el archivo (al doble como mínimo) para alojar `rows` filas"""
+        if rows <= self.capacity:
+            return
+
+        new_capacity = max(rows, self.capacity * 2, 1024)
+        self.flush()
+        self._matrix = None
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "a+b") as f:
+            f.truncate(new_capacity * 4 * self.dimensions)
+        self._map(new_capacity)
+
+    def write(self, rows: List[int], vectors: "np.ndarray") -> None:
+        self._matrix[rows] = vectors
+
+    def clear(self, rows: List[int]) -> None:
+        if rows:
+            self._matrix[rows] = 0.0
+
+    def view(self, rows: int) -> "np.ndarray":
+        return self._matrix[:rows]
+
+    def flush(self) -> None:
+        if self._matrix is not None:
+            self._matrix.flush()
+
+    def reset(self) -> None:
+        """Elimina todos los vectores"""
+        self._matrix = None
+        self.capacity = 0
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def _map(self, capacity: int) -> None:
+        np = _numpy()
+        self._matrix = np.memmap(
+            self.path,
+            dtype=np.float32,
+            mode="r+",
+            shape=(capacity, self.dimensions),
+        )
+        self.capacity = capacity
+
+
+class EmbeddingIndex(ContentIndex):
+    """Índice de embeddings por trozo con la matriz de vectores en memmap"""
+
+    NAME = "embedding"
+    SCHEMA_VERSION = 1
+    EXTENSIONS = EMBEDDABLE_EXTENSIONS
+
+    def __init__(self, db_path: str, vectors_path: str, embedder_factory=None):
+        super().__init__(db_path)
+        self.vectors_path = vectors_path
+        self._embedder_factory = embedder_factory or create_embedder
+        self._embedder = None
+        self._vectors: Optional[VectorMatrix] = None
+        # Archivo dueño de cada fila de la matriz (-1 si la fila está libre)
+        self._row_files: Optional["np.ndarray"] = None
+        self._free_rows: List[int] = []
+        self._next_row = 0
+        self._pending_texts: Dict[str, str] = {}
+        # Filas que la transacción en curso deja de referenciar
+        self._released_rows: List[int] = []
+
+    @property
+    def embedder(self):
+        if self._embedder is None:
+            self._embedder = self._embedder_factory()
+        return self._embedder
+
+    def scores(
+        self, workspace_index: WorkspaceIndex, under: str, query: str
+    ) -> Dict[str, float]:
+        """Similitud coseno del mejor trozo de cada archivo bajo `under`"""
+        np = _numpy()
+        with self._lock:
+            self.sync(workspace_index)
+            self._vectors.flush()
+            if not self._next_row:
+                return {}
+
+            query_vector = self.embedder.embed([query])[0]
+            similarities = self._vectors.view(self._next_row) @ query_vector
+            owners = self._row_files[: self._next_row]
+            similarities = np.where(owners >= 0, similarities, -np.inf)
+
+            count = min(TOP_CHUNKS, self._next_row)
+            top_rows = np.argpartition(-similarities, count - 1)[:count]
+
+            best: Dict[int, float] = {}
+            for row in top_rows.tolist():
+                similarity = float(similarities[row])
+                if similarity <= 0:
+                    continue
+                file_id = int(owners[row])
+                if similarity > best.get(file_id, 0.0):
+                    best[file_id] = similarity
+
+            paths = self._paths_under(best, under)
+            return {path: best[file_id] for file_id, path in paths.items()}
+
+    def _reset_state(self) -> None:
+        super()._reset_state()
+        self._vectors = None
+        self._row_files = None
+        self._free_rows = []
+        self._next_row = 0
+        self._pending_texts.clear()
+        self._released_rows = []
+
+    def _after_commit(self) -> None:
+        """Libera las filas de los trozos eliminados en la transacción confirmada"""
+        rows = self._released_rows
+        if rows:
+            self._vectors.clear(rows)
+            self._row_files[rows] = -1
+            self._free_rows.extend(rows)
+            self._released_rows = []
+
+    def _table_names(self) -> Tuple[str, ...]:
+        return ("embedding_chunks", "embedding_settings")
+
+    def _create_tables(self, connection: sqlite3.Connection) -> None:
+        connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embedding_chunks (
+                row INTEGER PRIMARY KEY,
+                file_id INTEGER NOT NULL,
+                chunk_hash TEXT NOT NULL,
+                start_line INTEGER NOT NULL,
+                end_line INTEGER NOT NULL
+            )
+            """
+        )
+        connection.execute(
+            "CREATE INDEX IF NOT EXISTS embedding_chunks_file "
+            "ON embedding_chunks (file_id)"
+        )
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS embedding_settings "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        """Abre la base de datos y la matriz; las descarta si cambió el modelo"""
+        if self._connection is not None:
+            if self._vectors is None:
+                # Estado descartado tras un error: recargar la matriz
+                self._vectors = VectorMatrix(
+                    self.vectors_path, self.embedder.dimensions
+                )
+                self._load_rows(self._connection)
+            return self._connection
+
+        connection = super()._connect()
+        embedder = self.embedder
+        signature = json.dumps([embedder.name, embedder.dimensions])
+
+        row = connection.execute(
+            "SELECT value FROM embedding_settings WHERE key = 'embedder'"
+        ).fetchone()
+        if row is None or row[0] != signature:
+            # Vectores de otro modelo: no son comparables con los nuevos
+            with connection:
+                connection.execute("DELETE FROM embedding_chunks")
+                connection.execute(f"DELETE FROM {self.files_table}")
+                connection.execute(
+                    "INSERT OR REPLACE INTO embedding_settings (key, value) "
+                    "VALUES ('embedder', ?)",
+                    (signature,),
+                )
+            VectorMatrix(self.vectors_path, embedder.dimensions).reset()
+
+        self._vectors = VectorMatrix(self.vectors_path, embedder.dimensions)
+        self._load_rows(connection)
+        return connection
+
+    def _load_rows(self, connection: sqlite3.Connection) -> None:
+        """Reconstruye en memoria el dueño de cada fila y las filas libres"""
+        np = _numpy()
+        self._row_files = np.full(self._vectors.capacity, -1, dtype=np.int64)
+        for row, file_id in connection.execute(
+            "SELECT row, file_id FROM embedding_chunks"
+        ):
+            self._row_files[row] = file_id
+
+        used = np.flatnonzero(self._row_files >= 0)
+        self._next_row = int(used[-1]) + 1 if len(used) else 0
+        self._free_rows = np.flatnonzero(self._row_files[: self._next_row] < 0).tolist()
+
+    def _build_payload(self, entry: IndexedFile, data: bytes) -> bytes:
+        """Trozos del archivo como lista JSON de (hash, línea inicial, línea final)"""
+        chunks = chunk_source(data.decode("utf-8", errors="ignore"), entry.extension)
+        for chunk in chunks:
+            self._pending_texts[chunk.digest] = chunk.text
+        return json.dumps(
+            [[chunk.digest, chunk.start_line, chunk.end_line] for chunk in chunks]
+        ).encode("utf-8")
+
+    def _apply_payload(
+        self,
+        connection: sqlite3.Connection,
+        file_id: int,
+        old_payload: Optional[bytes],
+        new_payload: Optional[bytes],
+    ) -> None:
+        """Reutiliza las filas de los trozos sin cambios y calcula solo los nuevos
+
+        Los vectores nuevos se escriben solo en filas libres según el último
+        estado confirmado; las filas de los trozos eliminados se borran y se
+        liberan en `_after_commit`. Si la transacción se deshace, ninguna
+        fila que la base de datos siga referenciando ha cambiado.
+        """
+        reusable: Dict[str, List[int]] = {}
+        for row, chunk_hash in connection.execute(
+            "SELECT row, chunk_hash FROM embedding_chunks WHERE file_id = ?",
+            (file_id,),
+        ):
+            reusable.setdefault(chunk_hash, []).append(row)
+
+        new_chunks = json.loads(new_payload) if new_payload else []
+        to_embed = []
+        for chunk_hash, start_line, end_line in new_chunks:
+            rows = reusable.get(chunk_hash)
+            if rows:
+                connection.execute(
+                    "UPDATE embedding_chunks SET start_line = ?, end_line = ? "
+                    "WHERE row = ?",
+                    (start_line, end_line, rows.pop()),
+                )
+            else:
+                to_embed.append((chunk_hash, start_line, end_line))
+
+        stale_rows = [row for rows in reusable.values() for row in rows]
+        if stale_rows:
+            connection.executemany(
+                "DELETE FROM embedding_chunks WHERE row = ?",
+                ((row,) for row in stale_rows),
+            )
+            self._released_rows.extend(stale_rows)
+
+        for start in range(0, len(to_embed), EMBEDDING_BATCH_SIZE):
+            batch = to_embed[start : start + EMBEDDING_BATCH_SIZE]
+            vectors = self.embedder.embed(
+                [self._pending_texts[chunk_hash] for chunk_hash, _, _ in batch]
+            )
+            rows = self._allocate_rows(len(batch))
+            self._vectors.write(rows, vectors)
+            self._row_files[rows] = file_id
+            connection.executemany(
+                "INSERT INTO embedding_chunks "
+                "(row, file_id, chunk_hash, start_line, end_line) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    (row, file_id, chunk_hash, start_line, end_line)
+                    for row, (chunk_hash, start_line, end_line) in zip(rows, batch)
+                ),
+            )
+
+        self._pending_texts.clear()
+
+    def _allocate_rows(self, count: int) -> List[int]:
+        """Filas libres primero; después, filas nuevas al final de la matriz"""
+        rows = [self._free_rows.pop() for _ in range(min(count, len(self._free_rows)))]
+        missing = count - len(rows)
+        if missing:
+            rows.extend(range(self._next_row, self._next_row + missing))
+            self._next_row += missing
+
+            if self._next_row > self._vectors.capacity:
+                self._vectors.ensure_capacity(self._next_row)
+                np = _numpy()
+                grown = np.full(self._vectors.capacity, -1, dtype=np.int64)
+                grown[: len(self._row_files)] = self._row_files
+                self._row_files = grown
+        return rows
+
+
+# Índice compartido por la búsqueda del workspace (vectores junto a la base)
+embedding_index = EmbeddingIndex(
+    default_index_path(),
+    os.path.join(os.path.dirname(default_index_path()), "embeddings.f32"),
+)
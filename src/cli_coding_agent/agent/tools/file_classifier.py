@@ -0,0 +1,192 @@
+"""
+Clasificación de archivos para las herramientas que leen contenido
+
+Decide si un archivo merece ser leído como texto antes de abrirlo: descarta
+extensiones binarias conocidas, archivos por encima de un tamaño máximo y
+archivos cuyo primer bloque contiene bytes NUL. Los veredictos se cachean por
+(ruta, mtime, tamaño), de modo que las búsquedas repetidas no vuelven a abrir
+archivos ya clasificados como binarios.
+"""
+
+import os
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+# Tamaño del bloque inicial que se inspecciona en busca de bytes NUL
+SNIFF_BLOCK_SIZE = 8192
+
+# Tamaño máximo por defecto de un archivo de texto a leer (10 MB)
+DEFAULT_MAX_FILE_SIZE = 10 * 1024 * 1024
+
+# Extensiones que nunca contienen texto buscable
+DEFAULT_DENIED_EXTENSIONS = frozenset(
+    {
+        # Imágenes
+        ".png",
+        ".jpg",
+        ".jpeg",
+        ".gif",
+        ".bmp",
+        ".ico",
+        ".webp",
+        ".tif",
+        ".tiff",
+        ".psd",
+        # Audio y vídeo
+        ".mp3",
+        ".mp4",
+        ".wav",
+        ".flac",
+        ".ogg",
+        ".avi",
+        ".mov",
+        ".mkv",
+        ".webm",
+        # Archivos comprimidos y paquetes
+        ".zip",
+        ".gz",
+        ".tgz",
+        ".bz2",
+        ".xz",
+        ".7z",
+        ".rar",
+        ".tar",
+        ".whl",
+        ".egg",
+        ".jar",
+        ".war",
+        ".pack",
+        ".idx",
+        # Binarios y objetos compilados
+        ".exe",
+        ".dll",
+        ".so",
+        ".dylib",
+        ".o",
+        ".a",
+        ".lib",
+        ".class",
+        ".pyc",
+        ".pyo",
+        ".pyd",
+        ".wasm",
+        ".bin",
+        # Bases de datos y datos serializados
+        ".db",
+        ".sqlite",
+        ".sqlite3",
+        ".parquet",
+        ".npy",
+        ".npz",
+        ".pkl",
+        ".pickle",
+        ".h5",
+        ".onnx",
+        ".pt",
+        ".pth",
+        # Documentos binarios y fuentes
+        ".pdf",
+        ".doc",
+        ".docx",
+        ".xls",
+        ".xlsx",
+        ".ppt",
+        ".pptx",
+        ".woff",
+        ".woff2",
+        ".ttf",
+        ".otf",
+        ".eot",
+        # Imágenes de disco
+        ".iso",
+        ".dmg",
+        ".img",
+    }
+)
+
+
+def is_binary_block(block: bytes) -> bool:
+    """Indica si un bloque de bytes parece binario (contiene bytes NUL)"""
+    return b"\x00" in block[:SNIFF_BLOCK_SIZE]
+
+
+class FileClassifier:
+    """Clasifica archivos como texto buscable o no, con caché de veredictos"""
+
+    def __init__(
+        self,
+        max_file_size: int = DEFAULT_MAX_FILE_SIZE,
+        denied_extensions: Iterable[str] = DEFAULT_DENIED_EXTENSIONS,
+        max_cache_entries: int = 200_000,
+    ):
+        self.max_file_size = max_file_size
+        self.denied_extensions = frozenset(ext.lower() for ext in denied_extensions)
+        self.max_cache_entries = max_cache_entries
+        self._verdicts: Dict[str, Tuple[int, int, bool]] = {}
+
+    def precheck(
+        self, path: str, stat_result: Optional[os.stat_result] = None
+    ) -> Optional[bool]:
+        """Clasifica sin leer el archivo
+
+        Retorna False si el archivo se descarta por extensión, tamaño o por un
+        veredicto binario cacheado, True si ya se sabe que es texto y None si
+        hace falta inspeccionar su contenido.
+        """
+        if Path(path).suffix.lower() in self.denied_extensions:
+            return False
+
+        if stat_result is None:
+            try:
+                stat_result = os.stat(path)
+            except OSError:
+                return False
+
+        if stat_result.st_size > self.max_file_size:
+            return False
+
+        cached = self._verdicts.get(path)
+        if cached is not None and cached[:2] == (
+            stat_result.st_mtime_ns,
+            stat_result.st_size,
+        ):
+            return cached[2]
+
+        return None
+
+    def record(self, path: str, mtime_ns: int, size: int, is_text: bool) -> None:
+        """Guarda el veredicto de un archivo para su (mtime, tamaño) actual"""
+        if len(self._verdicts) >= self.max_cache_entries:
+            self._verdicts.clear()
+        self._verdicts[path] = (mtime_ns, size, is_text)
+
+    def is_text_file(
+        self, path: str, stat_result: Optional[os.stat_result] = None
+    ) -> bool:
+        """Clasificación completa: precheck y, si hace falta, lectura del primer bloque"""
+        if stat_result is None:
+            try:
+                stat_result = os.stat(path)
+            except OSError:
+                return False
+
+        verdict = self.precheck(path, stat_result)
+        if verdict is not None:
+            return verdict
+
+        try:
+            with open(path, "rb") as f:
+                is_text = not is_binary_block(f.read(SNIFF_BLOCK_SIZE))
+        except OSError:
+            return False
+
+        self.record(path, stat_result.st_mtime_ns, stat_result.st_size, is_text)
+        return is_text
+
+    def clear_cache(self) -> None:
+        """Vacía la caché de veredictos"""
+        self._verdicts.clear()
+
+
+# Clasificador compartido por todas las herramientas
+file_classifier = FileClassifier()
@@ -3,45 +3,222 @@ Herramientas de operaciones de archivos para el CLI agent - Inspiradas en Cline
 """
 
 import os
+import asyncio
+import hashlib
+import importlib
+import threading
 import aiofiles
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import TYPE_CHECKING, AsyncIterator, Iterator, List, Dict, Any, Optional, Tuple
+import codecs
 import mimetypes
 import re
+from collections import OrderedDict
+
+
+if TYPE_CHECKING:
+    from tree_sitter import Tree
+
+
+from .atomic_write import write_text_atomic
+from .base import BaseTool, ToolResult, ToolParameter, ToolType, module_available
+from .content_cache import content_cache
+from .definitions_cache import CachedDefinitions, definitions_cache
+from .document_extraction import (
+    DOCX_AVAILABLE,
+    PDF_AVAILABLE,
+    document_extractor,
+)
+from .file_classifier import file_classifier
+from .line_index import TextRange, range_reader
+from .runtime import tool_runtime
+from .text_encoding import (
+    code_unit_size,
+    decode_bytes,
+    encoding_detector,
+    is_ascii_compatible,
+    mid_stream_encoding,
+)
+from .workspace_index import workspace_index_registry
+from .workspace_walker import workspace_walker
+
+# tree-sitter se detecta sin importarlo y se carga en el primer uso
+TREE_SITTER_AVAILABLE = module_available("tree_sitter")
+
+# Lenguaje de tree-sitter por extensión de archivo
+LANGUAGE_BY_EXTENSION = {
+    ".py": "python",
+    ".js": "javascript",
+    ".jsx": "javascript",
+    ".ts": "typescript",
+    ".tsx": "tsx",
+    ".java": "java",
+    ".cpp": "cpp",
+    ".c": "c",
+    ".h": "c",
+    ".hpp": "cpp",
+    ".rs": "rust",
+    ".go": "go",
+}
+
+# Extensiones de archivos de código fuente
+CODE_EXTENSIONS = frozenset(
+    {
+        *LANGUAGE_BY_EXTENSION,
+        ".php",
+        ".rb",
+        ".cs",
+        ".swift",
+        ".kt",
+        ".scala",
+    }
+)
+
+# Paquete de gramática de cada lenguaje y función que retorna su puntero
+GRAMMARS = {
+    "python": ("tree_sitter_python", "language"),
+    "javascript": ("tree_sitter_javascript", "language"),
+    "typescript": ("tree_sitter_typescript", "language_typescript"),
+    "tsx": ("tree_sitter_typescript", "language_tsx"),
+    "java": ("tree_sitter_java", "language"),
+    "cpp": ("tree_sitter_cpp", "language"),
+    "c": ("tree_sitter_c", "language"),
+    "rust": ("tree_sitter_rust", "language"),
+    "go": ("tree_sitter_go", "language"),
+}
+
+# Consultas de tree-sitter por lenguaje: cada patrón captura el nodo de la
+# definición (@definition.class o @definition.function) y su nombre (@name)
+_JAVASCRIPT_QUERY = """
+(class_declaration name: (_) @name) @definition.class
+(function_declaration name: (identifier) @name) @definition.function
+(generator_function_declaration name: (identifier) @name) @definition.function
+(method_definition name: (_) @name) @definition.function
+(variable_declarator
+  name: (identifier) @name
+  value: [(arrow_function) (function_expression)]) @definition.function
+"""
 
-# Importaciones para lectura de PDFs y DOCX
-try:
-    import PyPDF2
-    import fitz  # PyMuPDF
-
-    PDF_AVAILABLE = True
-except ImportError:
-    PDF_AVAILABLE = False
-
-try:
-    from docx import Document
-
-    DOCX_AVAILABLE = True
-except ImportError:
-    DOCX_AVAILABLE = False
-
-# Importaciones para tree-sitter
-try:
-    import tree_sitter_python as tspython
-    import tree_sitter_javascript as tsjs
-    import tree_sitter_typescript as tsts
-    import tree_sitter_java as tsjava
-    import tree_sitter_cpp as tscpp
-    import tree_sitter_c as tsc
-    import tree_sitter_rust as tsrust
-    import tree_sitter_go as tsgo
-    from tree_sitter import Parser, Node
-
-    TREE_SITTER_AVAILABLE = True
-except ImportError:
-    TREE_SITTER_AVAILABLE = False
+_TYPESCRIPT_QUERY = (
+    _JAVASCRIPT_QUERY
+    + """
+(abstract_class_declaration name: (_) @name) @definition.class
+(interface_declaration name: (_) @name) @definition.class
+(enum_declaration name: (_) @name) @definition.class
+"""
+)
+
+_C_QUERY = """
+(function_definition
+  declarator: [
+    (function_declarator declarator: (_) @name)
+    (pointer_declarator declarator: (function_declarator declarator: (_) @name))
+  ]) @definition.function
+(struct_specifier name: (type_identifier) @name body: (_)) @definition.class
+(union_specifier name: (type_identifier) @name body: (_)) @definition.class
+(enum_specifier name: (type_identifier) @name body: (_)) @definition.class
+(type_definition declarator: (type_identifier) @name) @definition.class
+"""
 
-from .base import BaseTool, ToolResult, ToolParameter, ToolType
+DEFINITION_QUERIES = {
+    "python": """
+(class_definition name: (identifier) @name) @definition.class
+(function_definition name: (identifier) @name) @definition.function
+""",
+    "javascript": _JAVASCRIPT_QUERY,
+    "typescript": _TYPESCRIPT_QUERY,
+    "tsx": _TYPESCRIPT_QUERY,
+    "java": """
+(class_declaration name: (identifier) @name) @definition.class
+(interface_declaration name: (identifier) @name) @definition.class
+(enum_declaration name: (identifier) @name) @definition.class
+(record_declaration name: (identifier) @name) @definition.class
+(method_declaration name: (identifier) @name) @definition.function
+(constructor_declaration name: (identifier) @name) @definition.function
+""",
+    "c": _C_QUERY,
+    "cpp": _C_QUERY
+    + """
+(class_specifier name: (type_identifier) @name body: (_)) @definition.class
+(function_definition
+  declarator: (reference_declarator (function_declarator declarator: (_) @name))) @definition.function
+""",
+    "rust": """
+(function_item name: (identifier) @name) @definition.function
+(function_signature_item name: (identifier) @name) @definition.function
+(struct_item name: (type_identifier) @name) @definition.class
+(enum_item name: (type_identifier) @name) @definition.class
+(union_item name: (type_identifier) @name) @definition.class
+(trait_item name: (type_identifier) @name) @definition.class
+(type_item name: (type_identifier) @name) @definition.class
+""",
+    "go": """
+(function_declaration name: (identifier) @name) @definition.function
+(method_declaration name: (field_identifier) @name) @definition.function
+(type_spec name: (type_identifier) @name) @definition.class
+""",
+}
+
+# Tipos de nodo que cuentan como referencia a un símbolo (los que no existen
+# en la gramática de un lenguaje se omiten de su consulta)
+REFERENCE_NODE_TYPES = (
+    "identifier",
+    "type_identifier",
+    "field_identifier",
+    "property_identifier",
+    "shorthand_property_identifier",
+    "namespace_identifier",
+)
+
+# Identificadores para el análisis de referencias sin tree-sitter
+_IDENTIFIER_PATTERN = re.compile(r"\b[A-Za-z_][A-Za-z0-9_]*\b")
+
+# Árboles de tree-sitter que se conservan en memoria para reparseo incremental
+MAX_CACHED_TREES = 128
+
+# Archivos por analizar a partir de los cuales se reparte el parseo en procesos
+DEFINITIONS_PROCESS_THRESHOLD = 200
+DEFINITIONS_BATCH_SIZE = 16
+
+# Tamaño máximo de una lectura por rango (líneas u offset/longitud)
+MAX_RANGE_BYTES = 256 * 1024
+
+# Presupuesto de una lectura completa: por encima se muestran inicio y final
+READ_BUDGET_BYTES = 512 * 1024
+READ_CHUNK_SIZE = 64 * 1024
+
+# Bytes en los que se busca un salto de línea para cortar las muestras
+_SAMPLE_ALIGN_WINDOW = 4096
+
+
+def _common_prefix_length(a: bytes, b: bytes) -> int:
+    """Longitud del prefijo común (búsqueda binaria sobre comparaciones en C)"""
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[:middle] == b[:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def _common_suffix_length(a: bytes, b: bytes, limit: int) -> int:
+    """Longitud del sufijo común, sin solaparse con los primeros `limit` bytes"""
+    low, high = 0, min(len(a), len(b)) - limit
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[len(a) - middle :] == b[len(b) - middle :]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def _point(data: bytes, offset: int) -> Tuple[int, int]:
+    """(fila, columna en bytes) de un offset, como los espera tree-sitter"""
+    row = data.count(b"\n", 0, offset)
+    return row, offset - (data.rfind(b"\n", 0, offset) + 1)
 
 
 class ReadFileTool(BaseTool):
@@ -57,12 +234,55 @@ class ReadFileTool(BaseTool):
                 name="path",
                 type=str,
                 description="Ruta del archivo a leer (relativa al directorio de trabajo)",
-            )
+            ),
+            ToolParameter(
+                name="start_line",
+                type=int,
+                description="Primera línea a leer (desde 1) para leer solo un rango de líneas",
+                required=False,
+            ),
+            ToolParameter(
+                name="end_line",
+                type=int,
+                description="Última línea a leer (inclusiva); por defecto hasta el final",
+                required=False,
+            ),
+            ToolParameter(
+                name="offset",
+                type=int,
+                description="Offset en bytes desde el que leer, para leer solo un rango de bytes",
+                required=False,
+            ),
+            ToolParameter(
+                name="length",
+                type=int,
+                description=f"Número de bytes a leer desde offset (máximo {MAX_RANGE_BYTES})",
+                required=False,
+                default=MAX_RANGE_BYTES,
+            ),
+            ToolParameter(
+                name="start_page",
+                type=int,
+                description="Primera página a extraer de un PDF (desde 1)",
+                required=False,
+            ),
+            ToolParameter(
+                name="end_page",
+                type=int,
+                description="Última página a extraer de un PDF (inclusiva)",
+                required=False,
+            ),
         ]
         self.requires_approval = False
 
     async def execute(self, **kwargs) -> ToolResult:
         path = kwargs["path"]
+        start_line = kwargs.get("start_line")
+        end_line = kwargs.get("end_line")
+        offset = kwargs.get("offset")
+        length = kwargs.get("length")
+        start_page = kwargs.get("start_page")
+        end_page = kwargs.get("end_page")
 
         if not self.is_path_safe(path):
             return ToolResult(
@@ -81,16 +301,22 @@ class ReadFileTool(BaseTool):
                 success=False, content="", error=f"La ruta no es un archivo: {path}"
             )
 
+        if any(value is not None for value in (start_line, end_line, offset, length)):
+            return await self._read_range(
+                path, absolute_path, start_line, end_line, offset, length
+            )
+
         try:
             # Detectar el tipo de archivo
             mime_type, _ = mimetypes.guess_type(absolute_path)
             file_extension = Path(absolute_path).suffix.lower()
 
             content = ""
+            file_size = os.path.getsize(absolute_path)
 
             # Leer PDFs
             if file_extension == ".pdf":
-                content = await self._read_pdf(absolute_path)
+                content = await self._read_pdf(absolute_path, start_page, end_page)
             # Leer DOCX
             elif file_extension == ".docx":
                 content = await self._read_docx(absolute_path)
@@ -104,9 +330,119 @@ class ReadFileTool(BaseTool):
                 metadata={
                     "file_path": path,
                     "absolute_path": absolute_path,
-                    "file_size": os.path.getsize(absolute_path),
+                    "file_size": file_size,
                     "mime_type": mime_type,
                     "file_extension": file_extension,
+                    "truncated": file_extension not in (".pdf", ".docx")
+                    and file_size > READ_BUDGET_BYTES,
+                    "content_cache": content_cache.stats(),
+                },
+            )
+
+        except Exception as e:
+            return ToolResult(
+                success=False,
+                content="",
+                error=f"Error leyendo el archivo {path}: {str(e)}",
+            )
+
+    async def _read_range(
+        self,
+        path: str,
+        absolute_path: str,
+        start_line: Optional[int],
+        end_line: Optional[int],
+        offset: Optional[int],
+        length: Optional[int],
+    ) -> ToolResult:
+        """Lee un rango de líneas o de bytes desde un mmap del archivo
+
+        Un length sin offset lee desde el principio del archivo.
+        """
+        by_lines = start_line is not None or end_line is not None
+        if (offset is not None or length is not None) and by_lines:
+            return ToolResult(
+                success=False,
+                content="",
+                error="Use start_line/end_line u offset/length, no ambos",
+            )
+        if start_line is not None and start_line < 1:
+            return ToolResult(
+                success=False, content="", error="start_line debe ser mayor que 0"
+            )
+        if end_line is not None and end_line < (start_line or 1):
+            return ToolResult(
+                success=False,
+                content="",
+                error="end_line debe ser mayor o igual que start_line",
+            )
+        if not by_lines and offset is None:
+            offset = 0
+        if offset is not None and offset < 0:
+            return ToolResult(
+                success=False, content="", error="offset no puede ser negativo"
+            )
+        if length is not None and length < 1:
+            return ToolResult(
+                success=False, content="", error="length debe ser mayor que 0"
+            )
+
+        if Path(absolute_path).suffix.lower() in (".pdf", ".docx"):
+            return ToolResult(
+                success=False,
+                content="",
+                error=f"La lectura por rango solo admite archivos de texto: {path}",
+            )
+
+        try:
+            encoding = await asyncio.to_thread(
+                encoding_detector.detect_file, absolute_path
+            )
+            if offset is None and not is_ascii_compatible(encoding):
+                return ToolResult(
+                    success=False,
+                    content="",
+                    error=f"La lectura por líneas no admite archivos {encoding}; use offset/length",
+                )
+
+            if offset is not None:
+                requested = MAX_RANGE_BYTES if length is None else length
+                text_range, range_encoding = await asyncio.to_thread(
+                    self._read_aligned_bytes,
+                    absolute_path,
+                    offset,
+                    min(requested, MAX_RANGE_BYTES),
+                    encoding,
+                )
+                content = text_range.data.decode(range_encoding, errors="replace")
+                truncated = requested > MAX_RANGE_BYTES
+            else:
+                text_range = await asyncio.to_thread(
+                    range_reader.read_lines,
+                    absolute_path,
+                    start_line or 1,
+                    end_line,
+                    MAX_RANGE_BYTES,
+                )
+                content, _ = decode_bytes(text_range.data, encoding)
+                # El rango se recortó a MAX_RANGE_BYTES antes de end_line
+                truncated = text_range.end_offset < text_range.file_size and (
+                    end_line is None or text_range.end_line < end_line
+                )
+
+            return ToolResult(
+                success=True,
+                content=content,
+                metadata={
+                    "file_path": path,
+                    "absolute_path": absolute_path,
+                    "file_size": text_range.file_size,
+                    "start_offset": text_range.start_offset,
+                    "end_offset": text_range.end_offset,
+                    "start_line": text_range.start_line,
+                    "end_line": text_range.end_line,
+                    "total_lines": text_range.total_lines,
+                    "truncated": truncated,
                 },
             )
 
@@ -117,58 +453,171 @@ class ReadFileTool(BaseTool):
                 error=f"Error leyendo el archivo {path}: {str(e)}",
             )
 
+    @staticmethod
+    def _read_aligned_bytes(
+        file_path: str, offset: int, length: int, encoding: str
+    ) -> Tuple[TextRange, str]:
+        """Lee un rango de bytes alineado a unidades de código y su codificación
+
+        En UTF-16/32 el rango se amplía a unidades de código completas. Lejos
+        del principio no hay BOM: se decodifica con el orden de bytes del BOM
+        del archivo, igual que la muestra final de stream_text_file.
+        """
+        unit = code_unit_size(encoding)
+        start = offset - offset % unit
+        end = offset + length
+        end += (-end) % unit
+        text_range = range_reader.read_bytes(file_path, start, end - start)
+        if text_range.start_offset == 0:
+            return text_range, encoding
+        head = range_reader.read_bytes(file_path, 0, 4).data
+        return text_range, mid_stream_encoding(encoding, head)
+
     async def _read_text_file(self, file_path: str) -> str:
         """Lee un archivo de texto con detección automática de encoding"""
-        encodings = ["utf-8", "utf-16", "latin-1", "cp1252"]
-
-        for encoding in encodings:
-            try:
-                async with aiofiles.open(file_path, "r", encoding=encoding) as f:
-                    return await f.read()
-            except UnicodeDecodeError:
-                continue
+        stat = os.stat(file_path)
+        content = content_cache.get(file_path, stat)
+        if content is not None:
+            return content
+
+        # Los archivos grandes se leen por trozos y con muestreo
+        if stat.st_size > READ_BUDGET_BYTES:
+            content = "".join(
+                [chunk async for chunk in self.stream_text_file(file_path)]
+            )
+        else:
+            content, _ = await asyncio.to_thread(
+                encoding_detector.decode_file, file_path
+            )
+        content_cache.put(file_path, stat, content)
+        return content
+
+    async def stream_text_file(
+        self,
+        file_path: str,
+        budget: Optional[int] = None,
+        chunk_size: int = READ_CHUNK_SIZE,
+    ) -> AsyncIterator[str]:
+        """
+        Genera el contenido de un archivo de texto en trozos de `chunk_size`
+        bytes. Si el archivo supera `budget`, solo se leen su inicio y su final
+        (la mitad del presupuesto cada uno, cortados en saltos de línea) y entre
+        ambos se emite una marca que indica qué bytes se omitieron.
+        """
+        budget = budget or READ_BUDGET_BYTES
+        encoding = await asyncio.to_thread(encoding_detector.detect_file, file_path)
 
-        # Si ningún encoding funciona, leer como binario y decodificar con errores
         async with aiofiles.open(file_path, "rb") as f:
-            raw_content = await f.read()
-            return raw_content.decode("utf-8", errors="replace")
+            size = os.fstat(f.fileno()).st_size
+            if size <= budget:
+                async for text in self._decode_section(
+                    f, 0, size, encoding, chunk_size
+                ):
+                    yield text
+                return
+
+            head = await f.read(4)
+            tail_encoding = mid_stream_encoding(encoding, head)
+            head_end, tail_start = await self._sample_bounds(f, size, budget, encoding)
+
+            head_lines = 0
+            async for text in self._decode_section(
+                f, 0, head_end, encoding, chunk_size
+            ):
+                head_lines += text.count("\n")
+                yield text
+
+            yield (
+                f"\n[... {tail_start - head_end} bytes omitidos "
+                f"(bytes {head_end}-{tail_start} de {size}); arriba las líneas "
+                f"1-{head_lines}, abajo el final del archivo. Use start_line/end_line "
+                f"u offset/length para leer la parte omitida ...]\n"
+            )
 
-    async def _read_pdf(self, file_path: str) -> str:
-        """Lee contenido de un archivo PDF"""
+            async for text in self._decode_section(
+                f, tail_start, size, tail_encoding, chunk_size
+            ):
+                yield text
+
+    async def _sample_bounds(
+        self, f, size: int, budget: int, encoding: str
+    ) -> Tuple[int, int]:
+        """Fin de la muestra inicial e inicio de la final, en límites de línea"""
+        head_end = budget // 2
+        tail_start = size - (budget - head_end)
+
+        if not is_ascii_compatible(encoding):
+            unit = code_unit_size(encoding)
+            return head_end - head_end % unit, tail_start + (-tail_start) % unit
+
+        window_start = max(head_end - _SAMPLE_ALIGN_WINDOW, 0)
+        await f.seek(window_start)
+        cut = (await f.read(head_end - window_start)).rfind(b"\n")
+        if cut >= 0:
+            head_end = window_start + cut + 1
+
+        await f.seek(tail_start)
+        cut = (await f.read(_SAMPLE_ALIGN_WINDOW)).find(b"\n")
+        if cut >= 0:
+            tail_start += cut + 1
+        return head_end, tail_start
+
+    async def _decode_section(
+        self, f, start: int, end: int, encoding: str, chunk_size: int
+    ) -> AsyncIterator[str]:
+        """Decodifica incrementalmente los bytes [start, end) de un archivo abierto"""
+        decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        await f.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            data = await f.read(min(chunk_size, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            text = decoder.decode(data)
+            if text:
+                yield text
+        text = decoder.decode(b"", final=True)
+        if text:
+            yield text
+
+    async def _read_pdf(
+        self,
+        file_path: str,
+        start_page: Optional[int] = None,
+        end_page: Optional[int] = None,
+    ) -> str:
+        """Lee el texto de un PDF (o de un rango de páginas) en el pool de documentos"""
         if not PDF_AVAILABLE:
             return "[PDF no soportado - instale PyPDF2 y PyMuPDF]"
 
         try:
-            # Intentar con PyMuPDF primero (mejor para texto complejo)
-            doc = fitz.open(file_path)
-            text = ""
-            for page in doc:
-                text += page.get_text()
-            doc.close()
-            return text
-        except Exception:
-            try:
-                # Fallback a PyPDF2
-                with open(file_path, "rb") as f:
-                    pdf_reader = PyPDF2.PdfReader(f)
-                    text = ""
-                    for page in pdf_reader.pages:
-                        text += page.extract_text()
-                    return text
-            except Exception as e:
-                return f"[Error leyendo PDF: {str(e)}]"
+            first = max(start_page or 1, 1)
+            _, page_count = await document_extractor.pdf_page_count(file_path)
+            last = min(end_page or page_count, page_count)
+            if first > last:
+                return f"[El PDF tiene {page_count} páginas]"
+
+            # Con un rango parcial se marca el inicio de cada página
+            partial = (first, last) != (1, page_count)
+            parts = []
+            async for page, text in document_extractor.iter_pdf_pages(
+                file_path, first, last
+            ):
+                if partial:
+                    parts.append(f"--- Página {page}/{page_count} ---\n")
+                parts.append(text)
+            return "".join(parts)
+        except Exception as e:
+            return f"[Error leyendo PDF: {str(e)}]"
 
     async def _read_docx(self, file_path: str) -> str:
-        """Lee contenido de un archivo DOCX"""
+        """Lee el texto de un DOCX en el pool de documentos"""
         if not DOCX_AVAILABLE:
             return "[DOCX no soportado - instale python-docx]"
 
         try:
-            doc = Document(file_path)
-            text = ""
-            for paragraph in doc.paragraphs:
-                text += paragraph.text + "\n"
-            return text
+            return await document_extractor.docx_text(file_path)
         except Exception as e:
             return f"[Error leyendo DOCX: {str(e)}]"
 
@@ -210,22 +659,26 @@ class WriteToFileTool(BaseTool):
             # Crear directorios padre si no existen
             os.makedirs(os.path.dirname(absolute_path), exist_ok=True)
 
-            # Escribir el archivo
-            async with aiofiles.open(absolute_path, "w", encoding="utf-8") as f:
-                await f.write(content)
-
-            file_exists = os.path.exists(absolute_path)
-            file_size = os.path.getsize(absolute_path) if file_exists else 0
+            # Escribir el archivo (atómicamente; sin cambios no se escribe)
+            written = await asyncio.to_thread(write_text_atomic, absolute_path, content)
+            if written.changed:
+                content_cache.invalidate(absolute_path)
+                await list_code_definition_names_tool.refresh_file(absolute_path)
 
             return ToolResult(
                 success=True,
-                content=f"Archivo escrito exitosamente: {path}",
+                content=(
+                    f"Archivo escrito exitosamente: {path}"
+                    if written.changed
+                    else f"El archivo ya tenía ese contenido: {path}"
+                ),
                 metadata={
                     "file_path": path,
                     "absolute_path": absolute_path,
-                    "file_size": file_size,
+                    "file_size": written.size,
                     "lines_written": len(content.splitlines()),
-                    "created_new": not file_exists,
+                    "created_new": written.created,
+                    "changed": written.changed,
                 },
             )
 
@@ -243,7 +696,7 @@ class ReplaceInFileTool(BaseTool):
     def __init__(self):
         super().__init__()
         self.name = "replace_in_file"
-        self.description = "Reemplaza contenido específico en un archivo usando bloques SEARCH/REPLACE. Busca texto exacto y lo reemplaza"
+        self.description = "Reemplaza contenido específico en un archivo usando bloques SEARCH/REPLACE. Busca texto exacto y lo reemplaza; con 'edits' aplica varios bloques de una vez"
         self.tool_type = ToolType.FILE_OPERATION
         self.parameters = [
             ToolParameter(
@@ -255,15 +708,43 @@ class ReplaceInFileTool(BaseTool):
                 name="old_str",
                 type=str,
                 description="Texto exacto a buscar (debe coincidir completamente incluyendo espacios e indentación)",
+                required=False,
+            ),
+            ToolParameter(
+                name="new_str",
+                type=str,
+                description="Texto de reemplazo",
+                required=False,
+            ),
+            ToolParameter(
+                name="edits",
+                type=list,
+                description=(
+                    "Lista de bloques {'old_str': ..., 'new_str': ...} que se buscan "
+                    "en el contenido original y se aplican todos o ninguno"
+                ),
+                required=False,
             ),
-            ToolParameter(name="new_str", type=str, description="Texto de reemplazo"),
         ]
         self.requires_approval = True
 
     async def execute(self, **kwargs) -> ToolResult:
         path = kwargs["path"]
-        old_str = kwargs["old_str"]
-        new_str = kwargs["new_str"]
+        edits = kwargs.get("edits")
+        if edits is None:
+            if "old_str" not in kwargs or "new_str" not in kwargs:
+                return ToolResult(
+                    success=False,
+                    content="",
+                    error="Indique old_str y new_str, o una lista de edits",
+                )
+            edits = [{"old_str": kwargs["old_str"], "new_str": kwargs["new_str"]}]
+        elif not isinstance(edits, list) or not edits:
+            return ToolResult(
+                success=False,
+                content="",
+                error="edits debe ser una lista no vacía de bloques old_str/new_str",
+            )
 
         if not self.is_path_safe(path):
             return ToolResult(
@@ -282,39 +763,34 @@ class ReplaceInFileTool(BaseTool):
             async with aiofiles.open(absolute_path, "r", encoding="utf-8") as f:
                 content = await f.read()
 
-            # Verificar que el texto a buscar existe
-            if old_str not in content:
-                return ToolResult(
-                    success=False,
-                    content="",
-                    error=f"El texto especificado no se encontró en el archivo {path}",
-                )
-
-            # Contar ocurrencias
-            occurrences = content.count(old_str)
-            if occurrences > 1:
-                return ToolResult(
-                    success=False,
-                    content="",
-                    error=f"Se encontraron {occurrences} ocurrencias del texto. Debe ser más específico para reemplazar solo una",
-                )
-
-            # Realizar el reemplazo
-            new_content = content.replace(old_str, new_str, 1)
+            # Validar todos los bloques antes de modificar nada
+            new_content, error = self._apply_edits(content, edits, path)
+            if error:
+                return ToolResult(success=False, content="", error=error)
 
-            # Escribir el archivo modificado
-            async with aiofiles.open(absolute_path, "w", encoding="utf-8") as f:
-                await f.write(new_content)
+            # Escribir el archivo modificado (atómicamente)
+            written = await asyncio.to_thread(
+                write_text_atomic, absolute_path, new_content
+            )
+            if written.changed:
+                content_cache.invalidate(absolute_path)
+                await list_code_definition_names_tool.refresh_file(absolute_path)
 
             return ToolResult(
                 success=True,
-                content=f"Reemplazo realizado exitosamente en {path}",
+                content=(
+                    f"Reemplazo realizado exitosamente en {path}"
+                    if len(edits) == 1
+                    else f"{len(edits)} reemplazos realizados exitosamente en {path}"
+                ),
                 metadata={
                     "file_path": path,
                     "absolute_path": absolute_path,
-                    "old_length": len(old_str),
-                    "new_length": len(new_str),
-                    "file_size": os.path.getsize(absolute_path),
+                    "edits_applied": len(edits),
+                    "old_length": sum(len(edit["old_str"]) for edit in edits),
+                    "new_length": sum(len(edit["new_str"]) for edit in edits),
+                    "file_size": written.size,
+                    "changed": written.changed,
                 },
             )
 
@@ -325,6 +801,48 @@ class ReplaceInFileTool(BaseTool):
                 error=f"Error modificando el archivo {path}: {str(e)}",
             )
 
+    def _apply_edits(
+        self, content: str, edits: List[Dict[str, str]], path: str
+    ) -> Tuple[str, Optional[str]]:
+        """
+        Localiza cada bloque en el contenido original y construye el resultado
+        en una sola pasada. Retorna (contenido nuevo, None) o ("", error) si
+        algún bloque no aparece, aparece más de una vez o se solapa con otro.
+        """
+        spans = []
+        for number, edit in enumerate(edits, 1):
+            if not isinstance(edit, dict) or not {"old_str", "new_str"} <= edit.keys():
+                return "", f"El bloque {number} debe tener old_str y new_str"
+            old_str = edit["old_str"]
+            label = (
+                "El texto especificado" if len(edits) == 1 else f"El bloque {number}"
+            )
+            if not old_str:
+                return "", f"{label} tiene old_str vacío"
+
+            start = content.find(old_str)
+            if start < 0:
+                return "", f"{label} no se encontró en el archivo {path}"
+            if content.find(old_str, start + 1) >= 0:
+                occurrences = content.count(old_str)
+                return "", (
+                    f"{label} tiene {occurrences} ocurrencias. "
+                    "Debe ser más específico para reemplazar solo una"
+                )
+            spans.append((start, start + len(old_str), edit["new_str"], number))
+
+        spans.sort()
+        parts = []
+        position = 0
+        for start, end, new_str, number in spans:
+            if start < position:
+                return "", f"El bloque {number} se solapa con otro bloque"
+            parts.append(content[position:start])
+            parts.append(new_str)
+            position = end
+        parts.append(content[position:])
+        return "".join(parts), None
+
 
 class ListFilesTool(BaseTool):
     """Herramienta para listar archivos y directorios"""
@@ -380,66 +898,11 @@ class ListFilesTool(BaseTool):
             )
 
         try:
-            files = []
-            directories = []
-            count = 0
-
-            if recursive:
-                for root, dirs, filenames in os.walk(absolute_path):
-                    if count >= limit:
-                        break
-
-                    # Agregar directorios
-                    for dirname in dirs:
-                        if count >= limit:
-                            break
-                        full_path = os.path.join(root, dirname)
-                        rel_path = self.get_relative_path(full_path)
-                        directories.append(
-                            {"name": dirname, "path": rel_path, "type": "directory"}
-                        )
-                        count += 1
-
-                    # Agregar archivos
-                    for filename in filenames:
-                        if count >= limit:
-                            break
-                        full_path = os.path.join(root, filename)
-                        rel_path = self.get_relative_path(full_path)
-                        file_size = os.path.getsize(full_path)
-                        files.append(
-                            {
-                                "name": filename,
-                                "path": rel_path,
-                                "type": "file",
-                                "size": file_size,
-                            }
-                        )
-                        count += 1
-            else:
-                # Solo nivel superior
-                for item in os.listdir(absolute_path):
-                    if count >= limit:
-                        break
-
-                    item_path = os.path.join(absolute_path, item)
-                    rel_path = self.get_relative_path(item_path)
-
-                    if os.path.isdir(item_path):
-                        directories.append(
-                            {"name": item, "path": rel_path, "type": "directory"}
-                        )
-                    else:
-                        file_size = os.path.getsize(item_path)
-                        files.append(
-                            {
-                                "name": item,
-                                "path": rel_path,
-                                "type": "file",
-                                "size": file_size,
-                            }
-                        )
-                    count += 1
+            # El recorrido del disco (o la consulta al índice) va fuera del event loop
+            lister = self._list_recursive if recursive else self._list_top_level
+            directories, files, count = await asyncio.to_thread(
+                lister, absolute_path, limit
+            )
 
             # Ordenar resultados
             directories.sort(key=lambda x: x["name"])
@@ -471,6 +934,105 @@ class ListFilesTool(BaseTool):
                 error=f"Error listando archivos en {path}: {str(e)}",
             )
 
+    def _list_recursive(
+        self, absolute_path: str, limit: int
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], int]:
+        """Recorre el árbol hasta `limit` entradas: (directorios, archivos, cuenta)"""
+        files = []
+        directories = []
+        count = 0
+
+        for root, dirs, entries in self._walk_tree(absolute_path):
+            if count >= limit:
+                break
+
+            # Agregar directorios
+            for dirname in dirs:
+                if count >= limit:
+                    break
+                full_path = os.path.join(root, dirname)
+                rel_path = self.get_relative_path(full_path)
+                directories.append(
+                    {"name": dirname, "path": rel_path, "type": "directory"}
+                )
+                count += 1
+
+            # Agregar archivos
+            for name, file_path, size in entries:
+                if count >= limit:
+                    break
+                rel_path = self.get_relative_path(file_path)
+                files.append(
+                    {"name": name, "path": rel_path, "type": "file", "size": size}
+                )
+                count += 1
+
+        return directories, files, count
+
+    def _list_top_level(
+        self, absolute_path: str, limit: int
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], int]:
+        """Lista solo el primer nivel hasta `limit` entradas: (directorios, archivos, cuenta)"""
+        files = []
+        directories = []
+        count = 0
+
+        index = workspace_index_registry.find_index(absolute_path)
+        if index is not None:
+            dirnames, indexed_files = index.list_directory(absolute_path)
+            entries = ((entry.name, entry.path, entry.size) for entry in indexed_files)
+        else:
+            dirnames, filenames = workspace_walker.list_directory(absolute_path)
+            entries = self._sized_files(absolute_path, filenames)
+
+        for dirname in dirnames:
+            if count >= limit:
+                break
+            rel_path = self.get_relative_path(os.path.join(absolute_path, dirname))
+            directories.append({"name": dirname, "path": rel_path, "type": "directory"})
+            count += 1
+
+        for name, file_path, size in entries:
+            if count >= limit:
+                break
+            rel_path = self.get_relative_path(file_path)
+            files.append({"name": name, "path": rel_path, "type": "file", "size": size})
+            count += 1
+
+        return directories, files, count
+
+    def _walk_tree(
+        self, absolute_path: str
+    ) -> Iterator[Tuple[str, List[str], Iterator[Tuple[str, str, int]]]]:
+        """(directorio, subdirectorios, (nombre, ruta, tamaño) de sus archivos)
+
+        Si ya hay un índice del workspace que cubre la ruta se sirve desde
+        él. Si no, se recorre el disco de forma perezosa, de modo que el
+        llamador deja de leer directorios al alcanzar su límite en lugar de
+        construir un índice completo del árbol.
+        """
+        index = workspace_index_registry.find_index(absolute_path)
+        if index is not None:
+            for root, dirs, entries in index.walk(absolute_path):
+                yield root, dirs, (
+                    (entry.name, entry.path, entry.size) for entry in entries
+                )
+            return
+
+        for root, dirs, filenames in workspace_walker.walk(absolute_path):
+            yield root, dirs, self._sized_files(root, filenames)
+
+    @staticmethod
+    def _sized_files(root: str, filenames: List[str]) -> Iterator[Tuple[str, str, int]]:
+        """(nombre, ruta, tamaño) de los archivos de un directorio, bajo demanda"""
+        for filename in filenames:
+            file_path = os.path.join(root, filename)
+            try:
+                size = os.path.getsize(file_path)
+            except OSError:
+                continue
+            yield filename, file_path, size
+
 
 class ListCodeDefinitionNamesTool(BaseTool):
     """Herramienta para listar definiciones de código usando tree-sitter"""
@@ -489,26 +1051,68 @@ class ListCodeDefinitionNamesTool(BaseTool):
         ]
         self.requires_approval = False
 
-        # Configurar parsers de tree-sitter si está disponible
+        # Parsers y consultas de tree-sitter, cargados por lenguaje en el primer uso
         self.parsers = {}
-        if TREE_SITTER_AVAILABLE:
+        self.queries = {}
+        self.reference_queries = {}
+        self._unavailable_languages = set()
+        self._languages_lock = threading.Lock()
+        # Un parser de tree-sitter no admite usos concurrentes: cada lenguaje
+        # serializa sus parseos (y las ediciones de sus árboles) entre hilos
+        self._parser_locks: Dict[str, threading.RLock] = {}
+
+        # Último árbol parseado por ruta: (lenguaje, contenido, árbol)
+        self._trees: "OrderedDict[str, Tuple[str, bytes, Tree]]" = OrderedDict()
+        self._trees_lock = threading.Lock()
+
+    def _load_language(self, language: Optional[str]) -> bool:
+        """Carga (una sola vez) la gramática, el parser y la consulta de un lenguaje
+
+        Las consultas se ejecutan con QueryCursor (py-tree-sitter 0.25 o
+        posterior); con una versión anterior el lenguaje se marca como no
+        disponible y se usa el análisis por regex.
+        """
+        if language in self.parsers:
+            return True
+        if (
+            not TREE_SITTER_AVAILABLE
+            or language not in GRAMMARS
+            or language in self._unavailable_languages
+        ):
+            return False
+
+        with self._languages_lock:
+            if language in self.parsers:
+                return True
             try:
-                self.parsers["python"] = self._setup_parser(tspython.language())
-                self.parsers["javascript"] = self._setup_parser(tsjs.language())
-                self.parsers["typescript"] = self._setup_parser(tsts.language())
-                self.parsers["java"] = self._setup_parser(tsjava.language())
-                self.parsers["cpp"] = self._setup_parser(tscpp.language())
-                self.parsers["c"] = self._setup_parser(tsc.language())
-                self.parsers["rust"] = self._setup_parser(tsrust.language())
-                self.parsers["go"] = self._setup_parser(tsgo.language())
+                from tree_sitter import Language, Parser, Query
+
+                # Solo se comprueba que exista: las consultas lo importan al usarlo
+                from tree_sitter import QueryCursor  # noqa: F401
+
+                module_name, function_name = GRAMMARS[language]
+                module = importlib.import_module(module_name)
+                grammar = Language(getattr(module, function_name)())
+                query = Query(grammar, DEFINITION_QUERIES[language])
+                node_types = [
+                    node_type
+                    for node_type in REFERENCE_NODE_TYPES
+                    if grammar.id_for_node_kind(node_type, True)
+                ]
+                reference_query = Query(
+                    grammar,
+                    "[" + " ".join(f"({t})" for t in node_types) + "] @reference",
+                )
+                parser = Parser(grammar)
             except Exception:
-                pass
+                self._unavailable_languages.add(language)
+                return False
 
-    def _setup_parser(self, language):
-        """Configura un parser de tree-sitter"""
-        parser = Parser()
-        parser.set_language(language)
-        return parser
+            self.queries[language] = query
+            self.reference_queries[language] = reference_query
+            self._parser_locks[language] = threading.RLock()
+            self.parsers[language] = parser
+        return True
 
     async def execute(self, **kwargs) -> ToolResult:
         path = kwargs["path"]
@@ -527,7 +1131,7 @@ class ListCodeDefinitionNamesTool(BaseTool):
 
         try:
             definitions = {}
-
+            parallel = False
             if os.path.isfile(absolute_path):
                 # Analizar un solo archivo
                 file_defs = await self._analyze_file(absolute_path)
@@ -535,14 +1139,7 @@ class ListCodeDefinitionNamesTool(BaseTool):
                     definitions[self.get_relative_path(absolute_path)] = file_defs
             else:
                 # Analizar directorio
-                for root, dirs, files in os.walk(absolute_path):
-                    for filename in files:
-                        if self._is_code_file(filename):
-                            file_path = os.path.join(root, filename)
-                            file_defs = await self._analyze_file(file_path)
-                            if file_defs:
-                                rel_path = self.get_relative_path(file_path)
-                                definitions[rel_path] = file_defs
+                definitions, parallel = await self._analyze_directory(absolute_path)
 
             return ToolResult(
                 success=True,
@@ -551,6 +1148,7 @@ class ListCodeDefinitionNamesTool(BaseTool):
                     "path": path,
                     "files_analyzed": len(definitions),
                     "tree_sitter_available": TREE_SITTER_AVAILABLE,
+                    "parallel": parallel,
                 },
             )
 
@@ -563,154 +1161,328 @@ class ListCodeDefinitionNamesTool(BaseTool):
 
     def _is_code_file(self, filename: str) -> bool:
         """Verifica si un archivo es de código fuente"""
-        code_extensions = {
-            ".py",
-            ".js",
-            ".ts",
-            ".jsx",
-            ".tsx",
-            ".java",
-            ".cpp",
-            ".c",
-            ".h",
-            ".hpp",
-            ".rs",
-            ".go",
-            ".php",
-            ".rb",
-            ".cs",
-            ".swift",
-            ".kt",
-            ".scala",
+        return Path(filename).suffix.lower() in CODE_EXTENSIONS
+
+    async def _analyze_directory(
+        self, directory: str
+    ) -> Tuple[Dict[str, List[Dict[str, Any]]], bool]:
+        """Analiza los archivos de código de un directorio
+
+        Los archivos cuyo stat coincide con la caché se resuelven sin leerlos.
+        Si quedan muchos por analizar se reparten en lotes por un pool de
+        procesos (cada worker crea sus parsers una vez en el inicializador) y
+        cada lote se guarda en la caché en cuanto termina; con pocos se
+        analizan aquí, conservando los árboles para el reparseo incremental.
+        Retorna las definiciones por ruta relativa en orden de recorrido y si
+        se usó el pool de procesos.
+        """
+        files, results, pending = await asyncio.to_thread(
+            self._plan_directory, directory
+        )
+
+        parallel = (
+            len(pending) >= DEFINITIONS_PROCESS_THRESHOLD and (os.cpu_count() or 1) > 1
+        )
+        if parallel:
+            loop = asyncio.get_running_loop()
+            executor = tool_runtime.process_pool(
+                "definitions", initializer=_init_definitions_worker
+            )
+            cached_by_path = dict(pending)
+            futures = [
+                loop.run_in_executor(
+                    executor,
+                    _analyze_files_batch,
+                    [
+                        (file_path, cached[2] if cached else None)
+                        for file_path, cached in pending[
+                            start : start + DEFINITIONS_BATCH_SIZE
+                        ]
+                    ],
+                )
+                for start in range(0, len(pending), DEFINITIONS_BATCH_SIZE)
+            ]
+            for future in asyncio.as_completed(futures):
+                rows = []
+                for file_path, result in await future:
+                    row = _cache_row(file_path, result, cached_by_path[file_path])
+                    if row is not None:
+                        rows.append(row)
+                        results[file_path] = row[4]
+                await asyncio.to_thread(definitions_cache.store_many, rows)
+        else:
+            for file_path, cached in pending:
+                try:
+                    file_defs = await asyncio.to_thread(
+                        self._read_and_cache, file_path, cached
+                    )
+                except Exception:
+                    continue
+                if file_defs is not None:
+                    results[file_path] = file_defs
+
+        definitions = {
+            self.get_relative_path(file_path): results[file_path]
+            for file_path in files
+            if results.get(file_path)
         }
-        return Path(filename).suffix.lower() in code_extensions
+        return definitions, parallel
+
+    def _plan_directory(self, directory: str):
+        """Recorre el directorio separando aciertos de caché y archivos por analizar
+
+        Retorna (archivos en orden de recorrido, definiciones cacheadas por
+        ruta, lista de (ruta, entrada cacheada o None) por analizar).
+        """
+        files: List[str] = []
+        results: Dict[str, List[Dict[str, Any]]] = {}
+        pending: List[Tuple[str, Optional[CachedDefinitions]]] = []
+
+        for root, dirs, filenames in workspace_walker.walk(directory):
+            for filename in filenames:
+                if not self._is_code_file(filename):
+                    continue
+
+                # Saltar binarios y archivos demasiado grandes
+                file_path = os.path.join(root, filename)
+                if not file_classifier.is_text_file(file_path):
+                    continue
+
+                try:
+                    hit, cached = self._lookup_cached(file_path)
+                except OSError:
+                    continue
+                files.append(file_path)
+                if hit is not None:
+                    results[file_path] = hit
+                else:
+                    pending.append((file_path, cached))
+
+        return files, results, pending
 
     async def _analyze_file(self, file_path: str) -> Optional[List[Dict[str, Any]]]:
         """Analiza un archivo para extraer definiciones"""
         try:
-            # Leer el archivo
-            async with aiofiles.open(file_path, "r", encoding="utf-8") as f:
-                content = await f.read()
-
-            file_extension = Path(file_path).suffix.lower()
+            return await asyncio.to_thread(self._cached_definitions, file_path)
+        except Exception:
+            return None
+
+    async def refresh_file(self, file_path: str) -> None:
+        """Actualiza las definiciones de un archivo recién escrito
+
+        Solo actúa si su árbol sigue en memoria: el cambio se aplica con
+        `tree.edit()` y un reparseo incremental. El resto de archivos se
+        invalidan por su stat en el próximo análisis.
+        """
+        if file_path in self._trees:
+            await self._analyze_file(file_path)
+
+    def _cached_definitions(self, file_path: str) -> Optional[List[Dict[str, Any]]]:
+        """Definiciones de un archivo, usando la caché por stat y por hash"""
+        hit, cached = self._lookup_cached(file_path)
+        if hit is not None:
+            return hit
+        return self._read_and_cache(file_path, cached)
+
+    def _lookup_cached(
+        self, file_path: str
+    ) -> Tuple[Optional[List[Dict[str, Any]]], Optional[CachedDefinitions]]:
+        """(definiciones si el stat coincide con la caché, entrada cacheada o None)"""
+        stat = os.stat(file_path)
+        cached = definitions_cache.get(file_path)
+        if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return cached[3], cached
+        return None, cached
+
+    def _read_and_cache(
+        self, file_path: str, cached: Optional[CachedDefinitions]
+    ) -> Optional[List[Dict[str, Any]]]:
+        """Analiza un archivo en este proceso y guarda el resultado en la caché"""
+        result = self._read_definitions(file_path, cached[2] if cached else None)
+        row = _cache_row(file_path, result, cached)
+        if row is None:
+            return None
+        definitions_cache.store_many([row])
+        return row[4]
+
+    def _read_definitions(
+        self, file_path: str, cached_hash: Optional[str], keep_tree: bool = True
+    ) -> Optional[Tuple[int, int, str, Optional[List[Dict[str, Any]]]]]:
+        """Lee y analiza un archivo: (mtime_ns, tamaño, hash, definiciones)
+
+        Las definiciones son None si el hash coincide con `cached_hash` (no
+        hace falta parsear); retorna None si el archivo no es UTF-8.
+        """
+        stat = os.stat(file_path)
+        with open(file_path, "rb") as f:
+            data = f.read()
+        content_hash = hashlib.sha1(data).hexdigest()
+        if content_hash == cached_hash:
+            return stat.st_mtime_ns, stat.st_size, content_hash, None
+
+        definitions = self._definitions_for_bytes(file_path, data, keep_tree)
+        if definitions is None:
+            return None
+        return stat.st_mtime_ns, stat.st_size, content_hash, definitions
+
+    def _definitions_for_bytes(
+        self, file_path: str, data: bytes, keep_tree: bool = True
+    ) -> Optional[List[Dict[str, Any]]]:
+        """Extrae definiciones, reparseando de forma incremental si hay árbol previo"""
+        try:
+            content = data.decode("utf-8")
+        except UnicodeDecodeError:
+            return None
 
-            # Usar tree-sitter si está disponible
-            if TREE_SITTER_AVAILABLE:
-                return await self._analyze_with_tree_sitter(content, file_extension)
-            else:
-                # Fallback a análisis básico
-                return await self._analyze_with_regex(content, file_extension)
+        file_extension = Path(file_path).suffix.lower()
+        language = LANGUAGE_BY_EXTENSION.get(file_extension)
+        if not self._load_language(language):
+            return self._regex_definitions(content, file_extension)
 
+        try:
+            # El árbol queda en la caché compartida: se consulta antes de que
+            # otro hilo pueda editarlo para reparsear el mismo archivo
+            with self._parser_locks[language]:
+                if keep_tree:
+                    tree = self._parse_incremental(file_path, language, data)
+                else:
+                    tree = self.parsers[language].parse(data)
+                return self._extract_definitions(tree, language)
         except Exception:
-            try:
-                # Fallback a análisis básico
-                return await self._analyze_with_regex(content, file_extension)
-            except Exception:
-                return None
+            return self._regex_definitions(content, file_extension)
+
+    def _parse_incremental(self, file_path: str, language: str, data: bytes) -> "Tree":
+        """Parsea un archivo reutilizando su árbol anterior si sigue en memoria
+
+        Se llama con el lock del lenguaje tomado.
+        """
+        with self._trees_lock:
+            previous = self._trees.pop(file_path, None)
+        old_tree = None
+        if previous is not None and previous[0] == language:
+            _, old_data, old_tree = previous
+            start = _common_prefix_length(old_data, data)
+            suffix = _common_suffix_length(old_data, data, start)
+            old_end = len(old_data) - suffix
+            new_end = len(data) - suffix
+            old_tree.edit(
+                start_byte=start,
+                old_end_byte=old_end,
+                new_end_byte=new_end,
+                start_point=_point(old_data, start),
+                old_end_point=_point(old_data, old_end),
+                new_end_point=_point(data, new_end),
+            )
+
+        parser = self.parsers[language]
+        tree = parser.parse(data, old_tree) if old_tree else parser.parse(data)
 
-    async def _analyze_with_tree_sitter(
+        with self._trees_lock:
+            self._trees[file_path] = (language, data, tree)
+            while len(self._trees) > MAX_CACHED_TREES:
+                self._trees.popitem(last=False)
+        return tree
+
+    def definitions_for_content(
         self, content: str, file_extension: str
     ) -> List[Dict[str, Any]]:
-        """Analiza código usando tree-sitter"""
-        definitions = []
+        """Extrae definiciones de un contenido ya leído (síncrono)
+
+        Usa tree-sitter cuando hay parser para el lenguaje y el análisis
+        por regex en caso contrario. Lo comparten la herramienta y el
+        troceado de archivos del índice de embeddings.
+        """
+        language = LANGUAGE_BY_EXTENSION.get(file_extension)
+        if self._load_language(language):
+            return self._tree_sitter_definitions(content, language)
+        return self._regex_definitions(content, file_extension)
+
+    def symbols_for_content(
+        self, content: str, file_extension: str
+    ) -> Tuple[List[Dict[str, Any]], List[Tuple[str, int]]]:
+        """Definiciones y referencias (nombre, línea) de un contenido ya leído
+
+        Las referencias son los identificadores del archivo, una vez por
+        nombre y línea, salvo los que nombran una definición en esa línea.
+        Sin gramática para el lenguaje se usan los patrones regex y todos
+        los identificadores del texto.
+        """
+        language = LANGUAGE_BY_EXTENSION.get(file_extension)
+        tree = None
+        if self._load_language(language):
+            try:
+                with self._parser_locks[language]:
+                    tree = self.parsers[language].parse(content.encode("utf-8"))
+            except Exception:
+                tree = None
 
-        # Mapear extensiones a lenguajes
-        lang_map = {
-            ".py": "python",
-            ".js": "javascript",
-            ".jsx": "javascript",
-            ".ts": "typescript",
-            ".tsx": "typescript",
-            ".java": "java",
-            ".cpp": "cpp",
-            ".c": "c",
-            ".h": "c",
-            ".hpp": "cpp",
-            ".rs": "rust",
-            ".go": "go",
-        }
+        if tree is not None:
+            from tree_sitter import QueryCursor
+
+            definitions = self._extract_definitions(tree, language)
+            captures = QueryCursor(self.reference_queries[language]).captures(
+                tree.root_node
+            )
+            references = {
+                (node.text.decode("utf-8", errors="replace"), node.start_point[0] + 1)
+                for node in captures.get("reference", [])
+            }
+        else:
+            definitions = self._regex_definitions(content, file_extension)
+            references = {
+                (match.group(), line_number)
+                for line_number, line in enumerate(content.splitlines(), 1)
+                for match in _IDENTIFIER_PATTERN.finditer(line)
+            }
 
-        language = lang_map.get(file_extension)
-        if not language or language not in self.parsers:
-            return definitions
+        references -= {(d["name"], d["line"]) for d in definitions}
+        return definitions, sorted(references, key=lambda r: (r[1], r[0]))
 
+    def _tree_sitter_definitions(
+        self, content: str, language: str
+    ) -> List[Dict[str, Any]]:
+        """Parsea un contenido y extrae sus definiciones con tree-sitter"""
         try:
-            parser = self.parsers[language]
-            tree = parser.parse(content.encode("utf-8"))
-
-            def extract_definitions(node: Node, depth: int = 0):
-                if depth > 10:  # Evitar recursión infinita
-                    return
-
-                # Definiciones para diferentes lenguajes
-                if language == "python":
-                    if node.type in [
-                        "function_def",
-                        "class_definition",
-                        "async_function_def",
-                    ]:
-                        name_node = node.child_by_field_name("name")
-                        if name_node:
-                            definitions.append(
-                                {
-                                    "name": name_node.text.decode("utf-8"),
-                                    "type": "class"
-                                    if node.type == "class_definition"
-                                    else "function",
-                                    "line": node.start_point[0] + 1,
-                                }
-                            )
-                elif language in ["javascript", "typescript"]:
-                    if node.type in [
-                        "function_declaration",
-                        "class_declaration",
-                        "method_definition",
-                    ]:
-                        name_node = node.child_by_field_name("name")
-                        if name_node:
-                            definitions.append(
-                                {
-                                    "name": name_node.text.decode("utf-8"),
-                                    "type": "class"
-                                    if node.type == "class_declaration"
-                                    else "function",
-                                    "line": node.start_point[0] + 1,
-                                }
-                            )
-                elif language == "java":
-                    if node.type in [
-                        "class_declaration",
-                        "method_declaration",
-                        "interface_declaration",
-                    ]:
-                        name_node = node.child_by_field_name("name")
-                        if name_node:
-                            definitions.append(
-                                {
-                                    "name": name_node.text.decode("utf-8"),
-                                    "type": "class"
-                                    if node.type
-                                    in ["class_declaration", "interface_declaration"]
-                                    else "function",
-                                    "line": node.start_point[0] + 1,
-                                }
-                            )
-
-                # Recursivamente analizar nodos hijos
-                for child in node.children:
-                    extract_definitions(child, depth + 1)
-
-            extract_definitions(tree.root_node)
-
+            with self._parser_locks[language]:
+                tree = self.parsers[language].parse(content.encode("utf-8"))
+            return self._extract_definitions(tree, language)
         except Exception:
-            pass
+            return []
+
+    def _extract_definitions(self, tree: "Tree", language: str) -> List[Dict[str, Any]]:
+        """Extrae definiciones con la consulta precompilada del lenguaje
+
+        La captura se hace en C sobre todo el árbol, sin límite de
+        profundidad; las coincidencias llegan en orden de aparición. Los
+        errores se propagan para que el llamador recurra al análisis por
+        regex en lugar de guardar una lista vacía en la caché.
+        """
+        from tree_sitter import QueryCursor
+
+        definitions = []
+        query = self.queries[language]
+        for _, captures in QueryCursor(query).matches(tree.root_node):
+            if "definition.class" in captures:
+                node, definition_type = captures["definition.class"][0], "class"
+            else:
+                node, definition_type = (
+                    captures["definition.function"][0],
+                    "function",
+                )
+            definitions.append(
+                {
+                    "name": captures["name"][0].text.decode("utf-8"),
+                    "type": definition_type,
+                    "line": node.start_point[0] + 1,
+                }
+            )
 
         return definitions
 
-    async def _analyze_with_regex(
+    def _regex_definitions(
         self, content: str, file_extension: str
     ) -> List[Dict[str, Any]]:
-        """Análisis básico usando regex como fallback"""
+        """Patrones regex por lenguaje para extraer definiciones"""
         definitions = []
         lines = content.splitlines()
 
@@ -757,6 +1529,51 @@ class ListCodeDefinitionNamesTool(BaseTool):
         return definitions
 
 
+def _cache_row(
+    file_path: str,
+    result: Optional[Tuple[int, int, str, Optional[List[Dict[str, Any]]]]],
+    cached: Optional[CachedDefinitions],
+):
+    """Fila de caché a partir del resultado de `_read_definitions`"""
+    if result is None:
+        return None
+    mtime_ns, size, content_hash, definitions = result
+    if definitions is None:
+        # Mismo contenido que la entrada cacheada: solo cambió el stat
+        definitions = cached[3]
+    return file_path, mtime_ns, size, content_hash, definitions
+
+
+# Herramienta propia de cada proceso del pool de definiciones
+_worker_definitions_tool: Optional["ListCodeDefinitionNamesTool"] = None
+
+
+def _init_definitions_worker() -> None:
+    """Inicializador del pool: carga una vez las gramáticas y parsers del proceso
+
+    La herramienta carga los lenguajes en su primer uso; el worker los carga
+    todos aquí para que ningún lote pague la importación de una gramática.
+    """
+    global _worker_definitions_tool
+    _worker_definitions_tool = ListCodeDefinitionNamesTool()
+    for language in GRAMMARS:
+        _worker_definitions_tool._load_language(language)
+
+
+def _analyze_files_batch(jobs: List[Tuple[str, Optional[str]]]):
+    """Analiza en un proceso del pool un lote de (ruta, hash cacheado)"""
+    results = []
+    for file_path, cached_hash in jobs:
+        try:
+            result = _worker_definitions_tool._read_definitions(
+                file_path, cached_hash, keep_tree=False
+            )
+        except Exception:
+            result = None
+        results.append((file_path, result))
+    return results
+
+
 # Instancias de las herramientas
 read_file_tool = ReadFileTool()
 write_to_file_tool = WriteToFileTool()
@@ -0,0 +1,179 @@
+"""
+Lecturas por rango de archivos de texto grandes
+
+Los rangos (por líneas o por bytes) se sirven desde un mmap del archivo, sin
+cargarlo entero en memoria. Para localizar una línea se usa un índice
+disperso de saltos de línea: el número de saltos antes de cada bloque de
+LINE_INDEX_BLOCK_SIZE bytes. El índice se construye de forma perezosa (solo
+hasta la línea pedida), se guarda por ruta y se invalida al cambiar el
+(mtime, tamaño) del archivo, de modo que pedir las líneas 10.000-10.100 de
+un log de 2 GB recorre como mucho un bloque tras la primera lectura.
+"""
+
+import bisect
+import mmap
+import os
+import threading
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+# Granularidad del índice disperso (bytes por entrada)
+LINE_INDEX_BLOCK_SIZE = 16 * 1024
+
+# Bytes que se leen de una vez al extender el índice
+_SCAN_CHUNK_SIZE = 256 * LINE_INDEX_BLOCK_SIZE
+
+# Número de archivos cuyo índice se mantiene en memoria
+MAX_LINE_INDEXES = 64
+
+
+@dataclass(frozen=True)
+class TextRange:
+    """Fragmento de un archivo leído por rango"""
+
+    data: bytes
+    start_offset: int
+    end_offset: int
+    file_size: int
+    start_line: Optional[int] = None
+    end_line: Optional[int] = None
+    total_lines: Optional[int] = None
+
+
+class LineIndex:
+    """Índice disperso de saltos de línea de un archivo"""
+
+    def __init__(self, size: int):
+        self.size = size
+        # Saltos de línea antes de cada bloque ya recorrido (y al final)
+        self._newlines_before = array("Q", [0])
+
+    @property
+    def complete(self) -> bool:
+        """Indica si el índice ya cubre todo el archivo"""
+        return (len(self._newlines_before) - 1) * LINE_INDEX_BLOCK_SIZE >= self.size
+
+    def line_offset(self, view: mmap.mmap, line: int) -> Optional[int]:
+        """Offset del primer byte de la línea `line` (desde 1), o None si no existe"""
+        newlines = line - 1
+        if newlines <= 0:
+            return 0 if self.size else None
+
+        self._extend(view, newlines)
+        counts = self._newlines_before
+        if counts[-1] < newlines:
+            return None
+
+        # Bloque que contiene el salto de línea número `newlines`
+        block = bisect.bisect_left(counts, newlines) - 1
+        position = block * LINE_INDEX_BLOCK_SIZE
+        for _ in range(newlines - counts[block]):
+            position = view.find(b"\n", position) + 1
+        return position if position < self.size else None
+
+    def total_lines(self, view: mmap.mmap) -> Optional[int]:
+        """Número de líneas del archivo si el índice está completo"""
+        if not self.complete:
+            return None
+        unterminated = self.size and view[self.size - 1 : self.size] != b"\n"
+        return self._newlines_before[-1] + (1 if unterminated else 0)
+
+    def _extend(self, view: mmap.mmap, newlines: int) -> None:
+        """Recorre bloques nuevos hasta haber visto `newlines` saltos de línea"""
+        counts = self._newlines_before
+        while counts[-1] < newlines and not self.complete:
+            start = (len(counts) - 1) * LINE_INDEX_BLOCK_SIZE
+            chunk = view[start : start + _SCAN_CHUNK_SIZE]
+            total = counts[-1]
+            for offset in range(0, len(chunk), LINE_INDEX_BLOCK_SIZE):
+                total += chunk.count(b"\n", offset, offset + LINE_INDEX_BLOCK_SIZE)
+                counts.append(total)
+
+
+class RangeReader:
+    """Lecturas por líneas o por bytes con índices de línea cacheados por ruta"""
+
+    def __init__(self, max_indexes: int = MAX_LINE_INDEXES):
+        self.max_indexes = max_indexes
+        self._indexes: "OrderedDict[str, Tuple[int, int, LineIndex]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def read_lines(
+        self, path: str, start_line: int, end_line: Optional[int], max_bytes: int
+    ) -> TextRange:
+        """Lee las líneas [start_line, end_line] (desde 1, inclusivas)"""
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            if stat.st_size == 0:
+                return TextRange(b"", 0, 0, 0, start_line, start_line - 1, 0)
+
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                with self._lock:
+                    index = self._index_for(path, stat)
+                    start = index.line_offset(view, start_line)
+                    if start is None:
+                        return TextRange(
+                            b"",
+                            stat.st_size,
+                            stat.st_size,
+                            stat.st_size,
+                            start_line,
+                            start_line - 1,
+                            index.total_lines(view),
+                        )
+                    end = None
+                    if end_line is not None:
+                        end = index.line_offset(view, end_line + 1)
+                    total_lines = index.total_lines(view)
+
+                if end is None:
+                    end = stat.st_size
+                # Limitar el tamaño cortando en el último salto de línea
+                if end - start > max_bytes:
+                    cut = view.rfind(b"\n", start, start + max_bytes)
+                    end = cut + 1 if cut >= start else start + max_bytes
+                data = view[start:end]
+
+        last_line = start_line + data.count(b"\n") - 1
+        if data and not data.endswith(b"\n"):
+            last_line += 1
+        return TextRange(
+            data,
+            start,
+            end,
+            stat.st_size,
+            start_line,
+            last_line,
+            total_lines,
+        )
+
+    def read_bytes(self, path: str, offset: int, length: int) -> TextRange:
+        """Lee `length` bytes a partir de `offset`"""
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            start = min(offset, size)
+            end = min(start + length, size)
+            if start == end:
+                return TextRange(b"", start, end, size)
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                return TextRange(view[start:end], start, end, size)
+
+    def _index_for(self, path: str, stat: os.stat_result) -> LineIndex:
+        """Índice de la ruta, reconstruido si cambió el (mtime, tamaño)"""
+        cached = self._indexes.get(path)
+        if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            self._indexes.move_to_end(path)
+            return cached[2]
+
+        index = LineIndex(stat.st_size)
+        self._indexes[path] = (stat.st_mtime_ns, stat.st_size, index)
+        self._indexes.move_to_end(path)
+        while len(self._indexes) > self.max_indexes:
+            self._indexes.popitem(last=False)
+        return index
+
+
+# Lector compartido por read_file
+range_reader = RangeReader()
@@ -0,0 +1,187 @@
+"""
+Runtime compartido de las herramientas del CLI agent
+
+Mantiene un event loop de larga duración en un hilo de fondo al que todos los
+wrappers síncronos envían sus corrutinas. Así el loop, su executor por defecto
+y el pool de hilos de aiofiles se crean una sola vez por proceso en lugar de
+una vez por llamada a herramienta.
+
+También centraliza los pools de procesos que usan las herramientas para el
+trabajo intensivo en CPU, de modo que se crean bajo demanda, se reutilizan
+entre llamadas y se liberan con el mismo hook de apagado.
+"""
+
+import asyncio
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Coroutine, Dict, Optional, Tuple
+
+
+class ToolRuntime:
+    """Event loop persistente en un hilo de fondo para ejecutar herramientas"""
+
+    def __init__(self, thread_name: str = "cli-agent-tools"):
+        self.thread_name = thread_name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._pools: Dict[str, Executor] = {}
+        self._pool_configs: Dict[str, Tuple[Any, ...]] = {}
+
+    @property
+    def is_running(self) -> bool:
+        """Indica si el loop de fondo está activo"""
+        return self._thread is not None and self._thread.is_alive()
+
+    def _ensure_started(self) -> asyncio.AbstractEventLoop:
+        """Arranca el loop de fondo la primera vez que se necesita"""
+        with self._lock:
+            if self._loop is not None and self.is_running:
+                return self._loop
+
+            loop = asyncio.new_event_loop()
+            ready = threading.Event()
+
+            def _run_loop():
+                asyncio.set_event_loop(loop)
+                loop.call_soon(ready.set)
+                loop.run_forever()
+
+            thread = threading.Thread(
+                target=_run_loop, name=self.thread_name, daemon=True
+            )
+            thread.start()
+            ready.wait()
+
+            self._loop = loop
+            self._thread = thread
+            return loop
+
+    def run(
+        self, coro: Coroutine[Any, Any, Any], timeout: Optional[float] = None
+    ) -> Any:
+        """Ejecuta una corrutina en el loop de fondo y espera su resultado"""
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError(
+                "No se puede esperar sincrónicamente desde el propio loop de herramientas"
+            )
+
+        loop = self._ensure_started()
+        future = asyncio.run_coroutine_threadsafe(coro, loop)
+        try:
+            return future.result(timeout)
+        except BaseException:
+            future.cancel()
+            raise
+
+    def thread_pool(self, name: str = "io", max_workers: Optional[int] = None):
+        """Retorna (creándolo si hace falta) un pool de hilos con nombre"""
+        max_workers = max_workers or min(32, (os.cpu_count() or 1) + 4)
+        return self._get_pool(
+            f"threads:{name}",
+            (max_workers,),
+            lambda: ThreadPoolExecutor(
+                max_workers=max_workers,
+                thread_name_prefix=f"{self.thread_name}-{name}",
+            ),
+        )
+
+    def process_pool(
+        self,
+        name: str = "cpu",
+        max_workers: Optional[int] = None,
+        initializer: Optional[Callable[..., Any]] = None,
+        initargs: Tuple[Any, ...] = (),
+    ):
+        """Retorna (creándolo si hace falta) un pool de procesos con nombre
+
+        Se usa el método 'spawn' porque el proceso ya tiene hilos vivos (el
+        loop de fondo) y hacer fork en ese estado puede dejar bloqueos
+        heredados en los procesos hijos.
+        """
+        max_workers = max_workers or os.cpu_count() or 1
+        return self._get_pool(
+            f"processes:{name}",
+            (max_workers, initializer, tuple(initargs)),
+            lambda: ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=initializer,
+                initargs=initargs,
+            ),
+        )
+
+    def _get_pool(
+        self, key: str, config: Tuple[Any, ...], factory: Callable[[], Executor]
+    ) -> Executor:
+        """Obtiene un pool del registro o lo crea con la fábrica dada
+
+        Un pool con nombre tiene una sola configuración: pedirlo con otro
+        tamaño, inicializador o argumentos es un error y no devuelve en
+        silencio el pool creado antes.
+        """
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                pool = factory()
+                self._pools[key] = pool
+                self._pool_configs[key] = config
+            elif self._pool_configs[key] != config:
+                raise ValueError(f"El pool '{key}' ya existe con otra configuración")
+            return pool
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        """Cancela tareas pendientes, libera los pools y detiene el loop"""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            pools = list(self._pools.values())
+            self._loop = None
+            self._thread = None
+            self._pools.clear()
+            self._pool_configs.clear()
+
+        for pool in pools:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        if loop is None or thread is None or not thread.is_alive():
+            return
+
+        async def _drain():
+            current = asyncio.current_task()
+            tasks = [t for t in asyncio.all_tasks() if t is not current]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await loop.shutdown_asyncgens()
+            await loop.shutdown_default_executor()
+
+        try:
+            asyncio.run_coroutine_threadsafe(_drain(), loop).result(timeout)
+        except Exception:
+            pass
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join(timeout)
+            if not thread.is_alive():
+                loop.close()
+
+
+# Runtime global compartido por todos los wrappers
+tool_runtime = ToolRuntime()
+
+
+def run_tool_coroutine(coro: Coroutine[Any, Any, Any]) -> Any:
+    """Ejecuta una corrutina de herramienta en el runtime compartido"""
+    return tool_runtime.run(coro)
+
+
+def shutdown_tool_runtime() -> None:
+    """Hook de apagado: libera el loop de fondo y sus recursos"""
+    tool_runtime.shutdown()
+
+
+atexit.register(shutdown_tool_runtime)
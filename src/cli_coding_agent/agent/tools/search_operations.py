@@ -4,20 +4,51 @@ Herramientas de operaciones de búsqueda para el CLI agent - Inspiradas en Cline
 
 import os
 import re
+import json
 import asyncio
+import fnmatch
+import functools
+import heapq
+import sqlite3
 import subprocess
-from pathlib import Path
-from typing import List, Dict, Any
-import aiofiles
-from .base import BaseTool, ToolResult, ToolParameter, ToolType
-
-# Importaciones opcionales para búsqueda fuzzy
-try:
+import threading
+from abc import abstractmethod
+from bisect import bisect_left, bisect_right
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
+from ..agent_config import agent_config
+from .bm25_index import bm25_index
+from .embedding_index import NUMPY_AVAILABLE, embedding_index
+from .base import BaseTool, ToolResult, ToolParameter, ToolType, module_available
+from .file_classifier import SNIFF_BLOCK_SIZE, file_classifier, is_binary_block
+from .runtime import tool_runtime
+from .symbol_index import symbol_index
+from .trigram_index import build_query, trigram_index
+from .workspace_index import WorkspaceIndex, workspace_index_registry
+from .workspace_walker import visible_files_walker
+
+# Dependencias opcionales para búsqueda fuzzy (rapidfuzz puntúa en lote en C):
+# se detectan sin importarlas y se cargan en la primera búsqueda
+RAPIDFUZZ_AVAILABLE = module_available("rapidfuzz")
+FUZZYWUZZY_AVAILABLE = module_available("fuzzywuzzy")
+
+
+@functools.lru_cache(maxsize=None)
+def _rapidfuzz_modules():
+    """Importa rapidfuzz (una sola vez): (fuzz, process, default_process)"""
+    from rapidfuzz import fuzz, process
+    from rapidfuzz.utils import default_process
+
+    return fuzz, process, default_process
+
+
+@functools.lru_cache(maxsize=None)
+def _fuzzywuzzy_modules():
+    """Importa fuzzywuzzy (una sola vez): (fuzz, process)"""
     from fuzzywuzzy import fuzz, process
 
-    FUZZYWUZZY_AVAILABLE = True
-except ImportError:
-    FUZZYWUZZY_AVAILABLE = False
+    return fuzz, process
+
 
 # Para búsqueda con ripgrep si está disponible
 RIPGREP_AVAILABLE = False
@@ -28,6 +59,270 @@ try:
 except Exception:
     pass
 
+# Límite del buffer de lectura por línea JSON de ripgrep (líneas muy largas)
+RIPGREP_LINE_LIMIT = 16 * 1024 * 1024
+
+# Máximo de archivos preseleccionados que se pasan a ripgrep como argumentos
+RIPGREP_MAX_FILE_ARGS = 1000
+
+
+# Parámetros del escaneo concurrente de la búsqueda manual
+MANUAL_SEARCH_BATCH_SIZE = 32
+MANUAL_SEARCH_MAX_IN_FLIGHT = max(4, (os.cpu_count() or 1) * 2)
+MANUAL_SEARCH_PROCESS_THRESHOLD = 2000
+
+_NEWLINE_PATTERN = re.compile("\n")
+
+
+def _read_searchable_text(
+    file_path: str,
+) -> Tuple[Optional[str], Optional[os.stat_result]]:
+    """Lee un archivo para buscar en él, descartando contenido binario
+
+    Retorna el texto decodificado (None si el archivo es binario o no se
+    puede leer) junto con el stat del descriptor abierto, que el llamador
+    usa para cachear el veredicto del clasificador.
+    """
+    try:
+        with open(file_path, "rb") as f:
+            stat_result = os.fstat(f.fileno())
+            head = f.read(SNIFF_BLOCK_SIZE)
+            if is_binary_block(head):
+                return None, stat_result
+            data = head + f.read()
+    except OSError:
+        return None, None
+
+    return data.decode("utf-8", errors="ignore"), stat_result
+
+
+def _scan_content(
+    content: str,
+    pattern: re.Pattern,
+    context_lines: int,
+    file_path: str,
+    max_matches: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """Escanea un buffer completo con una sola pasada del regex
+
+    Los archivos sin coincidencias se descartan con una única búsqueda en C
+    sobre todo el contenido. Esa búsqueda solo sirve para saltar a la
+    siguiente línea candidata: la coincidencia real se evalúa acotada a la
+    línea, sin su retorno de carro, así que los patrones que cruzarían un
+    salto de línea y las anclas de fin de línea en archivos CRLF se
+    comportan igual que con una búsqueda línea a línea o con ripgrep. Los
+    saltos CRLF se normalizan antes del filtro previo para que este no
+    descarte líneas que sí coinciden. El índice de offsets de saltos de
+    línea traduce cada posición a su número de línea con una búsqueda
+    binaria y permite recortar las líneas de contexto sin dividir el
+    archivo entero.
+    """
+    if "\r\n" in content:
+        content = content.replace("\r\n", "\n")
+
+    candidate = pattern.search(content)
+    if candidate is None:
+        return []
+
+    newlines = [m.start() for m in _NEWLINE_PATTERN.finditer(content)]
+    # Igual que splitlines(): un salto final no abre una línea vacía más
+    total_lines = len(newlines) + (0 if content.endswith("\n") or not content else 1)
+
+    def line_bounds(index: int) -> Tuple[int, int]:
+        start = newlines[index - 1] + 1 if index > 0 else 0
+        end = newlines[index] if index < len(newlines) else len(content)
+        if end > start and content[end - 1] == "\r":
+            end -= 1
+        return start, end
+
+    # Las ventanas de contexto se solapan cuando hay coincidencias cercanas:
+    # cada línea se recorta del buffer una sola vez
+    line_cache: Dict[int, str] = {}
+
+    def line_text(index: int) -> str:
+        text = line_cache.get(index)
+        if text is None:
+            start, end = line_bounds(index)
+            text = line_cache[index] = content[start:end]
+        return text
+
+    results = []
+    line_index = 0
+
+    while candidate is not None:
+        line_index = bisect_left(newlines, candidate.start(), line_index)
+        if line_index >= total_lines:
+            break
+
+        # La coincidencia del buffer puede cruzar saltos de línea: se repite
+        # la búsqueda acotada a la línea candidata
+        start, end = line_bounds(line_index)
+        match = pattern.search(content, start, end)
+        if match is not None:
+            before_start = max(0, line_index - context_lines)
+            after_end = min(total_lines, line_index + context_lines + 1)
+
+            results.append(
+                {
+                    "file": file_path,
+                    "line_number": line_index + 1,
+                    "line_content": line_text(line_index),
+                    "match_text": match.group(0),
+                    "before_context": [
+                        line_text(i) for i in range(before_start, line_index)
+                    ],
+                    "after_context": [
+                        line_text(i) for i in range(line_index + 1, after_end)
+                    ],
+                }
+            )
+            if len(results) == max_matches:
+                break
+
+        # Una coincidencia por línea: continuar desde el inicio de la siguiente
+        if line_index >= len(newlines):
+            break
+        candidate = pattern.search(content, newlines[line_index] + 1)
+
+    return results
+
+
+def _scan_files_batch(
+    file_paths: List[str],
+    regex: str,
+    flags: int,
+    context_lines: int,
+    max_matches: Optional[int] = None,
+) -> List[Tuple[str, List[Dict[str, Any]], Optional[Tuple[int, int, bool]]]]:
+    """Escanea un lote de archivos; agrupar reduce el coste de IPC por archivo
+
+    Junto a los resultados de cada archivo retorna su veredicto de texto
+    (mtime_ns, tamaño, es_texto) para que el proceso principal lo cachee.
+    """
+    pattern = re.compile(regex, flags)
+    batch_results = []
+
+    for file_path in file_paths:
+        content, stat_result = _read_searchable_text(file_path)
+        verdict = None
+        if stat_result is not None:
+            verdict = (
+                stat_result.st_mtime_ns,
+                stat_result.st_size,
+                content is not None,
+            )
+
+        results = []
+        if content:
+            results = _scan_content(
+                content, pattern, context_lines, file_path, max_matches
+            )
+        batch_results.append((file_path, results, verdict))
+
+    return batch_results
+
+
+class _RipgrepContextCollector:
+    """Máquina de estados que asocia los eventos JSON de ripgrep a coincidencias
+
+    ripgrep emite por archivo una secuencia begin/context/match/end en la que
+    cada línea dentro de la ventana de contexto aparece una sola vez, aunque
+    las ventanas de varias coincidencias se solapen. El colector guarda las
+    últimas líneas vistas para el contexto anterior y reparte cada línea
+    nueva entre las coincidencias pendientes de contexto posterior, de modo
+    que el resultado es idéntico al de la búsqueda manual.
+    """
+
+    def __init__(
+        self,
+        context_lines: int,
+        max_results: int,
+        to_relative_path: Callable[[str], str],
+    ):
+        self.context_lines = max(0, context_lines)
+        self.max_results = max_results
+        self.to_relative_path = to_relative_path
+        self.results: List[Dict[str, Any]] = []
+        self._recent: Deque[Tuple[int, str]] = deque(maxlen=self.context_lines)
+        self._pending: Deque[Dict[str, Any]] = deque()
+
+    @property
+    def is_complete(self) -> bool:
+        """Indica si ya hay max_results coincidencias con su contexto completo"""
+        return len(self.results) >= self.max_results and not self._pending
+
+    def feed(self, raw_line: bytes) -> None:
+        """Procesa una línea JSON de la salida de ripgrep"""
+        if not raw_line.strip():
+            return
+
+        try:
+            event = json.loads(raw_line)
+            event_type = event.get("type")
+
+            if event_type in ("begin", "end"):
+                self._reset_file()
+                return
+            if event_type not in ("context", "match"):
+                return
+
+            data = event["data"]
+            line_number = data["line_number"]
+            text = data["lines"]["text"].rstrip("\r\n")
+        except (json.JSONDecodeError, KeyError, TypeError, AttributeError):
+            return
+
+        self._extend_pending(line_number, text)
+
+        if event_type == "match" and len(self.results) < self.max_results:
+            submatches = data.get("submatches") or []
+            try:
+                match_text = submatches[0]["match"]["text"] if submatches else ""
+            except (KeyError, TypeError):
+                match_text = ""
+
+            result = {
+                "file": self.to_relative_path(data["path"]["text"]),
+                "line_number": line_number,
+                "line_content": text,
+                "match_text": match_text,
+                "before_context": [
+                    recent_text
+                    for recent_number, recent_text in self._recent
+                    if recent_number >= line_number - self.context_lines
+                ],
+                "after_context": [],
+            }
+            self.results.append(result)
+            if self.context_lines:
+                self._pending.append(result)
+
+        if self.context_lines:
+            self._recent.append((line_number, text))
+
+    def finish(self) -> List[Dict[str, Any]]:
+        """Cierra el archivo en curso y retorna los resultados"""
+        self._reset_file()
+        return self.results
+
+    def _extend_pending(self, line_number: int, text: str) -> None:
+        """Añade una línea al contexto posterior de las coincidencias pendientes"""
+        for result in self._pending:
+            window_end = result["line_number"] + self.context_lines
+            if result["line_number"] < line_number <= window_end:
+                result["after_context"].append(text)
+
+        # Las ventanas terminan en el mismo orden en que empezaron
+        while self._pending and (
+            line_number >= self._pending[0]["line_number"] + self.context_lines
+        ):
+            self._pending.popleft()
+
+    def _reset_file(self) -> None:
+        """Descarta el estado ligado al archivo actual"""
+        self._recent.clear()
+        self._pending.clear()
+
 
 class SearchFilesTool(BaseTool):
     """Herramienta para búsqueda regex en múltiples archivos con contexto"""
@@ -92,15 +387,28 @@ class SearchFilesTool(BaseTool):
             )
 
         try:
+            # Preseleccionar archivos con el índice de trigramas si es posible
+            candidates = await self._indexed_candidates(absolute_path, regex)
+
             # Intentar usar ripgrep si está disponible
             if RIPGREP_AVAILABLE:
                 results = await self._search_with_ripgrep(
-                    absolute_path, regex, file_pattern, context_lines, max_results
+                    absolute_path,
+                    regex,
+                    file_pattern,
+                    context_lines,
+                    max_results,
+                    candidates,
                 )
             else:
                 # Fallback a búsqueda manual
                 results = await self._search_manual(
-                    absolute_path, regex, file_pattern, context_lines, max_results
+                    absolute_path,
+                    regex,
+                    file_pattern,
+                    context_lines,
+                    max_results,
+                    candidates,
                 )
 
             formatted_results = self._format_search_results(results)
@@ -115,6 +423,10 @@ class SearchFilesTool(BaseTool):
                     "total_matches": len(results),
                     "context_lines": context_lines,
                     "used_ripgrep": RIPGREP_AVAILABLE,
+                    "used_index": candidates is not None,
+                    "candidate_files": (
+                        len(candidates) if candidates is not None else None
+                    ),
                 },
             )
 
@@ -125,6 +437,42 @@ class SearchFilesTool(BaseTool):
                 error=f"Error realizando búsqueda en {path}: {str(e)}",
             )
 
+    async def _indexed_candidates(
+        self, absolute_path: str, regex: str
+    ) -> Optional[Set[str]]:
+        """Archivos que pueden contener coincidencias según el índice de trigramas
+
+        Retorna None cuando no se debe filtrar: índice desactivado, búsqueda
+        sobre un único archivo, patrón sin trigramas obligatorios, índice
+        aún en construcción o error al acceder al índice.
+        """
+        if not agent_config.SEARCH_INDEX_ENABLED or os.path.isfile(absolute_path):
+            return None
+
+        query = build_query(regex)
+        if query is None:
+            return None
+
+        index = await asyncio.to_thread(
+            workspace_index_registry.get_index, absolute_path, self.working_directory
+        )
+        if not trigram_index.is_ready(index):
+            # Primera búsqueda en esta raíz: ripgrep o el escaneo manual
+            # responden mientras el índice se construye en segundo plano
+            return None
+        try:
+            # Mismo criterio que ripgrep y el escaneo manual: sin ocultos. rg
+            # busca siempre las rutas explícitas, así que filtrarlas aquí
+            return await asyncio.to_thread(
+                trigram_index.candidates,
+                index,
+                absolute_path,
+                query,
+                include_hidden=False,
+            )
+        except (sqlite3.Error, OSError):
+            return None
+
     async def _search_with_ripgrep(
         self,
         directory: str,
@@ -132,8 +480,22 @@ class SearchFilesTool(BaseTool):
         file_pattern: str,
         context_lines: int,
         max_results: int,
+        candidates: Optional[Set[str]] = None,
     ) -> List[Dict[str, Any]]:
-        """Búsqueda usando ripgrep"""
+        """Búsqueda usando ripgrep leyendo su salida JSON en streaming"""
+        targets = [directory]
+        if candidates is not None and "/" not in file_pattern:
+            # ripgrep no aplica --glob a las rutas explícitas: filtrar aquí
+            files = sorted(
+                path
+                for path in candidates
+                if fnmatch.fnmatchcase(os.path.basename(path), file_pattern)
+            )
+            if not files:
+                return []
+            if len(files) <= RIPGREP_MAX_FILE_ARGS:
+                targets = files
+
         cmd = [
             "rg",
             "--json",
@@ -143,52 +505,70 @@ class SearchFilesTool(BaseTool):
             file_pattern,
             "--max-count",
             str(max_results),
+            "--",
             regex,
-            directory,
+            *targets,
         ]
 
         try:
             proc = await asyncio.create_subprocess_exec(
-                *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+                *cmd,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                limit=RIPGREP_LINE_LIMIT,
             )
+        except Exception as e:
+            raise Exception(f"Error ejecutando ripgrep: {str(e)}")
 
-            stdout, stderr = await proc.communicate()
-
-            if proc.returncode != 0 and proc.returncode != 1:
-                raise Exception(f"Error en ripgrep: {stderr.decode()}")
-
-            results = []
-            for line in stdout.decode().splitlines():
-                if line.strip():
-                    try:
-                        import json
-
-                        data = json.loads(line)
-                        if data.get("type") == "match":
-                            match_data = data["data"]
-                            results.append(
-                                {
-                                    "file": self.get_relative_path(
-                                        match_data["path"]["text"]
-                                    ),
-                                    "line_number": match_data["line_number"],
-                                    "line_content": match_data["lines"][
-                                        "text"
-                                    ].rstrip(),
-                                    "match_text": match_data["submatches"][0]["match"][
-                                        "text"
-                                    ],
-                                    "before_context": [],
-                                    "after_context": [],
-                                }
-                            )
-                    except (json.JSONDecodeError, KeyError):
-                        continue
+        # Drenar stderr en paralelo para que rg nunca se bloquee escribiendo
+        stderr_task = asyncio.create_task(proc.stderr.read())
+        collector = _RipgrepContextCollector(
+            context_lines, max_results, self.get_relative_path
+        )
+        terminated_early = False
 
-            return results
+        try:
+            # Procesar la salida línea a línea: la memoria queda acotada por
+            # max_results y no por el tamaño del repositorio
+            while not collector.is_complete:
+                try:
+                    line = await proc.stdout.readline()
+                except ValueError:
+                    # Línea JSON mayor que el límite del buffer: descartarla
+                    continue
+                if not line:
+                    break
 
-        except Exception as e:
-            raise Exception(f"Error ejecutando ripgrep: {str(e)}")
+                collector.feed(line)
+
+            if collector.is_complete:
+                # Límite alcanzado y contexto posterior completo: terminar rg
+                # en lugar de esperar al resto de la salida
+                terminated_early = True
+                self._kill_process(proc)
+
+            await proc.wait()
+            stderr = await stderr_task
+        except BaseException:
+            self._kill_process(proc)
+            stderr_task.cancel()
+            raise
+
+        if not terminated_early and proc.returncode not in (0, 1):
+            raise Exception(
+                f"Error ejecutando ripgrep: {stderr.decode(errors='replace')}"
+            )
+
+        return collector.finish()
+
+    @staticmethod
+    def _kill_process(proc: asyncio.subprocess.Process) -> None:
+        """Termina un subproceso si sigue vivo"""
+        if proc.returncode is None:
+            try:
+                proc.kill()
+            except ProcessLookupError:
+                pass
 
     async def _search_manual(
         self,
@@ -197,84 +577,126 @@ class SearchFilesTool(BaseTool):
         file_pattern: str,
         context_lines: int,
         max_results: int,
+        candidates: Optional[Set[str]] = None,
     ) -> List[Dict[str, Any]]:
-        """Búsqueda manual sin ripgrep"""
+        """Búsqueda manual sin ripgrep con escaneo concurrente de archivos
+
+        Un productor recorre el árbol en un hilo y entrega lotes de archivos
+        en orden determinista; los lotes se buscan en paralelo (hilos para
+        árboles pequeños, procesos cuando el árbol es grande) y se consumen
+        en el mismo orden en que se produjeron, de modo que el resultado no
+        depende de qué worker termina antes. Al alcanzar max_results se
+        cancelan los lotes pendientes y se detiene el recorrido.
+        """
+        flags = re.MULTILINE | re.IGNORECASE
         try:
-            pattern = re.compile(regex, re.MULTILINE | re.IGNORECASE)
+            re.compile(regex, flags)
         except re.error as e:
             raise Exception(f"Patrón regex inválido: {str(e)}")
 
-        results = []
-
-        # Buscar archivos que coincidan con el patrón
-        for root, dirs, files in os.walk(directory):
-            for filename in files:
-                if len(results) >= max_results:
-                    break
-
-                if self._matches_pattern(filename, file_pattern):
-                    file_path = os.path.join(root, filename)
-
-                    try:
-                        file_results = await self._search_in_file(
-                            file_path, pattern, context_lines
-                        )
-                        results.extend(file_results)
-
-                        if len(results) >= max_results:
-                            results = results[:max_results]
-                            break
-
-                    except Exception:
+        loop = asyncio.get_running_loop()
+        stop_walking = threading.Event()
+        batches: asyncio.Queue = asyncio.Queue(maxsize=MANUAL_SEARCH_MAX_IN_FLIGHT)
+
+        def produce():
+            batch = []
+            try:
+                for file_path in self._iter_candidate_files(directory, file_pattern):
+                    if stop_walking.is_set():
+                        return
+                    if candidates is not None and file_path not in candidates:
                         continue
+                    batch.append(file_path)
+                    if len(batch) >= MANUAL_SEARCH_BATCH_SIZE:
+                        asyncio.run_coroutine_threadsafe(
+                            batches.put(batch), loop
+                        ).result()
+                        batch = []
+                if batch and not stop_walking.is_set():
+                    asyncio.run_coroutine_threadsafe(batches.put(batch), loop).result()
+            finally:
+                asyncio.run_coroutine_threadsafe(batches.put(None), loop).result()
+
+        producer = loop.run_in_executor(None, produce)
+        in_flight: Deque[asyncio.Future] = deque()
+        results: List[Dict[str, Any]] = []
+        files_submitted = 0
+        walk_finished = False
 
-            if len(results) >= max_results:
-                break
-
-        return results
-
-    async def _search_in_file(
-        self, file_path: str, pattern: re.Pattern, context_lines: int
-    ) -> List[Dict[str, Any]]:
-        """Busca en un archivo específico"""
         try:
-            async with aiofiles.open(
-                file_path, "r", encoding="utf-8", errors="ignore"
-            ) as f:
-                content = await f.read()
-
-            lines = content.splitlines()
-            results = []
-
-            for i, line in enumerate(lines):
-                if pattern.search(line):
-                    # Obtener contexto antes
-                    before_start = max(0, i - context_lines)
-                    before_context = lines[before_start:i]
-
-                    # Obtener contexto después
-                    after_end = min(len(lines), i + context_lines + 1)
-                    after_context = lines[i + 1 : after_end]
-
-                    # Encontrar el texto que coincide
-                    match = pattern.search(line)
-                    match_text = match.group(0) if match else ""
-
-                    results.append(
-                        {
-                            "file": self.get_relative_path(file_path),
-                            "line_number": i + 1,
-                            "line_content": line,
-                            "match_text": match_text,
-                            "before_context": before_context,
-                            "after_context": after_context,
-                        }
+            while len(results) < max_results:
+                # Mantener la ventana de lotes en vuelo llena
+                while (
+                    not walk_finished and len(in_flight) < MANUAL_SEARCH_MAX_IN_FLIGHT
+                ):
+                    if in_flight and batches.empty():
+                        break
+                    batch = await batches.get()
+                    if batch is None:
+                        walk_finished = True
+                        break
+                    executor = self._select_executor(files_submitted)
+                    files_submitted += len(batch)
+                    in_flight.append(
+                        loop.run_in_executor(
+                            executor,
+                            _scan_files_batch,
+                            batch,
+                            regex,
+                            flags,
+                            context_lines,
+                            max_results,
+                        )
                     )
 
-            return results
+                if not in_flight:
+                    break
+
+                # Consumir en orden de producción para un resultado determinista
+                for file_path, file_results, verdict in await in_flight.popleft():
+                    if verdict is not None:
+                        file_classifier.record(file_path, *verdict)
+                    relative_path = self.get_relative_path(file_path)
+                    for result in file_results:
+                        result["file"] = relative_path
+                    results.extend(file_results)
+        finally:
+            stop_walking.set()
+            for future in in_flight:
+                future.cancel()
+            # Desbloquear al productor si espera espacio en la cola
+            while not producer.done():
+                while not batches.empty():
+                    batches.get_nowait()
+                await asyncio.sleep(0.001)
+
+        return results[:max_results]
+
+    def _iter_candidate_files(self, directory: str, file_pattern: str):
+        """Recorre el directorio en orden determinista filtrando por patrón y tipo"""
+        if os.path.isfile(directory):
+            yield directory
+            return
+
+        # Mismo criterio que ripgrep: sin ocultos y respetando .gitignore
+        for root, dirs, files in visible_files_walker.walk(directory):
+            for filename in files:
+                if not self._matches_pattern(filename, file_pattern):
+                    continue
+
+                # Descartar binarios, archivos enormes y veredictos cacheados
+                file_path = os.path.join(root, filename)
+                if file_classifier.precheck(file_path) is not False:
+                    yield file_path
 
-        except Exception:
-            return []
+    def _select_executor(self, files_submitted: int):
+        """Elige hilos para árboles pequeños y procesos para árboles grandes"""
+        if (
+            files_submitted >= MANUAL_SEARCH_PROCESS_THRESHOLD
+            and (os.cpu_count() or 1) > 1
+        ):
+            return tool_runtime.process_pool("search")
+        return tool_runtime.thread_pool("search")
 
     def _matches_pattern(self, filename: str, pattern: str) -> bool:
         """Verifica si un nombre de archivo coincide con el patrón"""
@@ -355,6 +777,8 @@ class FileSearchTool(BaseTool):
             ),
         ]
         self.requires_approval = False
+        # Catálogo de archivos y nombres normalizados por generación del índice
+        self._catalog: Optional[Tuple[tuple, List[Dict[str, Any]], List[str]]] = None
 
     async def execute(self, **kwargs) -> ToolResult:
         query = kwargs["query"]
@@ -378,7 +802,7 @@ class FileSearchTool(BaseTool):
             all_files = await self._collect_files(absolute_path)
 
             # Realizar búsqueda fuzzy
-            if FUZZYWUZZY_AVAILABLE:
+            if RAPIDFUZZ_AVAILABLE or FUZZYWUZZY_AVAILABLE:
                 matches = await self._fuzzy_search(all_files, query, limit)
             else:
                 matches = await self._simple_search(all_files, query, limit)
@@ -393,7 +817,7 @@ class FileSearchTool(BaseTool):
                     "path": path,
                     "total_files_searched": len(all_files),
                     "matches_found": len(matches),
-                    "used_fuzzy": FUZZYWUZZY_AVAILABLE,
+                    "used_fuzzy": RAPIDFUZZ_AVAILABLE or FUZZYWUZZY_AVAILABLE,
                 },
             )
 
@@ -405,62 +829,101 @@ class FileSearchTool(BaseTool):
             )
 
     async def _collect_files(self, directory: str) -> List[Dict[str, Any]]:
-        """Recopila todos los archivos en el directorio"""
+        """Recopila todos los archivos en el directorio desde el índice del workspace"""
+        index = await asyncio.to_thread(
+            workspace_index_registry.get_index, directory, self.working_directory
+        )
+        files, _ = await asyncio.to_thread(self._file_catalog, index, directory)
+        return files
+
+    def _file_catalog(
+        self, index: WorkspaceIndex, directory: str
+    ) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """Archivos del directorio y sus nombres normalizados para el scorer
+
+        El catálogo se reutiliza mientras no cambie la generación del índice,
+        así que la normalización de nombres se paga una vez y no por consulta.
+        """
+        index.refresh()
+        cache_key = (index.root, index.generation, directory)
+        if self._catalog is not None and self._catalog[0] == cache_key:
+            return self._catalog[1], self._catalog[2]
+
         files = []
+        for entry in index.files(directory, include_hidden=False):
+            rel_path = self.get_relative_path(entry.path)
+            files.append(
+                {
+                    "name": entry.name,
+                    "path": rel_path,
+                    "full_path": entry.path,
+                    "size": entry.size,
+                    "dir": os.path.dirname(rel_path),
+                }
+            )
 
-        for root, dirs, filenames in os.walk(directory):
-            # Filtrar directorios comunes que se deben ignorar
-            dirs[:] = [
-                d
-                for d in dirs
-                if not d.startswith(".")
-                and d
-                not in {"node_modules", "__pycache__", "venv", "env", "dist", "build"}
-            ]
-
-            for filename in filenames:
-                if not filename.startswith("."):
-                    full_path = os.path.join(root, filename)
-                    rel_path = self.get_relative_path(full_path)
-
-                    files.append(
-                        {
-                            "name": filename,
-                            "path": rel_path,
-                            "full_path": full_path,
-                            "size": os.path.getsize(full_path),
-                            "dir": os.path.dirname(rel_path),
-                        }
-                    )
+        normalize = _rapidfuzz_modules()[2] if RAPIDFUZZ_AVAILABLE else str.lower
+        names = [normalize(file_info["name"]) for file_info in files]
 
-        return files
+        self._catalog = (cache_key, files, names)
+        return files, names
+
+    def _normalized_names(self, files: List[Dict[str, Any]]) -> List[str]:
+        """Nombres normalizados del catálogo cacheado (o calculados al vuelo)"""
+        if self._catalog is not None and self._catalog[1] is files:
+            return self._catalog[2]
+        default_process = _rapidfuzz_modules()[2]
+        return [default_process(file_info["name"]) for file_info in files]
 
     async def _fuzzy_search(
         self, files: List[Dict[str, Any]], query: str, limit: int
     ) -> List[Dict[str, Any]]:
-        """Búsqueda fuzzy usando fuzzywuzzy"""
-        # Crear lista de nombres para búsqueda
-        file_names = [(f["name"], i) for i, f in enumerate(files)]
+        """Búsqueda fuzzy en lote con rapidfuzz
+
+        El scorer recorre en C el array de nombres ya normalizados y retorna
+        los índices de los mejores resultados, seleccionados con un heap de
+        tamaño `limit` en lugar de ordenar todas las puntuaciones.
+        """
+        if not RAPIDFUZZ_AVAILABLE:
+            return await self._fuzzywuzzy_search(files, query, limit)
+
+        fuzz, process, default_process = _rapidfuzz_modules()
+        matches = process.extract(
+            default_process(query),
+            self._normalized_names(files),
+            scorer=fuzz.partial_ratio,
+            processor=None,
+            limit=limit,
+            score_cutoff=30,
+        )
+
+        result_files = []
+        for _, score, index in matches:
+            file_info = files[index].copy()
+            file_info["score"] = round(score)
+            result_files.append(file_info)
 
-        # Realizar búsqueda fuzzy
+        return result_files
+
+    async def _fuzzywuzzy_search(
+        self, files: List[Dict[str, Any]], query: str, limit: int
+    ) -> List[Dict[str, Any]]:
+        """Búsqueda fuzzy usando fuzzywuzzy (sin rapidfuzz instalado)"""
+        fuzz, process = _fuzzywuzzy_modules()
+        # Con un dict como opciones cada resultado trae su índice original
         matches = process.extractBests(
             query,
-            [name for name, _ in file_names],
+            {i: f["name"] for i, f in enumerate(files)},
             scorer=fuzz.partial_ratio,
             limit=limit,
             score_cutoff=30,
         )
 
-        # Mapear de vuelta a archivos originales
         result_files = []
-        for match_name, score in matches:
-            # Encontrar el archivo original
-            for name, index in file_names:
-                if name == match_name:
-                    file_info = files[index].copy()
-                    file_info["score"] = score
-                    result_files.append(file_info)
-                    break
+        for _, score, index in matches:
+            file_info = files[index].copy()
+            file_info["score"] = score
+            result_files.append(file_info)
 
         return result_files
 
@@ -519,6 +982,80 @@ class FileSearchTool(BaseTool):
         return "\n".join(output)
 
 
+# Peso de la puntuación BM25 normalizada frente a la de nombre y ruta
+CONTENT_SCORE_WEIGHT = 20.0
+
+# Separadores de tokens en rutas (todo lo que no es letra o dígito) y camelCase
+_PATH_TOKEN_SPLIT = re.compile(r"[\W_]+")
+_CAMEL_CASE_PARTS = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+")
+
+
+def _path_tokens(path: str) -> Set[str]:
+    """Tokens de una ruta: segmentos alfanuméricos y sus partes camelCase"""
+    tokens = {segment for segment in _PATH_TOKEN_SPLIT.split(path.lower()) if segment}
+    for segment in _PATH_TOKEN_SPLIT.split(path):
+        tokens.update(part.lower() for part in _CAMEL_CASE_PARTS.findall(segment))
+    return tokens
+
+
+class _PathTokenIndex:
+    """Índice invertido token -> archivos sobre las rutas del workspace
+
+    Cada término de la consulta se trocea con los mismos separadores; cada
+    trozo es alfanumérico, así que si aparece en una ruta lo hace dentro de
+    uno de sus segmentos. Los tokens que contienen un trozo se localizan con
+    `str.find` sobre el vocabulario concatenado, y los candidatos de un
+    término son los archivos presentes en las postings de todos sus trozos.
+    El resultado es un superconjunto exacto de los archivos que la
+    puntuación por subcadenas puede premiar.
+    """
+
+    def __init__(self, paths: List[str]):
+        postings: Dict[str, List[int]] = {}
+        for file_id, path in enumerate(paths):
+            for token in _path_tokens(path):
+                postings.setdefault(token, []).append(file_id)
+
+        self.tokens = list(postings)
+        self.postings = [postings[token] for token in self.tokens]
+        self.size = len(paths)
+
+        self._vocabulary = "\n".join(self.tokens)
+        self._starts = []
+        offset = 0
+        for token in self.tokens:
+            self._starts.append(offset)
+            offset += len(token) + 1
+
+    def candidates(self, term: str) -> Optional[Set[int]]:
+        """Archivos que pueden contener el término, o None si no se puede filtrar"""
+        pieces = [piece for piece in _PATH_TOKEN_SPLIT.split(term.lower()) if piece]
+        if not pieces:
+            return None
+
+        result: Optional[Set[int]] = None
+        for piece in pieces:
+            file_ids: Set[int] = set()
+            for token_id in self._tokens_containing(piece):
+                file_ids.update(self.postings[token_id])
+            result = file_ids if result is None else result & file_ids
+            if not result:
+                return set()
+        return result
+
+    def _tokens_containing(self, piece: str) -> List[int]:
+        """Tokens del vocabulario que contienen `piece` como subcadena"""
+        token_ids = []
+        position = self._vocabulary.find(piece)
+        while position != -1:
+            token_id = bisect_right(self._starts, position) - 1
+            token_ids.append(token_id)
+            if token_id + 1 >= len(self._starts):
+                break
+            position = self._vocabulary.find(piece, self._starts[token_id + 1])
+        return token_ids
+
+
 class SearchWorkspaceFilesTool(BaseTool):
     """Herramienta para búsqueda semántica de archivos en workspace"""
 
@@ -545,13 +1082,31 @@ class SearchWorkspaceFilesTool(BaseTool):
                 required=False,
                 default=15,
             ),
+            ToolParameter(
+                name="mode",
+                type=str,
+                description=(
+                    "Modo de ranking: 'content' combina BM25 sobre el contenido "
+                    "con la puntuación de nombre y ruta; 'embedding' usa en su "
+                    "lugar similitud de embeddings locales por fragmento; "
+                    "'name' usa solo nombre y ruta"
+                ),
+                required=False,
+                default="content",
+            ),
         ]
         self.requires_approval = False
+        # Archivos e índice de tokens por (generación del índice, tipos)
+        self._catalog: Optional[Tuple[tuple, List[Dict[str, Any]]]] = None
+        self._token_index: Optional[
+            Tuple[List[Dict[str, Any]], _PathTokenIndex, Dict[str, int]]
+        ] = None
 
     async def execute(self, **kwargs) -> ToolResult:
         query = kwargs["query"]
         file_types = kwargs.get("file_types", "")
         limit = kwargs.get("limit", 15)
+        mode = kwargs.get("mode", "content")
 
         workspace_path = self.working_directory
 
@@ -559,8 +1114,17 @@ class SearchWorkspaceFilesTool(BaseTool):
             # Recopilar archivos del workspace
             all_files = await self._collect_workspace_files(workspace_path, file_types)
 
+            # Puntuación del contenido (None si no se usa o no está disponible)
+            content_scores, ranking_backend = None, None
+            if mode in ("content", "embedding"):
+                content_scores, ranking_backend = await self._content_scores(
+                    workspace_path, query, mode
+                )
+
             # Realizar búsqueda semántica
-            matches = await self._semantic_search(all_files, query, limit)
+            matches = await self._semantic_search(
+                all_files, query, limit, content_scores
+            )
 
             formatted_results = self._format_workspace_search_results(matches, query)
 
@@ -573,6 +1137,9 @@ class SearchWorkspaceFilesTool(BaseTool):
                     "total_files_searched": len(all_files),
                     "matches_found": len(matches),
                     "workspace_path": workspace_path,
+                    "mode": mode,
+                    "content_ranked": content_scores is not None,
+                    "ranking_backend": ranking_backend,
                 },
             )
 
@@ -587,8 +1154,6 @@ class SearchWorkspaceFilesTool(BaseTool):
         self, workspace_path: str, file_types: str
     ) -> List[Dict[str, Any]]:
         """Recopila archivos del workspace"""
-        files = []
-
         # Parsear tipos de archivos
         if file_types:
             allowed_extensions = set(f".{ext.strip()}" for ext in file_types.split(","))
@@ -621,70 +1186,141 @@ class SearchWorkspaceFilesTool(BaseTool):
                 ".css",
             }
 
-        for root, dirs, filenames in os.walk(workspace_path):
-            # Filtrar directorios
-            dirs[:] = [
-                d
-                for d in dirs
-                if not d.startswith(".")
-                and d
-                not in {
-                    "node_modules",
-                    "__pycache__",
-                    "venv",
-                    "env",
-                    "dist",
-                    "build",
-                    "target",
-                    "bin",
-                    "obj",
-                    ".git",
-                    ".svn",
-                }
-            ]
+        index = await asyncio.to_thread(
+            workspace_index_registry.get_index, workspace_path, self.working_directory
+        )
+        return await asyncio.to_thread(
+            self._file_catalog, index, workspace_path, allowed_extensions
+        )
 
-            for filename in filenames:
-                if filename.startswith("."):
-                    continue
+    def _file_catalog(
+        self, index: WorkspaceIndex, workspace_path: str, allowed_extensions: Set[str]
+    ) -> List[Dict[str, Any]]:
+        """Lista de archivos reutilizada mientras no cambie el índice del workspace"""
+        index.refresh()
+        cache_key = (
+            index.root,
+            index.generation,
+            workspace_path,
+            frozenset(allowed_extensions),
+        )
+        if self._catalog is not None and self._catalog[0] == cache_key:
+            return self._catalog[1]
 
-                file_ext = Path(filename).suffix.lower()
-                if file_ext in allowed_extensions:
-                    full_path = os.path.join(root, filename)
-                    rel_path = self.get_relative_path(full_path)
-
-                    files.append(
-                        {
-                            "name": filename,
-                            "path": rel_path,
-                            "full_path": full_path,
-                            "extension": file_ext,
-                            "size": os.path.getsize(full_path),
-                            "directory": os.path.dirname(rel_path),
-                        }
-                    )
+        files = []
+        for entry in index.files(workspace_path, include_hidden=False):
+            if entry.extension in allowed_extensions:
+                rel_path = self.get_relative_path(entry.path)
+
+                files.append(
+                    {
+                        "name": entry.name,
+                        "path": rel_path,
+                        "full_path": entry.path,
+                        "extension": entry.extension,
+                        "size": entry.size,
+                        "directory": os.path.dirname(rel_path),
+                    }
+                )
 
+        self._catalog = (cache_key, files)
         return files
 
+    async def _content_scores(
+        self, workspace_path: str, query: str, mode: str = "content"
+    ) -> Tuple[Optional[Dict[str, float]], Optional[str]]:
+        """Puntuación del contenido por ruta absoluta y el backend que la produjo
+
+        El modo 'embedding' recurre a BM25 si NumPy no está instalado.
+        Retorna (None, None) si el índice no está disponible o todavía se
+        está construyendo en segundo plano; mientras tanto el ranking usa
+        solo el nombre y la ruta.
+        """
+        if not agent_config.SEARCH_INDEX_ENABLED:
+            return None, None
+
+        index = await asyncio.to_thread(
+            workspace_index_registry.get_index, workspace_path, self.working_directory
+        )
+        if mode == "embedding" and NUMPY_AVAILABLE:
+            content_index, backend = embedding_index, "embedding"
+        else:
+            content_index, backend = bm25_index, "bm25"
+        if not content_index.is_ready(index):
+            return None, None
+        try:
+            scores = await asyncio.to_thread(
+                content_index.scores, index, workspace_path, query
+            )
+        except (sqlite3.Error, OSError):
+            return None, None
+        return scores, backend
+
     async def _semantic_search(
-        self, files: List[Dict[str, Any]], query: str, limit: int
+        self,
+        files: List[Dict[str, Any]],
+        query: str,
+        limit: int,
+        content_scores: Optional[Dict[str, float]] = None,
     ) -> List[Dict[str, Any]]:
-        """Realiza búsqueda semántica en archivos"""
-        matches = []
-        query_terms = query.lower().split()
+        """Realiza búsqueda semántica en archivos
 
-        for file_info in files:
-            score = await self._calculate_semantic_score(file_info, query_terms)
+        Solo se puntúan los archivos que el índice de tokens señala como
+        candidatos para algún término (más los que BM25 encuentra por su
+        contenido), y los mejores se eligen con un heap. La puntuación BM25
+        se normaliza respecto al mejor archivo y se suma a la de nombre y ruta.
+        """
+        query_terms = query.lower().split()
+        token_index, ids_by_path = self._get_token_index(files)
 
+        candidate_ids: Set[int] = set()
+        for term in query_terms:
+            term_candidates = token_index.candidates(term)
+            if term_candidates is None:
+                # Término sin letras ni dígitos: no se puede filtrar
+                candidate_ids = set(range(len(files)))
+                break
+            candidate_ids |= term_candidates
+
+        content_by_id: Dict[int, float] = {}
+        if content_scores:
+            for path, content_score in content_scores.items():
+                file_id = ids_by_path.get(path)
+                if file_id is not None:
+                    content_by_id[file_id] = content_score
+            candidate_ids.update(content_by_id)
+        best_content = max(content_by_id.values(), default=0.0)
+
+        scored = []
+        for file_id in sorted(candidate_ids):
+            score = self._calculate_semantic_score(files[file_id], query_terms)
+            if best_content > 0 and file_id in content_by_id:
+                score += CONTENT_SCORE_WEIGHT * content_by_id[file_id] / best_content
             if score > 0:
-                file_info_copy = file_info.copy()
-                file_info_copy["score"] = score
-                matches.append(file_info_copy)
+                scored.append((score, file_id))
 
-        # Ordenar por puntuación
-        matches.sort(key=lambda x: x["score"], reverse=True)
-        return matches[:limit]
+        # Orden estable por puntuación, igual que un sort descendente completo
+        matches = []
+        for score, file_id in heapq.nlargest(limit, scored, key=lambda x: x[0]):
+            file_info_copy = files[file_id].copy()
+            file_info_copy["score"] = score
+            matches.append(file_info_copy)
+        return matches
+
+    def _get_token_index(
+        self, files: List[Dict[str, Any]]
+    ) -> Tuple[_PathTokenIndex, Dict[str, int]]:
+        """Índice de tokens y posición por ruta absoluta, construidos una vez por lista"""
+        if self._token_index is None or self._token_index[0] is not files:
+            token_index = _PathTokenIndex([file_info["path"] for file_info in files])
+            ids_by_path = {
+                file_info["full_path"]: file_id
+                for file_id, file_info in enumerate(files)
+            }
+            self._token_index = (files, token_index, ids_by_path)
+        return self._token_index[1], self._token_index[2]
 
-    async def _calculate_semantic_score(
+    def _calculate_semantic_score(
         self, file_info: Dict[str, Any], query_terms: List[str]
     ) -> float:
         """Calcula puntuación semántica para un archivo"""
@@ -770,7 +1406,163 @@ class SearchWorkspaceFilesTool(BaseTool):
         return "\n".join(output)
 
 
+class _SymbolLookupTool(BaseTool):
+    """Base de las herramientas que consultan el índice de símbolos"""
+
+    # Qué se busca, para los mensajes ("definiciones", "referencias")
+    lookup_label = ""
+
+    def __init__(self):
+        super().__init__()
+        self.tool_type = ToolType.SEARCH_OPERATION
+        self.parameters = [
+            ToolParameter(
+                name="symbol",
+                type=str,
+                description="Nombre exacto del símbolo (clase, función, método, tipo...)",
+            ),
+            ToolParameter(
+                name="path",
+                type=str,
+                description="Directorio o archivo donde buscar (relativo al directorio de trabajo)",
+                required=False,
+                default=".",
+            ),
+            ToolParameter(
+                name="max_results",
+                type=int,
+                description="Máximo número de resultados",
+                required=False,
+                default=100,
+            ),
+        ]
+        self.requires_approval = False
+
+    async def execute(self, **kwargs) -> ToolResult:
+        symbol = kwargs["symbol"].strip()
+        path = kwargs.get("path", ".")
+        max_results = kwargs.get("max_results", 100)
+
+        if not self.is_path_safe(path):
+            return ToolResult(
+                success=False, content="", error=f"Acceso denegado a la ruta: {path}"
+            )
+
+        absolute_path = self.get_absolute_path(path)
+
+        if not os.path.exists(absolute_path):
+            return ToolResult(
+                success=False, content="", error=f"La ruta no existe: {path}"
+            )
+
+        try:
+            # Un archivo se consulta sobre el índice de su directorio
+            is_file = os.path.isfile(absolute_path)
+            directory = os.path.dirname(absolute_path) if is_file else absolute_path
+            index = await asyncio.to_thread(
+                workspace_index_registry.get_index, directory, self.working_directory
+            )
+            matches = await asyncio.to_thread(self._lookup, index, directory, symbol)
+            if is_file:
+                matches = [match for match in matches if match[0] == absolute_path]
+
+            total = len(matches)
+            matches = matches[:max_results]
+            content = await asyncio.to_thread(
+                self._format_matches, symbol, matches, total
+            )
+
+            return ToolResult(
+                success=True,
+                content=content,
+                metadata={
+                    "symbol": symbol,
+                    "path": path,
+                    "matches_found": total,
+                    "truncated": total > len(matches),
+                },
+            )
+
+        except Exception as e:
+            return ToolResult(
+                success=False,
+                content="",
+                error=f"Error buscando {self.lookup_label} de {symbol}: {str(e)}",
+            )
+
+    @abstractmethod
+    def _lookup(self, index: WorkspaceIndex, directory: str, symbol: str) -> list:
+        """Tuplas (ruta absoluta, línea, ...) ordenadas por ruta y línea"""
+        pass
+
+    def _format_matches(self, symbol: str, matches: list, total: int) -> str:
+        """Formatea las coincidencias con la línea de código de cada una"""
+        if not matches:
+            return f"No se encontraron {self.lookup_label} de '{symbol}'."
+
+        output = []
+        current_file = None
+        lines: List[str] = []
+        for match in matches:
+            file_path, line_number = match[0], match[1]
+            if file_path != current_file:
+                current_file = file_path
+                try:
+                    with open(file_path, encoding="utf-8", errors="replace") as f:
+                        lines = f.read().splitlines()
+                except OSError:
+                    lines = []
+                if output:
+                    output.append("")
+                output.append(f"📁 {self.get_relative_path(file_path)}")
+
+            code = lines[line_number - 1].strip() if line_number <= len(lines) else ""
+            kind = f" [{match[2]}]" if len(match) > 2 else ""
+            output.append(f"│ {line_number:4d}:{kind} {code}")
+
+        summary = f"\n🔍 {total} {self.lookup_label} de '{symbol}'"
+        if total > len(matches):
+            summary += f" (se muestran {len(matches)})"
+        return "\n".join(output) + summary + "."
+
+
+class FindDefinitionTool(_SymbolLookupTool):
+    """Herramienta para encontrar dónde se define un símbolo"""
+
+    lookup_label = "definiciones"
+
+    def __init__(self):
+        super().__init__()
+        self.name = "find_definition"
+        self.description = (
+            "Encuentra dónde se define un símbolo (clase, función, método, tipo) "
+            "usando el índice de símbolos del repositorio"
+        )
+
+    def _lookup(self, index: WorkspaceIndex, directory: str, symbol: str) -> list:
+        return symbol_index.definitions(index, directory, symbol)
+
+
+class FindReferencesTool(_SymbolLookupTool):
+    """Herramienta para encontrar las referencias a un símbolo"""
+
+    lookup_label = "referencias"
+
+    def __init__(self):
+        super().__init__()
+        self.name = "find_references"
+        self.description = (
+            "Encuentra las líneas que hacen referencia a un símbolo "
+            "usando el índice de símbolos del repositorio"
+        )
+
+    def _lookup(self, index: WorkspaceIndex, directory: str, symbol: str) -> list:
+        return symbol_index.references(index, directory, symbol)
+
+
 # Instancias de las herramientas
 search_files_tool = SearchFilesTool()
 file_search_tool = FileSearchTool()
 search_workspace_files_tool = SearchWorkspaceFilesTool()
+find_definition_tool = FindDefinitionTool()
+find_references_tool = FindReferencesTool()
@@ -0,0 +1,214 @@
+"""
+Índice de símbolos del repositorio: definiciones y referencias
+
+Para cada archivo de código se guardan sus definiciones (nombre, línea,
+tipo) y sus referencias (identificadores por línea), extraídas con
+tree-sitter por ListCodeDefinitionNamesTool, en la misma base SQLite que los
+índices de contenido. Las tablas están agrupadas por nombre de símbolo, de
+modo que encontrar la definición o las referencias de un nombre es una
+lectura por rango de clave en lugar de un recorrido del repositorio.
+
+Mientras la tabla se construye en segundo plano, las consultas analizan solo
+los archivos de código cuyo contenido incluye el nombre buscado.
+"""
+
+import json
+import sqlite3
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .content_index import ContentIndex, default_index_path, read_indexable_bytes
+from .file_operations import CODE_EXTENSIONS, list_code_definition_names_tool
+from .workspace_index import IndexedFile, WorkspaceIndex
+
+
+class SymbolIndex(ContentIndex):
+    """Tabla de símbolos persistente en SQLite"""
+
+    NAME = "symbol"
+    SCHEMA_VERSION = 1
+    EXTENSIONS = CODE_EXTENSIONS
+
+    def __init__(self, db_path: str):
+        super().__init__(db_path)
+        self._name_ids: Optional[Dict[str, int]] = None
+
+    def definitions(
+        self, workspace_index: WorkspaceIndex, under: str, name: str
+    ) -> List[Tuple[str, int, str]]:
+        """(ruta, línea, tipo) de las definiciones de `name` bajo `under`"""
+        if not self.is_ready(workspace_index):
+            return sorted(
+                (path, d["line"], d["type"])
+                for path, definitions, _ in self._scan(workspace_index, under, name)
+                for d in definitions
+                if d["name"] == name
+            )
+        with self._lock:
+            rows = self._lookup(
+                workspace_index,
+                "SELECT file_id, line, kind FROM symbol_definitions WHERE name_id = ?",
+                name,
+            )
+            paths = self._paths_under({row[0] for row in rows}, under)
+            return sorted(
+                (paths[file_id], line, kind)
+                for file_id, line, kind in rows
+                if file_id in paths
+            )
+
+    def references(
+        self, workspace_index: WorkspaceIndex, under: str, name: str
+    ) -> List[Tuple[str, int]]:
+        """(ruta, línea) de las referencias a `name` bajo `under`"""
+        if not self.is_ready(workspace_index):
+            return sorted(
+                (path, line)
+                for path, _, references in self._scan(workspace_index, under, name)
+                for reference, line in references
+                if reference == name
+            )
+        with self._lock:
+            rows = self._lookup(
+                workspace_index,
+                "SELECT file_id, line FROM symbol_references WHERE name_id = ?",
+                name,
+            )
+            paths = self._paths_under({row[0] for row in rows}, under)
+            return sorted(
+                (paths[file_id], line) for file_id, line in rows if file_id in paths
+            )
+
+    def _scan(
+        self, workspace_index: WorkspaceIndex, under: str, name: str
+    ) -> Iterator[Tuple[str, List[Dict[str, Any]], List[Tuple[str, int]]]]:
+        """Analiza sin índice los archivos de código bajo `under` que contienen `name`
+
+        Solo se parsean los archivos cuyo contenido incluye el nombre, de
+        modo que una consulta en frío cuesta una lectura del árbol y no su
+        análisis completo.
+        """
+        needle = name.encode("utf-8")
+        for entry in workspace_index.files(under, include_hidden=True):
+            if entry.extension not in self.EXTENSIONS:
+                continue
+            data = read_indexable_bytes(entry)
+            if data is None or needle not in data:
+                continue
+            definitions, references = (
+                list_code_definition_names_tool.symbols_for_content(
+                    data.decode("utf-8", errors="ignore"), entry.extension
+                )
+            )
+            yield entry.path, definitions, references
+
+    def _lookup(self, workspace_index: WorkspaceIndex, sql: str, name: str) -> list:
+        """Sincroniza el índice y ejecuta una consulta por id de nombre"""
+        self.sync(workspace_index)
+        row = self._connection.execute(
+            "SELECT id FROM symbol_names WHERE name = ?", (name,)
+        ).fetchone()
+        if row is None:
+            return []
+        return self._connection.execute(sql, (row[0],)).fetchall()
+
+    def _reset_state(self) -> None:
+        super()._reset_state()
+        self._name_ids = None
+
+    def _table_names(self) -> Tuple[str, ...]:
+        return ("symbol_definitions", "symbol_references", "symbol_names")
+
+    def _create_tables(self, connection: sqlite3.Connection) -> None:
+        connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS symbol_names (
+                id INTEGER PRIMARY KEY,
+                name TEXT UNIQUE NOT NULL
+            )
+            """
+        )
+        connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS symbol_definitions (
+                name_id INTEGER NOT NULL,
+                file_id INTEGER NOT NULL,
+                line INTEGER NOT NULL,
+                kind TEXT NOT NULL,
+                PRIMARY KEY (name_id, file_id, line)
+            ) WITHOUT ROWID
+            """
+        )
+        connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS symbol_references (
+                name_id INTEGER NOT NULL,
+                file_id INTEGER NOT NULL,
+                line INTEGER NOT NULL,
+                PRIMARY KEY (name_id, file_id, line)
+            ) WITHOUT ROWID
+            """
+        )
+
+    def _name_id(self, name: str) -> int:
+        """Id de un nombre de símbolo, creándolo si es nuevo"""
+        if self._name_ids is None:
+            self._name_ids = dict(
+                self._connection.execute("SELECT name, id FROM symbol_names")
+            )
+        name_id = self._name_ids.get(name)
+        if name_id is None:
+            name_id = self._connection.execute(
+                "INSERT INTO symbol_names (name) VALUES (?)", (name,)
+            ).lastrowid
+            self._name_ids[name] = name_id
+        return name_id
+
+    def _build_payload(self, entry: IndexedFile, data: bytes) -> bytes:
+        """Definiciones [id, línea, tipo] y referencias [id, línea] como JSON"""
+        definitions, references = list_code_definition_names_tool.symbols_for_content(
+            data.decode("utf-8", errors="ignore"), entry.extension
+        )
+        return json.dumps(
+            [
+                [[self._name_id(d["name"]), d["line"], d["type"]] for d in definitions],
+                [[self._name_id(name), line] for name, line in references],
+            ]
+        ).encode("utf-8")
+
+    def _apply_payload(
+        self,
+        connection: sqlite3.Connection,
+        file_id: int,
+        old_payload: Optional[bytes],
+        new_payload: Optional[bytes],
+    ) -> None:
+        """Sustituye las definiciones y referencias de un archivo"""
+        if old_payload is not None:
+            definitions, references = json.loads(old_payload)
+            connection.executemany(
+                "DELETE FROM symbol_definitions "
+                "WHERE name_id = ? AND file_id = ? AND line = ?",
+                ((name_id, file_id, line) for name_id, line, _ in definitions),
+            )
+            connection.executemany(
+                "DELETE FROM symbol_references "
+                "WHERE name_id = ? AND file_id = ? AND line = ?",
+                ((name_id, file_id, line) for name_id, line in references),
+            )
+
+        if new_payload is not None:
+            definitions, references = json.loads(new_payload)
+            connection.executemany(
+                "INSERT OR IGNORE INTO symbol_definitions "
+                "(name_id, file_id, line, kind) VALUES (?, ?, ?, ?)",
+                ((name_id, file_id, line, kind) for name_id, line, kind in definitions),
+            )
+            connection.executemany(
+                "INSERT OR IGNORE INTO symbol_references "
+                "(name_id, file_id, line) VALUES (?, ?, ?)",
+                ((name_id, file_id, line) for name_id, line in references),
+            )
+
+
+# Índice compartido por las herramientas de símbolos
+symbol_index = SymbolIndex(default_index_path())
@@ -0,0 +1,153 @@
+"""
+Detección de la codificación de archivos de texto en una sola pasada
+
+La codificación se decide a partir del BOM o, si no lo hay, de una muestra
+acotada del inicio del archivo, y el contenido se decodifica una única vez.
+El resultado se guarda por (ruta, mtime, tamaño), así que releer un archivo
+no vuelve a analizarlo.
+"""
+
+import codecs
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+# Bytes del inicio del archivo que se analizan para decidir la codificación
+ENCODING_SAMPLE_SIZE = 64 * 1024
+
+# Número de rutas cuya codificación se recuerda
+MAX_CACHED_ENCODINGS = 1024
+
+# BOMs reconocidos (los de UTF-32 antes que los de UTF-16, que son su prefijo)
+_BOMS = (
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+
+def is_ascii_compatible(encoding: str) -> bool:
+    """Indica si los bytes ASCII (como el salto de línea) se codifican igual"""
+    return not encoding.startswith(("utf-16", "utf-32"))
+
+
+def detect_encoding(sample: bytes) -> str:
+    """Codificación más probable de una muestra del inicio de un archivo"""
+    for bom, encoding in _BOMS:
+        if sample.startswith(bom):
+            return encoding
+
+    # UTF-16 sin BOM: texto ASCII con un byte nulo en cada posición par o impar
+    if len(sample) >= 4:
+        even_nulls = sample[0::2].count(0)
+        odd_nulls = sample[1::2].count(0)
+        half = len(sample) // 2
+        if odd_nulls > half * 0.7 and even_nulls < half * 0.1:
+            return "utf-16-le"
+        if even_nulls > half * 0.7 and odd_nulls < half * 0.1:
+            return "utf-16-be"
+
+    # La muestra puede cortar un carácter multibyte: decodificar sin cerrar
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        pass
+
+    try:
+        sample.decode("cp1252")
+        return "cp1252"
+    except UnicodeDecodeError:
+        return "latin-1"
+
+
+def mid_stream_encoding(encoding: str, head: bytes) -> str:
+    """Codificación para decodificar desde la mitad del archivo, donde no hay BOM"""
+    if encoding == "utf-16":
+        little = head.startswith(codecs.BOM_UTF16_LE)
+        return "utf-16-le" if little else "utf-16-be"
+    if encoding == "utf-32":
+        little = head.startswith(codecs.BOM_UTF32_LE)
+        return "utf-32-le" if little else "utf-32-be"
+    if encoding == "utf-8-sig":
+        return "utf-8"
+    return encoding
+
+
+def code_unit_size(encoding: str) -> int:
+    """Bytes por unidad de código (los cortes deben alinearse a este tamaño)"""
+    if encoding.startswith("utf-16"):
+        return 2
+    if encoding.startswith("utf-32"):
+        return 4
+    return 1
+
+
+def decode_bytes(data: bytes, encoding: str) -> Tuple[str, str]:
+    """Decodifica con `encoding`; si falla más allá de la muestra, con un respaldo"""
+    try:
+        return data.decode(encoding), encoding
+    except UnicodeDecodeError:
+        pass
+
+    fallback = "cp1252" if is_ascii_compatible(encoding) else "latin-1"
+    try:
+        return data.decode(fallback), fallback
+    except UnicodeDecodeError:
+        return data.decode("latin-1"), "latin-1"
+
+
+class EncodingDetector:
+    """Codificaciones detectadas, cacheadas por (ruta, mtime, tamaño)"""
+
+    def __init__(self, max_entries: int = MAX_CACHED_ENCODINGS):
+        self.max_entries = max_entries
+        self._encodings: "OrderedDict[str, Tuple[int, int, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def cached(self, path: str, stat: os.stat_result) -> Optional[str]:
+        """Codificación recordada para el archivo si su stat no cambió"""
+        with self._lock:
+            entry = self._encodings.get(path)
+            if entry is None or entry[:2] != (stat.st_mtime_ns, stat.st_size):
+                return None
+            self._encodings.move_to_end(path)
+            return entry[2]
+
+    def remember(self, path: str, stat: os.stat_result, encoding: str) -> None:
+        """Guarda la codificación de un archivo"""
+        with self._lock:
+            self._encodings[path] = (stat.st_mtime_ns, stat.st_size, encoding)
+            self._encodings.move_to_end(path)
+            while len(self._encodings) > self.max_entries:
+                self._encodings.popitem(last=False)
+
+    def detect_file(self, path: str) -> str:
+        """Codificación de un archivo, leyendo solo una muestra si no está cacheada"""
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            encoding = self.cached(path, stat)
+            if encoding is None:
+                encoding = detect_encoding(f.read(ENCODING_SAMPLE_SIZE))
+                self.remember(path, stat, encoding)
+        return encoding
+
+    def decode_file(self, path: str) -> Tuple[str, str]:
+        """Lee y decodifica un archivo completo una sola vez: (texto, codificación)"""
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            data = f.read()
+
+        encoding = self.cached(path, stat)
+        if encoding is None:
+            encoding = detect_encoding(data[:ENCODING_SAMPLE_SIZE])
+        text, encoding = decode_bytes(data, encoding)
+        self.remember(path, stat, encoding)
+        return text, encoding
+
+
+# Detector compartido por read_file
+encoding_detector = EncodingDetector()
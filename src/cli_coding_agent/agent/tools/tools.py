@@ -11,6 +11,9 @@ from typing import Optional
 
 from agno.tools import tool
 
+from .file_classifier import file_classifier
+from .workspace_walker import visible_files_walker, workspace_walker
+
 # Importaciones opcionales para funcionalidades avanzadas
 try:
     import PyPDF2
@@ -272,7 +275,7 @@ def list_files(
 
         if recursive:
             # Listado recursivo
-            for root, dirs, file_list in os.walk(directory_path):
+            for root, dirs, file_list in workspace_walker.walk(directory_path):
                 if count >= limit:
                     break
 
@@ -296,8 +299,8 @@ def list_files(
                     count += 1
         else:
             # Solo nivel superior
-            items = os.listdir(directory_path)
-            for item in items:
+            dir_items, file_items = workspace_walker.list_directory(directory_path)
+            for item in dir_items + file_items:
                 if count >= limit:
                     break
 
@@ -419,7 +422,7 @@ def search_files(
         matches_found = 0
 
         # Buscar archivos
-        for root, dirs, files in os.walk(directory_path):
+        for root, dirs, files in visible_files_walker.walk(directory_path):
             for file in files:
                 # Filtrar por extensión si se especifica
                 if file_extension and not file.endswith(file_extension):
@@ -427,6 +430,10 @@ def search_files(
 
                 file_path = os.path.join(root, file)
 
+                # Saltar binarios y archivos demasiado grandes
+                if not file_classifier.is_text_file(file_path):
+                    continue
+
                 try:
                     with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
                         content = f.read()
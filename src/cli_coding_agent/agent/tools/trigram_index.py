@@ -0,0 +1,231 @@
+"""
+Índice de trigramas del contenido para acelerar search_files
+
+Al estilo de Google Code Search y Zoekt: cada archivo de texto se descompone
+en los trigramas ASCII de su contenido en minúsculas y se guardan listas de
+postings (trigrama -> archivos) en una base SQLite junto a la base de datos
+de sesión. Antes de ejecutar el regex real se extraen del patrón los
+trigramas que toda coincidencia debe contener y solo se buscan los archivos
+que los tienen todos.
+
+El índice persiste entre sesiones, se sincroniza de forma incremental con el
+índice de archivos del workspace y cada archivo se invalida por su mtime y
+tamaño. Los archivos que no se indexan (binarios, enormes o ilegibles) se
+consideran siempre candidatos, de modo que el filtro nunca descarta un
+archivo que el regex podría encontrar.
+"""
+
+import sqlite3
+from array import array
+from typing import List, Optional, Set, Tuple, Union
+
+try:
+    from re import _constants as sre_constants
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_constants
+    import sre_parse
+
+from .content_index import ContentIndex, default_index_path
+from .workspace_index import IndexedFile, WorkspaceIndex
+
+# Plegados de IGNORECASE que lower() no aplica y que llevan a una letra ASCII
+_CASE_FOLDS = str.maketrans({"ı": "i", "ſ": "s"})
+
+# Nodo de consulta: un trigrama o ("and" | "or", hijos)
+QueryNode = Union[int, Tuple[str, List["QueryNode"]]]
+
+_REPEAT_OPS = tuple(
+    getattr(sre_constants, name)
+    for name in ("MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT")
+    if hasattr(sre_constants, name)
+)
+_ATOMIC_GROUP = getattr(sre_constants, "ATOMIC_GROUP", None)
+
+
+def normalize_content(data: bytes) -> bytes:
+    """Normaliza el contenido igual que la búsqueda: UTF-8 y minúsculas"""
+    text = data.decode("utf-8", errors="ignore").lower().translate(_CASE_FOLDS)
+    return text.encode("utf-8")
+
+
+def extract_trigrams(data: bytes) -> Set[int]:
+    """Trigramas ASCII de un contenido ya normalizado, codificados como enteros"""
+    return {
+        (a << 16) | (b << 8) | c
+        for a, b, c in set(zip(data, data[1:], data[2:]))
+        if a < 128 and b < 128 and c < 128
+    }
+
+
+def _literal_trigrams(literal: str) -> List[int]:
+    """Trigramas de una cadena literal ASCII en minúsculas"""
+    data = literal.encode("ascii")
+    return sorted(
+        {
+            (data[i] << 16) | (data[i + 1] << 8) | data[i + 2]
+            for i in range(len(data) - 2)
+        }
+    )
+
+
+def build_query(regex: str) -> Optional[QueryNode]:
+    """Extrae del regex los trigramas que toda coincidencia debe contener
+
+    Retorna None si el patrón no impone ningún trigrama (por ejemplo '.*'
+    o literales de menos de tres caracteres), en cuyo caso no se filtra.
+    """
+    try:
+        parsed = sre_parse.parse(regex)
+    except Exception:
+        return None
+    return _sequence_query(list(parsed))
+
+
+def _sequence_query(items) -> Optional[QueryNode]:
+    """Consulta para una secuencia de elementos del árbol de sre_parse"""
+    parts: List[QueryNode] = []
+    literal: List[str] = []
+
+    def flush():
+        if len(literal) >= 3:
+            parts.append(("and", _literal_trigrams("".join(literal))))
+        literal.clear()
+
+    for op, av in items:
+        if op is sre_constants.LITERAL:
+            char = chr(av).lower()
+            # Solo literales ASCII en una misma línea forman trigramas fiables
+            if char.isascii() and char not in "\r\n":
+                literal.append(char)
+            else:
+                flush()
+            continue
+
+        flush()
+        part = None
+        if op is sre_constants.SUBPATTERN:
+            part = _sequence_query(list(av[-1]))
+        elif op in _REPEAT_OPS:
+            min_count, _, subpattern = av
+            if min_count >= 1:
+                part = _sequence_query(list(subpattern))
+        elif op is _ATOMIC_GROUP:
+            part = _sequence_query(list(av))
+        elif op is sre_constants.BRANCH:
+            branches = [_sequence_query(list(branch)) for branch in av[1]]
+            if all(branch is not None for branch in branches):
+                part = ("or", branches)
+        if part is not None:
+            parts.append(part)
+
+    flush()
+    if not parts:
+        return None
+    return parts[0] if len(parts) == 1 else ("and", parts)
+
+
+class TrigramIndex(ContentIndex):
+    """Índice de trigramas persistente en SQLite"""
+
+    NAME = "trigram"
+    SCHEMA_VERSION = 2
+
+    def candidates(
+        self,
+        workspace_index: WorkspaceIndex,
+        under: str,
+        query: QueryNode,
+        include_hidden: bool = True,
+    ) -> Set[str]:
+        """Rutas bajo `under` que pueden contener una coincidencia de la consulta
+
+        Con include_hidden=False se descartan los archivos ocultos por debajo
+        de `under`, con el mismo criterio que WorkspaceIndex.files.
+        """
+        with self._lock:
+            self.sync(workspace_index)
+
+            file_ids = self._evaluate(query)
+            file_ids.update(
+                file_id
+                for file_id, _, _, indexed in self._files.values()
+                if not indexed
+            )
+            paths = set(self._paths_under(file_ids, under).values())
+
+        if include_hidden:
+            return paths
+        return paths.intersection(
+            entry.path for entry in workspace_index.files(under, include_hidden=False)
+        )
+
+    def _table_names(self) -> Tuple[str, ...]:
+        return ("trigram_postings",)
+
+    def _create_tables(self, connection: sqlite3.Connection) -> None:
+        connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS trigram_postings (
+                trigram INTEGER NOT NULL,
+                file_id INTEGER NOT NULL,
+                PRIMARY KEY (trigram, file_id)
+            ) WITHOUT ROWID
+            """
+        )
+
+    def _build_payload(self, entry: IndexedFile, data: bytes) -> bytes:
+        """Trigramas del archivo como array compacto y ordenado de uint32"""
+        trigrams = extract_trigrams(normalize_content(data))
+        return array("I", sorted(trigrams)).tobytes()
+
+    def _apply_payload(
+        self,
+        connection: sqlite3.Connection,
+        file_id: int,
+        old_payload: Optional[bytes],
+        new_payload: Optional[bytes],
+    ) -> None:
+        """Aplica solo la diferencia entre los trigramas antiguos y los nuevos"""
+        old_trigrams = set(array("I", old_payload or b""))
+        new_trigrams = set(array("I", new_payload or b""))
+
+        connection.executemany(
+            "DELETE FROM trigram_postings WHERE trigram = ? AND file_id = ?",
+            ((trigram, file_id) for trigram in old_trigrams - new_trigrams),
+        )
+        connection.executemany(
+            "INSERT OR IGNORE INTO trigram_postings (trigram, file_id) VALUES (?, ?)",
+            ((trigram, file_id) for trigram in new_trigrams - old_trigrams),
+        )
+
+    def _postings(self, trigram: int) -> Set[int]:
+        """Archivos que contienen un trigrama"""
+        rows = self._connection.execute(
+            "SELECT file_id FROM trigram_postings WHERE trigram = ?", (trigram,)
+        )
+        return {file_id for (file_id,) in rows}
+
+    def _evaluate(self, node: QueryNode) -> Set[int]:
+        """Evalúa una consulta AND/OR de trigramas sobre las postings"""
+        if isinstance(node, int):
+            return self._postings(node)
+
+        kind, children = node
+        if kind == "or":
+            result: Set[int] = set()
+            for child in children:
+                result |= self._evaluate(child)
+            return result
+
+        result = None
+        for child in children:
+            postings = self._evaluate(child)
+            result = postings if result is None else result & postings
+            if not result:
+                return set()
+        return result if result is not None else set()
+
+
+# Índice compartido por las herramientas de búsqueda
+trigram_index = TrigramIndex(default_index_path())
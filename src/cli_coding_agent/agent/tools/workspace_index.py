@@ -0,0 +1,556 @@
+"""
+Índice persistente de archivos del workspace
+
+Mantiene en memoria las rutas, tamaños, fechas de modificación y extensiones
+de todos los archivos no ignorados del workspace. El índice se construye una
+vez por sesión con el recorrido compartido y se mantiene al día con inotify
+(en Linux) o, si no está disponible, comprobando el mtime de los directorios
+indexados. Las herramientas lo consultan en lugar de recorrer el árbol en
+cada llamada.
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import struct
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from .workspace_walker import WorkspaceWalker, workspace_walker
+
+
+@dataclass(frozen=True)
+class IndexedFile:
+    """Entrada del índice para un archivo"""
+
+    path: str
+    name: str
+    size: int
+    mtime_ns: int
+    extension: str
+
+
+def _is_hidden_below(path: str, base: str) -> bool:
+    """Indica si algún componente de `path` por debajo de `base` empieza por punto"""
+    relative = path[len(base.rstrip(os.sep)) + 1 :]
+    return relative.startswith(".") or f"{os.sep}." in relative
+
+
+class _Inotify:
+    """Envoltorio mínimo de inotify mediante ctypes (sin dependencias extra)"""
+
+    IN_MODIFY = 0x00000002
+    IN_ATTRIB = 0x00000004
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_MOVE_SELF = 0x00000800
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ONLYDIR = 0x01000000
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+
+    WATCH_MASK = (
+        IN_MODIFY
+        | IN_ATTRIB
+        | IN_CLOSE_WRITE
+        | IN_MOVED_FROM
+        | IN_MOVED_TO
+        | IN_CREATE
+        | IN_DELETE
+        | IN_DELETE_SELF
+        | IN_MOVE_SELF
+        | IN_ONLYDIR
+    )
+
+    _EVENT_HEADER = struct.Struct("iIII")
+
+    def __init__(self):
+        library = ctypes.util.find_library("c")
+        self._libc = ctypes.CDLL(library, use_errno=True)
+        self.fd = self._libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 falló")
+        self.watches: Dict[int, str] = {}
+
+    @classmethod
+    def is_supported(cls) -> bool:
+        """Indica si la plataforma ofrece inotify"""
+        return sys.platform.startswith("linux") and bool(ctypes.util.find_library("c"))
+
+    def add_watch(self, directory: str) -> None:
+        """Vigila un directorio; lanza OSError si se agota el límite de watches"""
+        wd = self._libc.inotify_add_watch(
+            self.fd, os.fsencode(directory), self.WATCH_MASK
+        )
+        if wd < 0:
+            error = ctypes.get_errno()
+            if error in (errno.ENOENT, errno.ENOTDIR, errno.EACCES):
+                return
+            raise OSError(error, f"inotify_add_watch falló para {directory}")
+        self.watches[wd] = directory
+
+    def read_events(self) -> List[Tuple[str, int, str]]:
+        """Lee sin bloquear los eventos pendientes como (directorio, máscara, nombre)"""
+        events = []
+        while True:
+            try:
+                buffer = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            if not buffer:
+                break
+
+            offset = 0
+            while offset + self._EVENT_HEADER.size <= len(buffer):
+                wd, mask, _, length = self._EVENT_HEADER.unpack_from(buffer, offset)
+                offset += self._EVENT_HEADER.size
+                name = os.fsdecode(buffer[offset : offset + length].rstrip(b"\0"))
+                offset += length
+
+                directory = self.watches.get(wd, "")
+                if mask & self.IN_IGNORED:
+                    self.watches.pop(wd, None)
+                events.append((directory, mask, name))
+        return events
+
+    def close(self) -> None:
+        """Cierra el descriptor y con él todos los watches"""
+        try:
+            os.close(self.fd)
+        except OSError:
+            pass
+        self.watches.clear()
+
+
+class WorkspaceIndex:
+    """Índice incremental de los archivos bajo un directorio raíz"""
+
+    def __init__(
+        self,
+        root: str,
+        walker: WorkspaceWalker = workspace_walker,
+        poll_interval: float = 2.0,
+        use_inotify: bool = True,
+    ):
+        self.root = os.path.abspath(root)
+        self.walker = walker
+        self.poll_interval = poll_interval
+        self.use_inotify = use_inotify and _Inotify.is_supported()
+        self.generation = 0
+
+        self._lock = threading.RLock()
+        self._files: Dict[str, IndexedFile] = {}
+        self._dirs: Dict[str, int] = {}
+        self._children: Dict[str, Tuple[Set[str], Set[str]]] = {}
+        self._ignore_stats: Dict[str, Dict[str, Tuple[int, int]]] = {}
+        self._sorted_files: Optional[List[str]] = None
+        self._sorted_dirs: Optional[List[str]] = None
+        self._inotify: Optional[_Inotify] = None
+        self._built = False
+        self._last_poll = 0.0
+
+    @property
+    def watch_mode(self) -> str:
+        """Mecanismo de actualización activo: 'inotify' o 'polling'"""
+        return "inotify" if self._inotify is not None else "polling"
+
+    def files(
+        self, under: Optional[str] = None, include_hidden: bool = True
+    ) -> List[IndexedFile]:
+        """Archivos indexados bajo `under`, ordenados por ruta"""
+        with self._lock:
+            self.refresh()
+            if self._sorted_files is None:
+                self._sorted_files = sorted(self._files)
+            return [
+                self._files[path]
+                for path in self._paths_under(self._sorted_files, under, include_hidden)
+            ]
+
+    def directories(
+        self, under: Optional[str] = None, include_hidden: bool = True
+    ) -> List[str]:
+        """Directorios indexados bajo `under` (sin incluirlo), ordenados por ruta"""
+        with self._lock:
+            self.refresh()
+            if self._sorted_dirs is None:
+                self._sorted_dirs = sorted(self._dirs)
+            return list(self._paths_under(self._sorted_dirs, under, include_hidden))
+
+    def walk(
+        self, under: Optional[str] = None
+    ) -> List[Tuple[str, List[str], List[IndexedFile]]]:
+        """Recorrido en el mismo orden que WorkspaceWalker.walk, servido desde el índice"""
+        with self._lock:
+            self.refresh()
+            base = os.path.abspath(under) if under else self.root
+            result = []
+            stack = [base]
+
+            while stack:
+                dirpath = stack.pop()
+                if dirpath not in self._children:
+                    continue
+                subdirs, filenames = self._children[dirpath]
+                dirnames = sorted(subdirs)
+                entries = [
+                    self._files[path]
+                    for path in (
+                        os.path.join(dirpath, name) for name in sorted(filenames)
+                    )
+                    if path in self._files
+                ]
+                result.append((dirpath, dirnames, entries))
+                stack.extend(os.path.join(dirpath, d) for d in reversed(dirnames))
+
+            return result
+
+    def list_directory(self, directory: str) -> Tuple[List[str], List[IndexedFile]]:
+        """Un único nivel de un directorio indexado: (subdirectorios, archivos)"""
+        with self._lock:
+            self.refresh()
+            dirpath = os.path.abspath(directory)
+            subdirs, filenames = self._children.get(dirpath, (set(), set()))
+            entries = [
+                self._files[path]
+                for path in (os.path.join(dirpath, name) for name in sorted(filenames))
+                if path in self._files
+            ]
+            return sorted(subdirs), entries
+
+    def contains(self, path: str) -> bool:
+        """Indica si una ruta cae dentro de la raíz del índice"""
+        path = os.path.abspath(path)
+        return path == self.root or path.startswith(self.root.rstrip(os.sep) + os.sep)
+
+    def covers(self, path: str) -> bool:
+        """Indica si `path` es la raíz o un directorio indexado"""
+        path = os.path.abspath(path)
+        if not self.contains(path):
+            return False
+        with self._lock:
+            self.refresh()
+            return path in self._dirs
+
+    def refresh(self) -> None:
+        """Construye el índice la primera vez y aplica los cambios pendientes"""
+        with self._lock:
+            if not self._built:
+                self._rebuild()
+                return
+
+            if self._inotify is not None:
+                self._apply_inotify_events()
+            elif time.monotonic() - self._last_poll >= self.poll_interval:
+                self._poll_directories()
+
+    def restat_files(self) -> None:
+        """Comprueba el stat de cada archivo indexado y recoge los cambios en sitio"""
+        with self._lock:
+            self.refresh()
+            changed = False
+            for path, entry in list(self._files.items()):
+                try:
+                    stat_result = os.stat(path)
+                except OSError:
+                    stat_result = None
+                if stat_result is None or (
+                    stat_result.st_mtime_ns,
+                    stat_result.st_size,
+                ) != (entry.mtime_ns, entry.size):
+                    self._stat_file(path)
+                    changed = True
+            if changed:
+                self._mark_changed()
+
+    def close(self) -> None:
+        """Libera los watches de inotify"""
+        with self._lock:
+            if self._inotify is not None:
+                self._inotify.close()
+                self._inotify = None
+
+    def _paths_under(
+        self, sorted_paths: List[str], under: Optional[str], include_hidden: bool
+    ) -> Iterable[str]:
+        """Recorre el rango de rutas ordenadas que cuelgan de `under`"""
+        base = os.path.abspath(under) if under else self.root
+        prefix = base.rstrip(os.sep) + os.sep
+
+        for i in range(bisect_left(sorted_paths, prefix), len(sorted_paths)):
+            path = sorted_paths[i]
+            if not path.startswith(prefix):
+                break
+            if include_hidden or not _is_hidden_below(path, base):
+                yield path
+
+    def _rebuild(self) -> None:
+        """Recorre el árbol completo y (re)crea los watches"""
+        self.close()
+        self._files.clear()
+        self._dirs.clear()
+        self._children.clear()
+        self._ignore_stats.clear()
+
+        if self.use_inotify:
+            try:
+                self._inotify = _Inotify()
+            except OSError:
+                self._inotify = None
+
+        self._add_subtree(self.root)
+        self._built = True
+        self._last_poll = time.monotonic()
+        self._mark_changed()
+
+    def _add_subtree(self, directory: str) -> None:
+        """Indexa un directorio y todos sus descendientes no ignorados"""
+        for dirpath, dirnames, filenames in self.walker.walk(directory):
+            self._record_directory(dirpath, dirnames, filenames)
+
+    def _record_directory(
+        self, dirpath: str, dirnames: List[str], filenames: List[str]
+    ) -> None:
+        """Registra el contenido de un directorio y empieza a vigilarlo"""
+        try:
+            self._dirs[dirpath] = os.stat(dirpath).st_mtime_ns
+        except OSError:
+            return
+
+        self._children[dirpath] = (set(dirnames), set(filenames))
+        self._ignore_stats[dirpath] = self._stat_ignore_files(
+            dirpath,
+            [name for name in filenames if name in self.walker.ignore_filenames],
+        )
+        for filename in filenames:
+            self._stat_file(os.path.join(dirpath, filename))
+
+        if self._inotify is not None:
+            try:
+                self._inotify.add_watch(dirpath)
+            except OSError:
+                # Límite de watches agotado: pasar a sondeo por mtime
+                self._inotify.close()
+                self._inotify = None
+
+    @staticmethod
+    def _stat_ignore_files(
+        dirpath: str, filenames: Iterable[str]
+    ) -> Dict[str, Tuple[int, int]]:
+        """(mtime, tamaño) de los archivos de exclusión existentes en un directorio"""
+        stats = {}
+        for filename in filenames:
+            try:
+                stat_result = os.stat(os.path.join(dirpath, filename))
+            except OSError:
+                continue
+            stats[filename] = (stat_result.st_mtime_ns, stat_result.st_size)
+        return stats
+
+    def _stat_file(self, path: str) -> None:
+        """Actualiza (o elimina) la entrada de un archivo según su stat actual"""
+        try:
+            stat_result = os.stat(path)
+        except OSError:
+            self._files.pop(path, None)
+            return
+
+        name = os.path.basename(path)
+        self._files[path] = IndexedFile(
+            path=path,
+            name=name,
+            size=stat_result.st_size,
+            mtime_ns=stat_result.st_mtime_ns,
+            extension=Path(name).suffix.lower(),
+        )
+
+    def _remove_subtree(self, directory: str) -> None:
+        """Elimina del índice un directorio y todo lo que cuelga de él"""
+        prefix = directory.rstrip(os.sep) + os.sep
+        for path in [p for p in self._files if p.startswith(prefix)]:
+            del self._files[path]
+        for path in [d for d in self._dirs if d == directory or d.startswith(prefix)]:
+            del self._dirs[path]
+            self._children.pop(path, None)
+            self._ignore_stats.pop(path, None)
+
+    def _rescan_directory(self, dirpath: str) -> None:
+        """Reconcilia el contenido indexado de un directorio con el disco"""
+        if dirpath not in self._dirs:
+            return
+        if not os.path.isdir(dirpath):
+            self._remove_subtree(dirpath)
+            return
+
+        old_dirs, old_files = self._children.get(dirpath, (set(), set()))
+        dirnames, filenames = self.walker.list_directory(dirpath)
+
+        for filename in old_files - set(filenames):
+            self._files.pop(os.path.join(dirpath, filename), None)
+        for dirname in old_dirs - set(dirnames):
+            self._remove_subtree(os.path.join(dirpath, dirname))
+
+        self._record_directory(dirpath, dirnames, filenames)
+
+        for dirname in set(dirnames) - old_dirs:
+            subdir = os.path.join(dirpath, dirname)
+            if not os.path.islink(subdir):
+                self._add_subtree(subdir)
+
+    def _apply_inotify_events(self) -> None:
+        """Convierte los eventos de inotify en directorios a reconciliar"""
+        events = self._inotify.read_events()
+        if not events:
+            return
+
+        dirty: Set[str] = set()
+        for directory, mask, name in events:
+            if mask & _Inotify.IN_Q_OVERFLOW or name in self.walker.ignore_filenames:
+                # Cola desbordada o reglas de exclusión modificadas
+                self._rebuild()
+                return
+            if not directory:
+                continue
+            if mask & (_Inotify.IN_DELETE_SELF | _Inotify.IN_MOVE_SELF):
+                dirty.add(os.path.dirname(directory))
+            else:
+                dirty.add(directory)
+
+        self._reconcile(dirty)
+
+    def _poll_directories(self) -> None:
+        """Sondeo de respaldo: reconcilia los directorios cuyo mtime cambió
+
+        El mtime de un directorio solo cambia al crear, borrar o renombrar
+        entradas; la modificación en sitio de un archivo se refleja en el
+        siguiente reescaneo de su directorio. Los archivos de exclusión se
+        comparan además por su propio (mtime, tamaño), y solo su cambio
+        obliga a reconstruir el índice.
+        """
+        self._last_poll = time.monotonic()
+        dirty = set()
+
+        for dirpath, mtime_ns in list(self._dirs.items()):
+            try:
+                current = os.stat(dirpath).st_mtime_ns
+            except OSError:
+                current = None
+            known_ignores = self._ignore_stats.get(dirpath, {})
+            if current != mtime_ns:
+                dirty.add(dirpath)
+                ignore_filenames = self.walker.ignore_filenames
+            elif known_ignores:
+                ignore_filenames = tuple(known_ignores)
+            else:
+                continue
+
+            if self._stat_ignore_files(dirpath, ignore_filenames) != known_ignores:
+                self._rebuild()
+                return
+
+        self._reconcile(dirty)
+
+    def _reconcile(self, dirty: Set[str]) -> None:
+        """Reescanea los directorios modificados, de los más superficiales a los más profundos"""
+        if not dirty:
+            return
+        for dirpath in sorted(dirty, key=len):
+            self._rescan_directory(dirpath)
+        self._mark_changed()
+
+    def _mark_changed(self) -> None:
+        """Invalida las vistas ordenadas y avanza la generación del índice"""
+        self._sorted_files = None
+        self._sorted_dirs = None
+        self.generation += 1
+
+
+class WorkspaceIndexRegistry:
+    """Registro de índices por raíz, reutilizados durante toda la sesión"""
+
+    def __init__(self, max_indexes: int = 4):
+        self.max_indexes = max_indexes
+        self._indexes: "OrderedDict[str, WorkspaceIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_index(
+        self, path: str, workspace_root: Optional[str] = None
+    ) -> WorkspaceIndex:
+        """Retorna el índice que cubre `path`, creándolo si no existe
+
+        Si `path` está dentro del workspace se indexa el workspace entero, de
+        modo que las consultas sobre subdirectorios comparten un único índice.
+        La primera llamada recorre el árbol completo: desde código asíncrono
+        debe ejecutarse fuera del event loop (asyncio.to_thread).
+        """
+        path = os.path.abspath(path)
+        # Un archivo lo cubre el índice que cubre su directorio
+        directory = path if os.path.isdir(path) else os.path.dirname(path)
+        with self._lock:
+            index = self._indexes.get(path) or self._find(directory)
+            if index is not None:
+                self._indexes.move_to_end(index.root)
+                return index
+
+            if workspace_root is not None:
+                # El índice del workspace se reutiliza o se registra: nunca es
+                # una sonda desechable aunque no cubra `path`
+                workspace_root = os.path.abspath(workspace_root)
+                workspace_index = self._indexes.get(workspace_root)
+                if workspace_index is None:
+                    workspace_index = self._register(WorkspaceIndex(workspace_root))
+                if workspace_index.covers(directory):
+                    self._indexes.move_to_end(workspace_root)
+                    return workspace_index
+
+            # Ruta fuera del workspace o dentro de un directorio ignorado
+            index = self._register(WorkspaceIndex(path))
+            if workspace_root in self._indexes:
+                # Recién consultado: no debe ser el primero en desalojarse
+                self._indexes.move_to_end(workspace_root)
+            return index
+
+    def _register(self, index: WorkspaceIndex) -> WorkspaceIndex:
+        """Registra un índice y cierra los menos recientes por encima del límite"""
+        self._indexes[index.root] = index
+        while len(self._indexes) > self.max_indexes:
+            _, evicted = self._indexes.popitem(last=False)
+            evicted.close()
+        return index
+
+    def find_index(self, path: str) -> Optional[WorkspaceIndex]:
+        """Índice ya construido que cubre `path`, sin crear ninguno nuevo"""
+        path = os.path.abspath(path)
+        with self._lock:
+            return self._find(path)
+
+    def _find(self, path: str) -> Optional[WorkspaceIndex]:
+        """Busca entre los índices registrados y marca el encontrado como reciente"""
+        for root, index in self._indexes.items():
+            if index.covers(path):
+                self._indexes.move_to_end(root)
+                return index
+        return None
+
+    def close_all(self) -> None:
+        """Cierra todos los índices registrados"""
+        with self._lock:
+            for index in self._indexes.values():
+                index.close()
+            self._indexes.clear()
+
+
+# Registro compartido por las herramientas
+workspace_index_registry = WorkspaceIndexRegistry()
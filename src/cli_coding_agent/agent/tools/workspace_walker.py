@@ -0,0 +1,331 @@
+"""
+Recorrido del workspace compartido por todas las herramientas
+
+Sustituye los `os.walk` con listas de exclusión propias de cada herramienta
+por un único recorrido que respeta los archivos `.gitignore` e `.ignore`
+anidados (y `.git/info/exclude`), compila sus patrones una sola vez y poda
+los directorios ignorados antes de descender en ellos.
+"""
+
+import os
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Archivos de reglas de exclusión reconocidos en cada directorio
+DEFAULT_IGNORE_FILENAMES = (".gitignore", ".ignore")
+
+# Directorios que nunca se recorren, haya o no reglas que los excluyan
+DEFAULT_IGNORED_DIRS = frozenset(
+    {
+        ".git",
+        ".svn",
+        ".hg",
+        "node_modules",
+        "__pycache__",
+        "venv",
+        ".venv",
+        ".mypy_cache",
+        ".pytest_cache",
+        ".ruff_cache",
+        ".tox",
+        ".nox",
+    }
+)
+
+
+@dataclass(frozen=True)
+class IgnoreRule:
+    """Patrón compilado de un archivo de exclusión"""
+
+    regex: re.Pattern
+    negated: bool
+    dir_only: bool
+    anchored: bool
+
+    def matches(self, relative_path: str, name: str, is_dir: bool) -> bool:
+        """Indica si la regla aplica a una ruta relativa a su archivo de origen"""
+        if self.dir_only and not is_dir:
+            return False
+        target = relative_path if self.anchored else name
+        return self.regex.fullmatch(target) is not None
+
+
+def _glob_to_regex(pattern: str) -> str:
+    """Traduce un patrón glob de gitignore a una expresión regular"""
+    output = []
+    i, n = 0, len(pattern)
+
+    while i < n:
+        char = pattern[i]
+        if char == "*":
+            j = i
+            while j < n and pattern[j] == "*":
+                j += 1
+            at_segment_start = i == 0 or pattern[i - 1] == "/"
+            at_segment_end = j == n or pattern[j] == "/"
+            if j - i >= 2 and at_segment_start and at_segment_end:
+                if j == n:
+                    output.append(".*")
+                    i = j
+                else:
+                    # "**/" coincide con cero o más directorios
+                    output.append("(?:.*/)?")
+                    i = j + 1
+            else:
+                output.append("[^/]*")
+                i = j
+        elif char == "?":
+            output.append("[^/]")
+            i += 1
+        elif char == "[":
+            j = i + 1
+            if j < n and pattern[j] == "!":
+                j += 1
+            if j < n and pattern[j] == "]":
+                j += 1
+            while j < n and pattern[j] != "]":
+                j += 1
+            if j >= n:
+                output.append(re.escape(char))
+                i += 1
+            else:
+                content = pattern[i + 1 : j].replace("\\", "\\\\")
+                if content.startswith("!"):
+                    content = "^" + content[1:]
+                output.append(f"[{content}]")
+                i = j + 1
+        elif char == "\\" and i + 1 < n:
+            output.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            output.append(re.escape(char))
+            i += 1
+
+    return "".join(output)
+
+
+def parse_ignore_lines(lines: Iterable[str]) -> List[IgnoreRule]:
+    """Convierte las líneas de un archivo de exclusión en reglas compiladas"""
+    rules = []
+
+    for raw_line in lines:
+        line = raw_line.rstrip("\r\n")
+        if not line or line.startswith("#"):
+            continue
+
+        # Los espacios finales se ignoran salvo que estén escapados
+        if not line.endswith("\\ "):
+            line = line.rstrip()
+        if not line:
+            continue
+
+        negated = line.startswith("!")
+        if negated:
+            line = line[1:]
+        elif line.startswith(("\\!", "\\#")):
+            line = line[1:]
+
+        dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        if not line:
+            continue
+
+        anchored = "/" in line
+        line = line.lstrip("/")
+
+        try:
+            regex = re.compile(_glob_to_regex(line))
+        except re.error:
+            continue
+
+        rules.append(IgnoreRule(regex, negated, dir_only, anchored))
+
+    return rules
+
+
+# Reglas compiladas por archivo, invalidadas por (mtime, tamaño)
+_RULES_CACHE: Dict[str, Tuple[int, int, List[IgnoreRule]]] = {}
+
+
+def load_ignore_file(path: str) -> List[IgnoreRule]:
+    """Carga (o recupera de la caché) las reglas de un archivo de exclusión"""
+    try:
+        stat_result = os.stat(path)
+    except OSError:
+        return []
+
+    cached = _RULES_CACHE.get(path)
+    if cached and cached[:2] == (stat_result.st_mtime_ns, stat_result.st_size):
+        return cached[2]
+
+    try:
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            rules = parse_ignore_lines(f)
+    except OSError:
+        rules = []
+
+    _RULES_CACHE[path] = (stat_result.st_mtime_ns, stat_result.st_size, rules)
+    return rules
+
+
+# Lista de (directorio base, reglas) aplicable a un directorio
+RuleStack = Tuple[Tuple[str, List[IgnoreRule]], ...]
+
+
+class WorkspaceWalker:
+    """Recorrido del workspace que respeta las reglas de exclusión"""
+
+    def __init__(
+        self,
+        include_hidden: bool = True,
+        respect_ignore_files: bool = True,
+        ignored_dirs: Iterable[str] = DEFAULT_IGNORED_DIRS,
+        ignore_filenames: Iterable[str] = DEFAULT_IGNORE_FILENAMES,
+    ):
+        self.include_hidden = include_hidden
+        self.respect_ignore_files = respect_ignore_files
+        self.ignored_dirs = frozenset(ignored_dirs)
+        self.ignore_filenames = tuple(ignore_filenames)
+
+    def walk(self, root: str) -> Iterator[Tuple[str, List[str], List[str]]]:
+        """Equivalente a os.walk (topdown) con exclusiones y orden determinista
+
+        Igual que con os.walk, el llamador puede podar la lista de
+        subdirectorios en el sitio para evitar descender en ellos.
+        """
+        root = os.path.abspath(root)
+        stack = [(root, self._ancestor_rules(root))]
+
+        while stack:
+            dirpath, parent_rules = stack.pop()
+            rules = parent_rules + self._directory_rules(dirpath)
+            dirnames, filenames = self._scan_directory(dirpath, rules)
+
+            yield dirpath, dirnames, filenames
+
+            for dirname in reversed(dirnames):
+                subdir = os.path.join(dirpath, dirname)
+                if not os.path.islink(subdir):
+                    stack.append((subdir, rules))
+
+    def iter_files(self, root: str) -> Iterator[str]:
+        """Itera las rutas absolutas de todos los archivos no ignorados"""
+        for dirpath, _, filenames in self.walk(root):
+            for filename in filenames:
+                yield os.path.join(dirpath, filename)
+
+    def list_directory(self, directory: str) -> Tuple[List[str], List[str]]:
+        """Lista un único nivel de un directorio aplicando las exclusiones"""
+        directory = os.path.abspath(directory)
+        rules = self._ancestor_rules(directory) + self._directory_rules(directory)
+        return self._scan_directory(directory, rules)
+
+    def _scan_directory(
+        self, dirpath: str, rules: RuleStack
+    ) -> Tuple[List[str], List[str]]:
+        """Separa las entradas de un directorio en subdirectorios y archivos"""
+        dirnames, filenames = [], []
+
+        try:
+            with os.scandir(dirpath) as entries:
+                for entry in entries:
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+
+                    if self._is_excluded(entry.name, entry.path, is_dir, rules):
+                        continue
+                    (dirnames if is_dir else filenames).append(entry.name)
+        except OSError:
+            pass
+
+        dirnames.sort()
+        filenames.sort()
+        return dirnames, filenames
+
+    def _is_excluded(
+        self, name: str, path: str, is_dir: bool, rules: RuleStack
+    ) -> bool:
+        """Aplica directorios por defecto, ocultos y reglas de exclusión"""
+        if is_dir and name in self.ignored_dirs:
+            return True
+        if not self.include_hidden and name.startswith("."):
+            return True
+        return is_ignored_by_rules(path, name, is_dir, rules)
+
+    def _directory_rules(self, dirpath: str) -> RuleStack:
+        """Reglas definidas por los archivos de exclusión de un directorio"""
+        if not self.respect_ignore_files:
+            return ()
+
+        stack = []
+        for filename in self.ignore_filenames:
+            ignore_path = os.path.join(dirpath, filename)
+            if os.path.isfile(ignore_path):
+                rules = load_ignore_file(ignore_path)
+                if rules:
+                    stack.append((dirpath, rules))
+        return tuple(stack)
+
+    def _ancestor_rules(self, directory: str) -> RuleStack:
+        """Reglas heredadas de los directorios superiores dentro del repositorio"""
+        if not self.respect_ignore_files:
+            return ()
+
+        repo_root = find_repository_root(directory)
+        if repo_root is None:
+            return ()
+
+        stack = []
+        exclude_path = os.path.join(repo_root, ".git", "info", "exclude")
+        exclude_rules = load_ignore_file(exclude_path)
+        if exclude_rules:
+            stack.append((repo_root, exclude_rules))
+
+        # Directorios desde la raíz del repositorio hasta el padre de `directory`
+        ancestors = []
+        current = os.path.dirname(directory)
+        while len(current) >= len(repo_root):
+            ancestors.append(current)
+            if current == repo_root:
+                break
+            current = os.path.dirname(current)
+
+        for ancestor in reversed(ancestors):
+            stack.extend(self._directory_rules(ancestor))
+        return tuple(stack)
+
+
+def is_ignored_by_rules(path: str, name: str, is_dir: bool, rules: RuleStack) -> bool:
+    """Evalúa las reglas en orden: la última que coincide decide"""
+    ignored = False
+
+    for base_dir, base_rules in rules:
+        # `path` siempre cuelga de `base_dir`: basta con recortar el prefijo
+        relative_path = path[len(base_dir.rstrip(os.sep)) + 1 :]
+        if os.sep != "/":
+            relative_path = relative_path.replace(os.sep, "/")
+        for rule in base_rules:
+            if rule.matches(relative_path, name, is_dir):
+                ignored = not rule.negated
+
+    return ignored
+
+
+def find_repository_root(directory: str) -> Optional[str]:
+    """Busca hacia arriba el directorio que contiene `.git`"""
+    current = os.path.abspath(directory)
+    while True:
+        if os.path.exists(os.path.join(current, ".git")):
+            return current
+        parent = os.path.dirname(current)
+        if parent == current:
+            return None
+        current = parent
+
+
+# Recorridos compartidos: completo (listados y búsqueda) y sin ocultos
+workspace_walker = WorkspaceWalker()
+visible_files_walker = WorkspaceWalker(include_hidden=False)
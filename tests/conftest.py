@@ -3,6 +3,45 @@ import os
 import tempfile
 import shutil
 
+from src.cli_coding_agent.agent.tools import file_operations, search_operations
+from src.cli_coding_agent.agent.tools.bm25_index import BM25Index
+from src.cli_coding_agent.agent.tools.content_cache import ContentCache
+from src.cli_coding_agent.agent.tools.definitions_cache import DefinitionsCache
+from src.cli_coding_agent.agent.tools.document_extraction import DocumentCache
+from src.cli_coding_agent.agent.tools.embedding_index import EmbeddingIndex
+from src.cli_coding_agent.agent.tools.symbol_index import SymbolIndex
+from src.cli_coding_agent.agent.tools.trigram_index import TrigramIndex
+
+
+@pytest.fixture(autouse=True)
+def search_index(tmp_path, monkeypatch):
+    """
+    Fixture que aísla los índices de contenido y las cachés de definiciones
+    y de documentos en un directorio temporal para que las pruebas no escriban junto a la base
+    de datos de sesión, y da a cada prueba una caché de contenidos vacía.
+    """
+    db_path = str(tmp_path / "search_index.db")
+    index = TrigramIndex(db_path)
+    ranking_index = BM25Index(db_path)
+    vector_index = EmbeddingIndex(db_path, str(tmp_path / "embeddings.f32"))
+    symbols = SymbolIndex(db_path)
+    cache = DefinitionsCache(str(tmp_path / "definitions_cache.db"))
+    documents = DocumentCache(str(tmp_path / "document_cache.db"))
+    monkeypatch.setattr(search_operations, "trigram_index", index)
+    monkeypatch.setattr(search_operations, "bm25_index", ranking_index)
+    monkeypatch.setattr(search_operations, "embedding_index", vector_index)
+    monkeypatch.setattr(search_operations, "symbol_index", symbols)
+    monkeypatch.setattr(file_operations, "definitions_cache", cache)
+    monkeypatch.setattr(file_operations, "content_cache", ContentCache())
+    monkeypatch.setattr(file_operations.document_extractor, "cache", documents)
+    yield index
+    index.close()
+    ranking_index.close()
+    vector_index.close()
+    symbols.close()
+    cache.close()
+    documents.close()
+
 
 @pytest.fixture
 def temp_dir():
@@ -1,6 +1,8 @@
 import os
 import platform
 
+import pytest
+
 # Importar las herramientas con decorador @tool que envuelven las fragmentadas potentes
 from src.cli_coding_agent.agent.tools.agno_wrappers import (
     system_status,
@@ -10,6 +12,7 @@ from src.cli_coding_agent.agent.tools.agno_wrappers import (
     search_files,
     execute_command,
     attempt_completion,
+    find_definition,
 )
 
 
@@ -263,6 +266,15 @@ class TestSearchFiles:
         # La herramienta puede tener problemas con regex, verificamos que retorna algo válido
         assert len(result) > 0
 
+    def test_search_reports_matching_files(self, test_directory_structure):
+        """Test que el wrapper pasa el patrón a la herramienta y lista coincidencias"""
+        result = _call_tool(
+            search_files, test_directory_structure, "BUSCAR", file_extension=".py"
+        )
+
+        assert "archivo2.py" in result
+        assert "archivo1.txt" not in result
+
     def test_search_pattern_not_found(self, test_directory_structure):
         """Test cuando no se encuentra el patrón"""
         result = _call_tool(
@@ -288,6 +300,16 @@ class TestSearchFiles:
         assert isinstance(result, str)
         assert len(result) > 0
 
+    def test_find_definition_respects_max_results(self, temp_dir):
+        """Test que el wrapper pasa max_results a la búsqueda de definiciones"""
+        for index in range(3):
+            with open(os.path.join(temp_dir, f"modulo{index}.py"), "w") as f:
+                f.write("class Repetida:\n    pass\n")
+
+        result = _call_tool(find_definition, "Repetida", temp_dir, max_results=2)
+
+        assert result.count("class Repetida:") == 2
+
 
 class TestAttemptCompletion:
     """Tests para la herramienta attempt_completion"""
@@ -370,3 +392,46 @@ class TestIntegration:
             attempt_completion, f"Archivo {file_path} creado y verificado exitosamente"
         )
         assert file_path in completion_result
+
+
+class TestToolRuntime:
+    """Tests para el loop persistente compartido por los wrappers"""
+
+    def test_wrappers_reuse_the_same_event_loop(self, sandbox_file_path):
+        """Test que varias llamadas se ejecutan en el mismo loop de fondo"""
+        from src.cli_coding_agent.agent.tools.runtime import tool_runtime
+
+        _call_tool(read_file, sandbox_file_path)
+        first_loop = tool_runtime._loop
+        _call_tool(list_files, ".")
+
+        assert tool_runtime.is_running
+        assert tool_runtime._loop is first_loop
+
+    def test_runtime_restarts_after_shutdown(self, sandbox_file_path):
+        """Test que el runtime se recrea tras el hook de apagado"""
+        from src.cli_coding_agent.agent.tools.runtime import (
+            shutdown_tool_runtime,
+            tool_runtime,
+        )
+
+        shutdown_tool_runtime()
+        assert not tool_runtime.is_running
+
+        result = _call_tool(read_file, sandbox_file_path)
+        assert "def saludar" in result
+        assert tool_runtime.is_running
+
+    def test_named_pools_reject_a_different_configuration(self):
+        """Test que un pool con nombre no se reutiliza con otra configuración"""
+        from src.cli_coding_agent.agent.tools.runtime import ToolRuntime
+
+        runtime = ToolRuntime()
+        pool = runtime.thread_pool("prueba", max_workers=2)
+        try:
+            assert runtime.thread_pool("prueba", max_workers=2) is pool
+            with pytest.raises(ValueError):
+                runtime.thread_pool("prueba", max_workers=3)
+            assert runtime.thread_pool("otro", max_workers=3) is not pool
+        finally:
+            runtime.shutdown()
@@ -0,0 +1,586 @@
+import codecs
+import os
+import stat
+import sys
+
+import pytest
+
+from src.cli_coding_agent.agent.tools import (
+    atomic_write,
+    file_operations,
+    line_index,
+    text_encoding,
+)
+from src.cli_coding_agent.agent.tools.file_operations import (
+    PDF_AVAILABLE,
+    TREE_SITTER_AVAILABLE,
+    ListCodeDefinitionNamesTool,
+    list_code_definition_names_tool,
+    read_file_tool,
+    replace_in_file_tool,
+    write_to_file_tool,
+)
+from src.cli_coding_agent.agent.tools.content_cache import ContentCache
+from src.cli_coding_agent.agent.tools.runtime import run_tool_coroutine
+from src.cli_coding_agent.agent.tools.text_encoding import (
+    ENCODING_SAMPLE_SIZE,
+    detect_encoding,
+)
+
+
+class TestCodeDefinitions:
+    """Tests para la caché e incrementalidad de list_code_definition_names"""
+
+    def test_cached_and_incremental_definitions(self, temp_dir, monkeypatch):
+        """Test que las definiciones se cachean y las ediciones reparsean el árbol previo"""
+        if not TREE_SITTER_AVAILABLE:
+            pytest.skip("tree-sitter no está instalado")
+
+        path = os.path.join(temp_dir, "modulo.py")
+        with open(path, "w") as f:
+            f.write("class Config:\n    pass\n\n\nasync def cargar():\n    pass\n")
+        for tool in (list_code_definition_names_tool, replace_in_file_tool):
+            monkeypatch.setattr(tool, "working_directory", temp_dir)
+
+        result = run_tool_coroutine(
+            list_code_definition_names_tool.execute(path="modulo.py")
+        )
+        assert result.content["modulo.py"] == [
+            {"name": "Config", "type": "class", "line": 1},
+            {"name": "cargar", "type": "function", "line": 5},
+        ]
+
+        parse = list_code_definition_names_tool.parsers["python"].parse
+        old_trees = []
+
+        def tracking_parse(data, old_tree=None):
+            old_trees.append(old_tree)
+            return parse(data, old_tree)
+
+        monkeypatch.setitem(
+            list_code_definition_names_tool.parsers,
+            "python",
+            type("TrackingParser", (), {"parse": staticmethod(tracking_parse)}),
+        )
+        run_tool_coroutine(
+            replace_in_file_tool.execute(
+                path="modulo.py", old_str="cargar", new_str="guardar"
+            )
+        )
+        assert len(old_trees) == 1 and old_trees[0] is not None
+
+        # Con el stat sin cambios se sirve desde la caché, sin parsear
+        cached = file_operations.definitions_cache.get(path)
+        assert [d["name"] for d in cached[3]] == ["Config", "guardar"]
+        result = run_tool_coroutine(list_code_definition_names_tool.execute(path="."))
+        assert result.content["modulo.py"][1]["name"] == "guardar"
+        assert len(old_trees) == 1
+
+    def test_parallel_analysis_matches_sequential(self, temp_dir, monkeypatch):
+        """Test que el análisis en el pool de procesos da el mismo resultado y orden"""
+        for i in range(6):
+            with open(os.path.join(temp_dir, f"modulo_{i}.py"), "w") as f:
+                f.write(f"class Clase{i}:\n    def metodo(self):\n        pass\n")
+        monkeypatch.setattr(
+            list_code_definition_names_tool, "working_directory", temp_dir
+        )
+
+        sequential = run_tool_coroutine(
+            list_code_definition_names_tool.execute(path=".")
+        )
+        file_operations.definitions_cache.close()
+        os.remove(file_operations.definitions_cache.db_path)
+
+        monkeypatch.setattr(file_operations, "DEFINITIONS_PROCESS_THRESHOLD", 1)
+        monkeypatch.setattr(file_operations.os, "cpu_count", lambda: 2)
+        parallel = run_tool_coroutine(list_code_definition_names_tool.execute(path="."))
+
+        assert parallel.metadata["parallel"] and not sequential.metadata["parallel"]
+        assert list(parallel.content.items()) == list(sequential.content.items())
+
+    def test_single_file_is_analysed_once(self, temp_dir, monkeypatch):
+        """Test que al pasar un archivo (no un directorio) se analiza una sola vez"""
+        with open(os.path.join(temp_dir, "modulo.py"), "w") as f:
+            f.write("def uno():\n    pass\n")
+        tool = ListCodeDefinitionNamesTool()
+        monkeypatch.setattr(tool, "working_directory", temp_dir)
+
+        analysed = []
+        analyze_file = tool._analyze_file
+
+        async def counting_analyze_file(file_path):
+            analysed.append(file_path)
+            return await analyze_file(file_path)
+
+        monkeypatch.setattr(tool, "_analyze_file", counting_analyze_file)
+        result = run_tool_coroutine(tool.execute(path="modulo.py"))
+
+        assert result.metadata["files_analyzed"] == 1
+        assert analysed == [os.path.join(temp_dir, "modulo.py")]
+
+    def test_query_extraction_for_compiled_languages(self):
+        """Test que Go, Rust, C y C++ devuelven definiciones anidadas sin límite de profundidad"""
+        if not TREE_SITTER_AVAILABLE:
+            pytest.skip("tree-sitter no está instalado")
+
+        samples = {
+            ".go": "package p\ntype S struct{}\nfunc (s S) M() {}\n",
+            ".rs": "trait T { fn t(&self); }\nfn main() { fn inner() {} }\n",
+            ".c": "struct S { int x; };\nchar *dup(const char *s) { return 0; }\n",
+            ".cpp": "namespace a { class K { void m() {} }; }\nvoid K::n() {}\n",
+        }
+        names = {
+            extension: [
+                (d["name"], d["type"])
+                for d in list_code_definition_names_tool.definitions_for_content(
+                    content, extension
+                )
+            ]
+            for extension, content in samples.items()
+        }
+        assert names == {
+            ".go": [("S", "class"), ("M", "function")],
+            ".rs": [
+                ("T", "class"),
+                ("t", "function"),
+                ("main", "function"),
+                ("inner", "function"),
+            ],
+            ".c": [("S", "class"), ("dup", "function")],
+            ".cpp": [("K", "class"), ("m", "function"), ("K::n", "function")],
+        }
+
+        nested = (
+            "".join("    " * depth + f"def nivel_{depth}():\n" for depth in range(15))
+            + "    " * 15
+            + "pass\n"
+        )
+        definitions = list_code_definition_names_tool.definitions_for_content(
+            nested, ".py"
+        )
+        assert len(definitions) == 15
+
+    def test_grammars_load_lazily_per_language(self):
+        """Test que cada gramática se carga solo al analizar un archivo de su lenguaje"""
+        if not TREE_SITTER_AVAILABLE:
+            pytest.skip("tree-sitter no está instalado")
+
+        tool = ListCodeDefinitionNamesTool()
+        assert tool.parsers == {}
+
+        tool.definitions_for_content("func F() {}\n", ".go")
+        tool.definitions_for_content("package p\nfunc G() {}\n", ".go")
+        tool.definitions_for_content("# sin gramática\n", ".md")
+        assert list(tool.parsers) == ["go"]
+
+    def test_pool_workers_preload_grammars(self, monkeypatch):
+        """Test que el inicializador del pool carga las gramáticas de antemano"""
+        if not TREE_SITTER_AVAILABLE:
+            pytest.skip("tree-sitter no está instalado")
+        monkeypatch.setattr(file_operations, "_worker_definitions_tool", None)
+
+        file_operations._init_definitions_worker()
+
+        tool = file_operations._worker_definitions_tool
+        assert "python" in tool.parsers
+        assert set(tool.parsers) | tool._unavailable_languages == set(
+            file_operations.GRAMMARS
+        )
+
+    def test_concurrent_parsing_shares_parsers_safely(self, temp_dir):
+        """Test que varios hilos pueden parsear con los parsers compartidos"""
+        if not TREE_SITTER_AVAILABLE:
+            pytest.skip("tree-sitter no está instalado")
+        from concurrent.futures import ThreadPoolExecutor
+
+        tool = ListCodeDefinitionNamesTool()
+        source = "".join(f"def funcion_{i}():\n    return {i}\n" for i in range(200))
+        path = os.path.join(temp_dir, "modulo.py")
+        expected = tool.definitions_for_content(source, ".py")
+
+        def parse(i):
+            if i % 2:
+                return tool.symbols_for_content(source, ".py")[0]
+            edited = source + f"# {i}\n" * (i % 5)
+            return tool._definitions_for_bytes(path, edited.encode("utf-8"))
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(parse, range(64)))
+
+        assert len(expected) == 200
+        assert all(result == expected for result in results)
+
+    def test_old_tree_sitter_api_falls_back_to_regex(self, temp_dir, monkeypatch):
+        """Test que sin QueryCursor (tree-sitter < 0.25) no se cachean definiciones vacías"""
+        if not TREE_SITTER_AVAILABLE:
+            pytest.skip("tree-sitter no está instalado")
+        import tree_sitter
+
+        monkeypatch.delattr(tree_sitter, "QueryCursor")
+        tool = ListCodeDefinitionNamesTool()
+        path = os.path.join(temp_dir, "modulo.py")
+        with open(path, "w") as f:
+            f.write("class Config:\n    pass\n")
+
+        definitions = tool._cached_definitions(path)
+
+        assert tool.parsers == {}
+        assert definitions == [{"name": "Config", "type": "class", "line": 1}]
+        definitions, _ = tool.symbols_for_content("def cargar():\n    pass\n", ".py")
+        assert definitions == [{"name": "cargar", "type": "function", "line": 1}]
+
+
+class TestReadFileRanges:
+    """Tests para las lecturas por rango de read_file"""
+
+    def test_line_and_byte_ranges(self, temp_dir, monkeypatch):
+        """Test que los rangos de líneas usan el índice disperso y se invalidan al editar"""
+        # Bloques pequeños para que el rango cruce varias entradas del índice
+        monkeypatch.setattr(line_index, "LINE_INDEX_BLOCK_SIZE", 64)
+        monkeypatch.setattr(line_index, "_SCAN_CHUNK_SIZE", 256)
+        monkeypatch.setattr(read_file_tool, "working_directory", temp_dir)
+        lines = [f"linea {i} " + "x" * (i % 17) for i in range(1, 501)]
+        path = os.path.join(temp_dir, "registro.log")
+        with open(path, "w") as f:
+            f.write("\n".join(lines))
+
+        for start, end in [(1, 1), (37, 120), (499, 500), (498, None)]:
+            result = run_tool_coroutine(
+                read_file_tool.execute(
+                    path="registro.log", start_line=start, end_line=end
+                )
+            )
+            assert result.success
+            assert result.content.rstrip("\n") == "\n".join(lines[start - 1 : end])
+            assert result.metadata["end_line"] == (end or 500)
+
+        result = run_tool_coroutine(
+            read_file_tool.execute(path="registro.log", start_line=501)
+        )
+        assert result.success and result.content == ""
+        assert result.metadata["total_lines"] == 500
+
+        result = run_tool_coroutine(
+            read_file_tool.execute(path="registro.log", offset=6, length=3)
+        )
+        assert result.content == "1 x" and result.metadata["end_offset"] == 9
+        for length in (0, -4):
+            result = run_tool_coroutine(
+                read_file_tool.execute(path="registro.log", offset=6, length=length)
+            )
+            assert not result.success and "length" in result.error
+
+        # Un length sin offset lee desde el principio
+        result = run_tool_coroutine(
+            read_file_tool.execute(path="registro.log", length=7)
+        )
+        assert result.success and result.content == "linea 1"
+        result = run_tool_coroutine(
+            read_file_tool.execute(path="registro.log", start_line=2, length=7)
+        )
+        assert not result.success
+
+        # Al cambiar el archivo el índice cacheado se descarta
+        with open(path, "w") as f:
+            f.write("nueva\n" + "\n".join(lines))
+        os.utime(path, ns=(1, 1))
+        result = run_tool_coroutine(
+            read_file_tool.execute(path="registro.log", start_line=38, end_line=38)
+        )
+        assert result.content == lines[36] + "\n"
+
+
+    def test_byte_ranges_of_utf16_files(self, temp_dir, monkeypatch):
+        """Test que los rangos de bytes en UTF-16 con BOM se alinean y respetan el orden"""
+        monkeypatch.setattr(read_file_tool, "working_directory", temp_dir)
+        for name, codec in (("be.txt", "utf-16-be"), ("le.txt", "utf-16-le")):
+            bom = codecs.BOM_UTF16_BE if codec == "utf-16-be" else codecs.BOM_UTF16_LE
+            with open(os.path.join(temp_dir, name), "wb") as f:
+                f.write(bom + "ABCDEF\n".encode(codec))
+
+            result = run_tool_coroutine(
+                read_file_tool.execute(path=name, offset=3, length=6)
+            )
+            assert result.content == "ABCD"
+            assert result.metadata["start_offset"] == 2
+
+            result = run_tool_coroutine(read_file_tool.execute(path=name, length=6))
+            assert result.content == "AB"
+
+
+class TestEncodingDetection:
+    """Tests para la detección de codificación de read_file"""
+
+    def test_detects_encoding_once_per_file_version(self, temp_dir, monkeypatch):
+        """Test que la codificación se detecta por BOM o muestra y se cachea por stat"""
+        monkeypatch.setattr(read_file_tool, "working_directory", temp_dir)
+        samples = {
+            "utf8.txt": ("añadir €\n".encode("utf-8"), "utf-8"),
+            "bom.txt": (codecs.BOM_UTF8 + "señal\n".encode("utf-8"), "utf-8-sig"),
+            "utf16.txt": ("línea\n".encode("utf-16"), "utf-16"),
+            "utf16le.txt": ("texto plano\n".encode("utf-16-le"), "utf-16-le"),
+            "windows.txt": ("café “citado”\n".encode("cp1252"), "cp1252"),
+        }
+        for name, (data, encoding) in samples.items():
+            with open(os.path.join(temp_dir, name), "wb") as f:
+                f.write(data)
+            assert detect_encoding(data) == encoding
+            result = run_tool_coroutine(read_file_tool.execute(path=name))
+            assert result.content == data.decode(encoding)
+
+        # Un byte no UTF-8 después de la muestra usa el respaldo sin fallar
+        path = os.path.join(temp_dir, "tardio.txt")
+        with open(path, "wb") as f:
+            f.write(b"a" * (ENCODING_SAMPLE_SIZE + 10) + "é".encode("cp1252"))
+        result = run_tool_coroutine(read_file_tool.execute(path="tardio.txt"))
+        assert result.content.endswith("aé")
+
+        # La segunda lectura reutiliza la codificación sin volver a detectarla
+        calls = []
+        monkeypatch.setattr(
+            text_encoding, "detect_encoding", lambda sample: calls.append(sample)
+        )
+        run_tool_coroutine(read_file_tool.execute(path="tardio.txt"))
+        assert calls == []
+
+
+class TestStreamingReads:
+    """Tests para la lectura por trozos de archivos grandes"""
+
+    def test_large_files_are_sampled_with_elision_marker(self, temp_dir, monkeypatch):
+        """Test que un archivo que supera el presupuesto se muestrea por inicio y final"""
+        lines = [f"registro {i}" for i in range(1, 2001)]
+        path = os.path.join(temp_dir, "grande.log")
+        with open(path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+
+        async def collect(**kwargs):
+            return [
+                chunk async for chunk in read_file_tool.stream_text_file(path, **kwargs)
+            ]
+
+        chunks = run_tool_coroutine(collect(budget=1 << 20, chunk_size=100))
+        assert "".join(chunks) == "\n".join(lines) + "\n" and len(chunks) > 100
+
+        chunks = run_tool_coroutine(collect(budget=1000, chunk_size=64))
+        head, marker, tail = "".join(chunks).partition("\n[... ")
+        assert head.splitlines() == lines[: len(head.splitlines())]
+        assert tail.splitlines()[1:] == lines[-len(tail.splitlines()[1:]) :]
+        assert "bytes omitidos" in marker + tail
+        assert len(head) + len(tail) < 1300
+
+        monkeypatch.setattr(file_operations, "READ_BUDGET_BYTES", 1000)
+        monkeypatch.setattr(read_file_tool, "working_directory", temp_dir)
+        result = run_tool_coroutine(read_file_tool.execute(path="grande.log"))
+        assert result.metadata["truncated"] and "bytes omitidos" in result.content
+
+
+class TestContentCache:
+    """Tests para la caché de contenidos de read_file"""
+
+    def test_hot_file_is_read_once_until_written(self, temp_dir, monkeypatch):
+        """Test que las relecturas salen de la caché y las escrituras la invalidan"""
+        for tool in (read_file_tool, write_to_file_tool, replace_in_file_tool):
+            monkeypatch.setattr(tool, "working_directory", temp_dir)
+        with open(os.path.join(temp_dir, "caliente.py"), "w") as f:
+            f.write("valor = 1\n")
+
+        decoded = []
+        decode_file = text_encoding.encoding_detector.decode_file
+        monkeypatch.setattr(
+            text_encoding.encoding_detector,
+            "decode_file",
+            lambda path: decoded.append(path) or decode_file(path),
+        )
+
+        for _ in range(5):
+            result = run_tool_coroutine(read_file_tool.execute(path="caliente.py"))
+            assert result.content == "valor = 1\n"
+        assert len(decoded) == 1
+        stats = result.metadata["content_cache"]
+        assert (stats["hits"], stats["misses"], stats["entries"]) == (4, 1, 1)
+
+        run_tool_coroutine(
+            replace_in_file_tool.execute(path="caliente.py", old_str="1", new_str="2")
+        )
+        result = run_tool_coroutine(read_file_tool.execute(path="caliente.py"))
+        assert result.content == "valor = 2\n" and len(decoded) == 2
+
+        run_tool_coroutine(
+            write_to_file_tool.execute(path="caliente.py", content="valor = 3\n")
+        )
+        result = run_tool_coroutine(read_file_tool.execute(path="caliente.py"))
+        assert result.content == "valor = 3\n" and len(decoded) == 3
+
+    def test_cache_is_bounded_in_bytes(self):
+        """Test que la caché descarta las entradas menos usadas al superar su tamaño"""
+        cache = ContentCache(max_bytes=3 * sys.getsizeof("x" * 100))
+        stat = os.stat(__file__)
+        for name in ("a", "b", "c"):
+            cache.put(name, stat, name * 100)
+        assert cache.get("a", stat) == "a" * 100
+        cache.put("d", stat, "d" * 100)
+        assert cache.get("b", stat) is None and cache.get("a", stat) is not None
+        assert cache.stats()["entries"] == 3
+
+
+class TestDocumentExtraction:
+    """Tests para la extracción de PDFs en el pool de documentos"""
+
+    def test_pdf_pages_are_extracted_by_range_and_cached(self, temp_dir, monkeypatch):
+        """Test que las páginas se extraen por rango y las relecturas salen de la caché"""
+        if not PDF_AVAILABLE:
+            pytest.skip("PyMuPDF/PyPDF2 no están instalados")
+        import fitz
+
+        path = os.path.join(temp_dir, "manual.pdf")
+        with fitz.open() as doc:
+            for number in range(1, 41):
+                doc.new_page().insert_text((72, 72), f"Contenido de la página {number}")
+            doc.save(path)
+        monkeypatch.setattr(read_file_tool, "working_directory", temp_dir)
+
+        extractor = file_operations.document_extractor
+        run_in_pool = extractor._run_in_pool
+        calls = []
+
+        async def counting_run_in_pool(function, *args):
+            calls.append(function.__name__)
+            return await run_in_pool(function, *args)
+
+        monkeypatch.setattr(extractor, "_run_in_pool", counting_run_in_pool)
+
+        result = run_tool_coroutine(
+            read_file_tool.execute(path="manual.pdf", start_page=18, end_page=20)
+        )
+        assert result.content.startswith(
+            "--- Página 18/40 ---\nContenido de la página 18"
+        )
+        assert "página 20" in result.content and "página 21" not in result.content
+        assert calls == ["_pdf_page_count", "_extract_pdf_pages"]
+
+        calls.clear()
+        result = run_tool_coroutine(read_file_tool.execute(path="manual.pdf"))
+        pages = [f"Contenido de la página {n}" for n in range(1, 41)]
+        assert [line for line in result.content.splitlines() if line] == pages
+        # Solo se extraen las páginas que no estaban cacheadas, en lotes
+        assert calls == ["_extract_pdf_pages"] * 3
+
+        calls.clear()
+        run_tool_coroutine(read_file_tool.execute(path="manual.pdf"))
+        assert calls == []
+
+
+class TestAtomicWrites:
+    """Tests para las escrituras atómicas de write_to_file y replace_in_file"""
+
+    def test_writes_preserve_mode_and_line_endings(self, temp_dir, monkeypatch):
+        """Test que se conservan permisos y CRLF y que sin cambios no se escribe"""
+        for tool in (write_to_file_tool, replace_in_file_tool):
+            monkeypatch.setattr(tool, "working_directory", temp_dir)
+        path = os.path.join(temp_dir, "script.sh")
+        with open(path, "wb") as f:
+            f.write(b"echo uno\r\necho dos\r\n")
+        os.chmod(path, 0o750)
+
+        result = run_tool_coroutine(
+            replace_in_file_tool.execute(
+                path="script.sh", old_str="dos", new_str="tres"
+            )
+        )
+        assert result.success and result.metadata["changed"]
+        with open(path, "rb") as f:
+            assert f.read() == b"echo uno\r\necho tres\r\n"
+        assert stat.S_IMODE(os.stat(path).st_mode) == 0o750
+
+        os.utime(path, ns=(1, 1))
+        result = run_tool_coroutine(
+            write_to_file_tool.execute(
+                path="script.sh", content="echo uno\necho tres\n"
+            )
+        )
+        assert not result.metadata["changed"] and os.stat(path).st_mtime_ns == 1
+
+        result = run_tool_coroutine(
+            write_to_file_tool.execute(path="nuevo/modulo.py", content="x = 1\n")
+        )
+        assert result.metadata["created_new"] and result.metadata["changed"]
+
+    def test_failed_write_leaves_original_intact(self, temp_dir, monkeypatch):
+        """Test que un fallo antes del renombrado no trunca el archivo ni deja temporales"""
+        path = os.path.join(temp_dir, "datos.txt")
+        with open(path, "w") as f:
+            f.write("original\n")
+
+        def failing_replace(source, target):
+            raise KeyboardInterrupt
+
+        monkeypatch.setattr(atomic_write.os, "replace", failing_replace)
+        with pytest.raises(KeyboardInterrupt):
+            atomic_write.write_text_atomic(path, "nuevo contenido\n")
+        with open(path) as f:
+            assert f.read() == "original\n"
+        assert os.listdir(temp_dir) == ["datos.txt"]
+
+
+class TestBatchedEdits:
+    """Tests para los reemplazos múltiples de replace_in_file"""
+
+    def test_edits_are_applied_atomically_with_one_write(self, temp_dir, monkeypatch):
+        """Test que los bloques se validan todos antes de escribir una sola vez"""
+        monkeypatch.setattr(replace_in_file_tool, "working_directory", temp_dir)
+        path = os.path.join(temp_dir, "config.py")
+        original = "HOST = 'a'\nPORT = 1\nDEBUG = False\n"
+        with open(path, "w") as f:
+            f.write(original)
+
+        writes = []
+        write_text_atomic = file_operations.write_text_atomic
+        monkeypatch.setattr(
+            file_operations,
+            "write_text_atomic",
+            lambda *args: writes.append(args) or write_text_atomic(*args),
+        )
+
+        edits = [
+            {"old_str": "DEBUG = False", "new_str": "DEBUG = True"},
+            {"old_str": "HOST = 'a'", "new_str": "HOST = 'b'"},
+            {"old_str": "PORT = 1", "new_str": "PORT = 2"},
+        ]
+        result = run_tool_coroutine(
+            replace_in_file_tool.execute(path="config.py", edits=edits)
+        )
+        assert result.success and result.metadata["edits_applied"] == 3
+        assert len(writes) == 1
+        with open(path) as f:
+            assert f.read() == "HOST = 'b'\nPORT = 2\nDEBUG = True\n"
+
+        # Un bloque inválido descarta todos los demás
+        for invalid in (
+            {"old_str": "NO_EXISTE", "new_str": "x"},
+            {"old_str": " = ", "new_str": " := "},
+            {"old_str": "PORT = 2\nDEBUG", "new_str": "x"},
+        ):
+            result = run_tool_coroutine(
+                replace_in_file_tool.execute(
+                    path="config.py",
+                    edits=[{"old_str": "HOST = 'b'\nPORT", "new_str": "y"}, invalid],
+                )
+            )
+            assert not result.success and "bloque 2" in result.error
+        assert len(writes) == 1
+
+    def test_edits_must_be_a_non_empty_list(self, temp_dir, monkeypatch):
+        """Test que edits vacío o que no es una lista se rechaza sin escribir"""
+        monkeypatch.setattr(replace_in_file_tool, "working_directory", temp_dir)
+        path = os.path.join(temp_dir, "config.py")
+        with open(path, "w") as f:
+            f.write("HOST = 'a'\n")
+        mtime_ns = os.stat(path).st_mtime_ns
+
+        for edits in ([], {"old_str": "a", "new_str": "b"}, "HOST"):
+            result = run_tool_coroutine(
+                replace_in_file_tool.execute(path="config.py", edits=edits)
+            )
+            assert not result.success and "lista no vacía" in result.error
+        assert os.stat(path).st_mtime_ns == mtime_ns
@@ -0,0 +1,512 @@
+import json
+import os
+import re
+
+import pytest
+
+from src.cli_coding_agent.agent.tools import search_operations
+from src.cli_coding_agent.agent.tools.embedding_index import (
+    EmbeddingIndex,
+    HashingEmbedder,
+    chunk_source,
+)
+from src.cli_coding_agent.agent.tools.file_classifier import FileClassifier
+from src.cli_coding_agent.agent.tools.runtime import run_tool_coroutine
+from src.cli_coding_agent.agent.tools.trigram_index import build_query
+from src.cli_coding_agent.agent.tools.workspace_index import (
+    WorkspaceIndex,
+    workspace_index_registry,
+)
+from src.cli_coding_agent.agent.tools.search_operations import (
+    _PathTokenIndex,
+    _RipgrepContextCollector,
+    _scan_content,
+    file_search_tool,
+    find_definition_tool,
+    find_references_tool,
+    search_files_tool,
+    search_workspace_files_tool,
+)
+
+
+def _rg_event(event_type, line_number=None, text=None, match=None):
+    """Construye una línea JSON con el formato de salida de ripgrep"""
+    data = {"path": {"text": "/repo/modulo.py"}}
+    if line_number is not None:
+        data.update(
+            {
+                "line_number": line_number,
+                "lines": {"text": text + "\n"},
+                "submatches": [{"match": {"text": match}}] if match else [],
+            }
+        )
+    return (json.dumps({"type": event_type, "data": data}) + "\n").encode()
+
+
+def _trigrams(literal):
+    """Trigramas codificados de un literal, en el orden de build_query"""
+    data = literal.encode()
+    return sorted(
+        {
+            (data[i] << 16) | (data[i + 1] << 8) | data[i + 2]
+            for i in range(len(data) - 2)
+        }
+    )
+
+
+class TestRipgrepContextCollector:
+    """Tests para la asociación de eventos 'context' de ripgrep a coincidencias"""
+
+    def test_overlapping_windows_share_context_lines(self):
+        """Test que dos coincidencias cercanas reciben el mismo contexto que la búsqueda manual"""
+        collector = _RipgrepContextCollector(2, 100, lambda path: "modulo.py")
+        events = [
+            _rg_event("begin"),
+            _rg_event("context", 1, "uno"),
+            _rg_event("match", 2, "dos BUSCAR", "BUSCAR"),
+            _rg_event("context", 3, "tres"),
+            _rg_event("match", 4, "cuatro BUSCAR", "BUSCAR"),
+            _rg_event("context", 5, "cinco"),
+            _rg_event("context", 6, "seis"),
+            _rg_event("end"),
+        ]
+        for event in events:
+            collector.feed(event)
+
+        first, second = collector.finish()
+        assert first["before_context"] == ["uno"]
+        assert first["after_context"] == ["tres", "cuatro BUSCAR"]
+        assert second["before_context"] == ["dos BUSCAR", "tres"]
+        assert second["after_context"] == ["cinco", "seis"]
+
+    def test_completes_after_context_before_stopping(self):
+        """Test que al alcanzar max_results se espera al contexto posterior"""
+        collector = _RipgrepContextCollector(1, 1, lambda path: "modulo.py")
+        collector.feed(_rg_event("begin"))
+        collector.feed(_rg_event("match", 1, "BUSCAR", "BUSCAR"))
+        assert not collector.is_complete
+
+        collector.feed(_rg_event("context", 2, "siguiente"))
+        assert collector.is_complete
+        assert collector.finish()[0]["after_context"] == ["siguiente"]
+
+
+class TestManualSearch:
+    """Tests para el escaneo concurrente de la búsqueda sin ripgrep"""
+
+    @staticmethod
+    def _make_tree(base_dir, files=60):
+        for i in range(files):
+            subdir = os.path.join(base_dir, f"dir{i % 3}")
+            os.makedirs(subdir, exist_ok=True)
+            with open(os.path.join(subdir, f"f{i:02d}.txt"), "w") as f:
+                f.write(f"cabecera\nBUSCAR {i}\npie\n")
+
+    def _search(self, directory, max_results):
+        return run_tool_coroutine(
+            search_files_tool._search_manual(directory, "BUSCAR", "*", 1, max_results)
+        )
+
+    def test_results_follow_sorted_walk_order(self, temp_dir):
+        """Test que el orden no depende de qué worker termina antes"""
+        self._make_tree(temp_dir)
+
+        results = self._search(temp_dir, 1000)
+        files = [
+            os.path.relpath(search_files_tool.get_absolute_path(r["file"]), temp_dir)
+            for r in results
+        ]
+
+        assert len(results) == 60
+        assert files == sorted(files)
+        assert results[0]["before_context"] == ["cabecera"]
+        assert results[0]["after_context"] == ["pie"]
+
+    def test_max_results_truncates_in_order(self, temp_dir):
+        """Test que max_results corta en el mismo orden que la búsqueda completa"""
+        self._make_tree(temp_dir)
+
+        assert self._search(temp_dir, 7) == self._search(temp_dir, 1000)[:7]
+
+    def test_process_pool_matches_thread_results(self, temp_dir, monkeypatch):
+        """Test que el escaneo en procesos produce el mismo resultado"""
+        self._make_tree(temp_dir, files=10)
+        expected = self._search(temp_dir, 1000)
+
+        monkeypatch.setattr(search_operations, "MANUAL_SEARCH_PROCESS_THRESHOLD", 0)
+        monkeypatch.setattr(search_operations.os, "cpu_count", lambda: 2)
+
+        assert self._search(temp_dir, 1000) == expected
+
+
+class TestScanContent:
+    """Tests para el escaneo de una sola pasada sobre el buffer completo"""
+
+    def test_one_result_per_line_with_context(self):
+        """Test que varias coincidencias en una línea producen un único resultado"""
+        content = "uno\r\ndos BUSCAR BUSCAR\r\ntres\r\ncuatro BUSCAR"
+        pattern = re.compile("buscar", re.MULTILINE | re.IGNORECASE)
+
+        results = _scan_content(content, pattern, 1, "archivo.txt")
+
+        assert [r["line_number"] for r in results] == [2, 4]
+        assert results[0]["line_content"] == "dos BUSCAR BUSCAR"
+        assert results[0]["before_context"] == ["uno"]
+        assert results[0]["after_context"] == ["tres"]
+        assert results[1]["after_context"] == []
+
+    def test_non_matching_content_returns_empty(self):
+        """Test que un archivo sin coincidencias no produce resultados"""
+        pattern = re.compile("ausente", re.MULTILINE | re.IGNORECASE)
+
+        assert _scan_content("a\nb\nc\n", pattern, 2, "archivo.txt") == []
+
+    def test_max_matches_stops_scanning(self):
+        """Test que el escaneo se detiene al alcanzar el máximo por archivo"""
+        pattern = re.compile("x", re.MULTILINE | re.IGNORECASE)
+
+        results = _scan_content("x\n" * 50, pattern, 0, "archivo.txt", 3)
+
+        assert [r["line_number"] for r in results] == [1, 2, 3]
+
+    def test_matches_do_not_span_line_breaks(self):
+        """Test que un patrón con \\s+ no une líneas distintas en una coincidencia"""
+        pattern = re.compile(r"uno\s+dos", re.MULTILINE | re.IGNORECASE)
+        content = "uno\ndos\nuno   dos\n"
+
+        results = _scan_content(content, pattern, 0, "archivo.txt")
+
+        assert [r["line_number"] for r in results] == [3]
+        assert results[0]["match_text"] == "uno   dos"
+
+    def test_end_anchor_matches_crlf_lines(self):
+        """Test que '$' coincide al final de las líneas de un archivo CRLF"""
+        pattern = re.compile("foo$", re.MULTILINE | re.IGNORECASE)
+        content = "foo\r\nbar\r\nfoo bar\r\nmas foo\r\n"
+
+        results = _scan_content(content, pattern, 1, "archivo.txt")
+
+        assert [r["line_number"] for r in results] == [1, 4]
+        assert results[0]["line_content"] == "foo"
+        assert results[1]["before_context"] == ["foo bar"]
+
+
+class TestFileClassifier:
+    """Tests para la clasificación compartida de archivos de texto"""
+
+    def test_manual_search_skips_binary_and_denied_files(self, temp_dir):
+        """Test que la búsqueda ignora binarios por contenido y por extensión"""
+        with open(os.path.join(temp_dir, "texto.txt"), "w") as f:
+            f.write("BUSCAR aquí\n")
+        with open(os.path.join(temp_dir, "datos.bin.txt"), "wb") as f:
+            f.write(b"BUSCAR\x00\x01\x02")
+        with open(os.path.join(temp_dir, "imagen.png"), "wb") as f:
+            f.write(b"BUSCAR en metadatos")
+
+        results = run_tool_coroutine(
+            search_files_tool._search_manual(temp_dir, "BUSCAR", "*", 0, 100)
+        )
+
+        assert [os.path.basename(r["file"]) for r in results] == ["texto.txt"]
+
+    def test_verdicts_are_cached_until_file_changes(self, temp_dir):
+        """Test que el veredicto se reutiliza mientras no cambien mtime y tamaño"""
+        classifier = FileClassifier(max_file_size=1024)
+        path = os.path.join(temp_dir, "archivo.dat")
+        with open(path, "wb") as f:
+            f.write(b"\x00binario")
+
+        assert classifier.is_text_file(path) is False
+        assert classifier.precheck(path) is False
+
+        with open(path, "w") as f:
+            f.write("ahora es texto plano")
+        assert classifier.precheck(path) is None
+        assert classifier.is_text_file(path) is True
+
+        with open(path, "w") as f:
+            f.write("x" * 2048)
+        assert classifier.is_text_file(path) is False
+
+
+class TestTrigramIndex:
+    """Tests para la preselección de archivos con el índice de trigramas"""
+
+    def test_query_requires_literal_trigrams(self):
+        """Test de extracción de trigramas obligatorios desde el regex"""
+        assert build_query("ab") is None
+        assert build_query(".*") is None
+        assert build_query("foo|xy") is None
+        assert build_query("def\\s+main") == (
+            "and",
+            [("and", _trigrams("def")), ("and", _trigrams("main"))],
+        )
+        assert build_query("(?:Foo|bar)") == (
+            "or",
+            [("and", _trigrams("foo")), ("and", _trigrams("bar"))],
+        )
+
+    def test_indexed_search_tracks_file_changes(self, temp_dir, search_index):
+        """Test que el índice filtra candidatos y se invalida por archivo"""
+        for i in range(5):
+            with open(os.path.join(temp_dir, f"f{i}.txt"), "w") as f:
+                f.write(f"contenido {i}\n")
+        with open(os.path.join(temp_dir, "binario.dat"), "wb") as f:
+            f.write(b"\x00 palabra_clave")
+
+        # La primera búsqueda no espera al índice: se construye en segundo plano
+        result = run_tool_coroutine(
+            search_files_tool.execute(path=temp_dir, regex="palabra_clave")
+        )
+        assert not result.metadata["used_index"]
+        assert result.metadata["total_matches"] == 0
+        workspace = workspace_index_registry.get_index(temp_dir)
+        assert search_index.wait_until_ready(workspace, timeout=30)
+
+        result = run_tool_coroutine(
+            search_files_tool.execute(path=temp_dir, regex="palabra_clave")
+        )
+        assert result.metadata["used_index"]
+        assert result.metadata["candidate_files"] == 1
+        assert result.metadata["total_matches"] == 0
+
+        with open(os.path.join(temp_dir, "f3.txt"), "a") as f:
+            f.write("Palabra_Clave añadida\n")
+        result = run_tool_coroutine(
+            search_files_tool.execute(path=temp_dir, regex="palabra_clave")
+        )
+        assert result.metadata["candidate_files"] == 2
+        assert "f3.txt" in result.content
+
+        os.remove(os.path.join(temp_dir, "f3.txt"))
+        result = run_tool_coroutine(
+            search_files_tool.execute(path=temp_dir, regex="palabra_clave")
+        )
+        assert result.metadata["candidate_files"] == 1
+
+    def test_indexed_candidates_skip_hidden_files(self, temp_dir, search_index):
+        """Test que el índice caliente no añade archivos ocultos a la búsqueda"""
+        os.makedirs(os.path.join(temp_dir, ".github"))
+        for name in (".env", os.path.join(".github", "ci.yml"), "a.py"):
+            with open(os.path.join(temp_dir, name), "w") as f:
+                f.write("TOKEN_SECRETO = 1\n")
+
+        cold = run_tool_coroutine(
+            search_files_tool.execute(path=temp_dir, regex="TOKEN_SECRETO")
+        )
+        workspace = workspace_index_registry.get_index(temp_dir)
+        assert search_index.wait_until_ready(workspace, timeout=30)
+        warm = run_tool_coroutine(
+            search_files_tool.execute(path=temp_dir, regex="TOKEN_SECRETO")
+        )
+
+        assert warm.metadata["used_index"]
+        assert warm.metadata["candidate_files"] == 1
+        assert warm.metadata["total_matches"] == cold.metadata["total_matches"] == 1
+        assert ".env" not in warm.content and "ci.yml" not in warm.content
+
+
+class TestFileSearch:
+    """Tests para la búsqueda fuzzy de archivos por nombre"""
+
+    def test_duplicate_names_map_to_their_own_paths(self, temp_dir):
+        """Test que archivos con el mismo nombre conservan su propia ruta"""
+        for directory in ("uno", "dos"):
+            os.makedirs(os.path.join(temp_dir, directory))
+            with open(os.path.join(temp_dir, directory, "config.py"), "w") as f:
+                f.write("")
+
+        result = run_tool_coroutine(
+            file_search_tool.execute(query="config", path=temp_dir)
+        )
+
+        assert result.success
+        assert result.metadata["matches_found"] == 2
+        assert os.path.join("dos", "config.py") in result.content
+        assert os.path.join("uno", "config.py") in result.content
+
+
+class TestPathTokenIndex:
+    """Tests para el índice invertido de tokens de rutas"""
+
+    def test_candidates_cover_substring_matches(self):
+        """Test que los candidatos incluyen coincidencias que cruzan separadores"""
+        index = _PathTokenIndex(
+            ["src/file_operations.py", "pkg/ToolResult.java", "docs/readme.md"]
+        )
+
+        assert index.candidates("le_op") == {0}
+        assert index.candidates("lresu") == {1}
+        assert index.candidates("result") == {1}
+        assert index.candidates("ausente") == set()
+        assert index.candidates("_") is None
+
+
+class TestContentRanking:
+    """Tests para el ranking BM25 de search_workspace_files"""
+
+    def test_content_mode_finds_files_by_content(self, temp_dir, monkeypatch):
+        """Test que el modo 'content' encuentra y ordena archivos por su contenido"""
+        files = {
+            "auth.py": "def login(user):\n    return check_password(user)\n",
+            "passwords.py": "# CheckPassword helpers\n" + "check_password()\n" * 5,
+            "misc.py": "print('hola')\n",
+        }
+        for name, content in files.items():
+            with open(os.path.join(temp_dir, name), "w") as f:
+                f.write(content)
+        monkeypatch.setattr(search_workspace_files_tool, "working_directory", temp_dir)
+
+        by_name = run_tool_coroutine(
+            search_workspace_files_tool.execute(query="check", mode="name")
+        )
+        # Mientras el índice BM25 se construye se ordena solo por nombre y ruta
+        cold = run_tool_coroutine(
+            search_workspace_files_tool.execute(query="check", mode="content")
+        )
+        assert not cold.metadata["content_ranked"]
+        workspace = workspace_index_registry.get_index(temp_dir)
+        assert search_operations.bm25_index.wait_until_ready(workspace, timeout=30)
+
+        by_content = run_tool_coroutine(
+            search_workspace_files_tool.execute(query="check", mode="content")
+        )
+
+        assert by_name.metadata["matches_found"] == 0
+        assert by_content.metadata["content_ranked"]
+        assert by_content.content.index("passwords.py") < by_content.content.index(
+            "auth.py"
+        )
+        assert "misc.py" not in by_content.content
+
+
+class TestEmbeddingIndex:
+    """Tests para la recuperación por embeddings de search_workspace_files"""
+
+    def test_only_changed_chunks_are_reembedded(self, temp_dir, tmp_path):
+        """Test que al editar un archivo solo se recalculan sus trozos modificados"""
+        pytest.importorskip("numpy")
+        source = (
+            "import os\n\n"
+            "def parse_config(path):\n    return open(path).read()\n\n"
+            "def render_template(name):\n    return name.upper()\n"
+        )
+        path = os.path.join(temp_dir, "modulo.py")
+        with open(path, "w") as f:
+            f.write(source)
+
+        assert [(c.start_line, c.end_line) for c in chunk_source(source, ".py")] == [
+            (1, 2),
+            (3, 5),
+            (6, 7),
+        ]
+
+        embedded = []
+        embedder = HashingEmbedder(64)
+        original_embed = embedder.embed
+
+        def counting_embed(texts):
+            embedded.extend(texts)
+            return original_embed(texts)
+
+        embedder.embed = counting_embed
+        index = EmbeddingIndex(
+            str(tmp_path / "vectors.db"),
+            str(tmp_path / "vectors.f32"),
+            embedder_factory=lambda: embedder,
+        )
+        workspace = WorkspaceIndex(temp_dir, poll_interval=0, use_inotify=False)
+
+        scores = index.scores(workspace, temp_dir, "parse config")
+        assert list(scores) == [path] and len(embedded) == 4
+
+        embedded.clear()
+        with open(path, "w") as f:
+            f.write(source.replace("name.upper()", "name.lower()"))
+        os.utime(path, ns=(1, 1))
+        assert list(index.scores(workspace, temp_dir, "render template")) == [path]
+        assert embedded == [
+            "def render_template(name):\n    return name.lower()",
+            "render template",
+        ]
+        workspace.close()
+        index.close()
+
+    def test_rolled_back_sync_keeps_referenced_vectors(self, temp_dir, tmp_path):
+        """Test que una sincronización deshecha no borra vectores aún referenciados"""
+        pytest.importorskip("numpy")
+        source = (
+            "def parse_config(path):\n    return open(path).read()\n\n"
+            "def render_template(name):\n    return name.upper()\n"
+        )
+        path = os.path.join(temp_dir, "modulo.py")
+        with open(path, "w") as f:
+            f.write(source)
+
+        embedder = HashingEmbedder(64)
+        index = EmbeddingIndex(
+            str(tmp_path / "vectors.db"),
+            str(tmp_path / "vectors.f32"),
+            embedder_factory=lambda: embedder,
+        )
+        workspace = WorkspaceIndex(temp_dir, poll_interval=0, use_inotify=False)
+        assert list(index.scores(workspace, temp_dir, "render template")) == [path]
+
+        # El trozo editado deja una fila obsoleta y el embedding falla a mitad
+        original_embed = embedder.embed
+
+        def failing_embed(texts):
+            raise RuntimeError("modelo interrumpido")
+
+        embedder.embed = failing_embed
+        with open(path, "w") as f:
+            f.write(source.replace("name.upper()", "name.lower()"))
+        os.utime(path, ns=(1, 1))
+        with pytest.raises(RuntimeError):
+            index.scores(workspace, temp_dir, "render template")
+
+        # Al volver al contenido original se reutilizan las filas de la base
+        embedder.embed = original_embed
+        with open(path, "w") as f:
+            f.write(source)
+        os.utime(path, ns=(2, 2))
+        assert list(index.scores(workspace, temp_dir, "render template")) == [path]
+        workspace.close()
+        index.close()
+
+
+class TestSymbolIndex:
+    """Tests para find_definition y find_references"""
+
+    def test_definitions_and_references_follow_edits(self, temp_dir, monkeypatch):
+        """Test que el índice de símbolos localiza definiciones y referencias"""
+        library = os.path.join(temp_dir, "libreria.py")
+        client = os.path.join(temp_dir, "cliente.py")
+        with open(library, "w") as f:
+            f.write("class Parser:\n    def parse(self):\n        return 1\n")
+        with open(client, "w") as f:
+            f.write("from libreria import Parser\n\nparser = Parser()\n")
+
+        for tool in (find_definition_tool, find_references_tool):
+            monkeypatch.setattr(tool, "working_directory", temp_dir)
+
+        result = run_tool_coroutine(find_definition_tool.execute(symbol="Parser"))
+        assert result.success and result.metadata["matches_found"] == 1
+        assert "libreria.py" in result.content and "class Parser:" in result.content
+
+        result = run_tool_coroutine(find_references_tool.execute(symbol="Parser"))
+        assert result.metadata["matches_found"] == 2
+        assert "cliente.py" in result.content and "libreria.py" not in result.content
+
+        # Las consultas en frío no esperan al índice y dan el mismo resultado
+        workspace = workspace_index_registry.get_index(temp_dir)
+        assert search_operations.symbol_index.wait_until_ready(workspace, timeout=30)
+        indexed = run_tool_coroutine(find_references_tool.execute(symbol="Parser"))
+        assert indexed.content == result.content
+
+        # Tras editar el archivo, el índice se actualiza por mtime
+        with open(client, "w") as f:
+            f.write("import libreria\n")
+        os.utime(client, ns=(1, 1))
+        result = run_tool_coroutine(find_references_tool.execute(symbol="Parser"))
+        assert result.success and result.metadata["matches_found"] == 0
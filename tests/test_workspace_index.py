@@ -0,0 +1,178 @@
+import os
+
+import pytest
+
+from src.cli_coding_agent.agent.tools import file_operations
+from src.cli_coding_agent.agent.tools.file_operations import list_files_tool
+from src.cli_coding_agent.agent.tools.runtime import run_tool_coroutine
+from src.cli_coding_agent.agent.tools.workspace_index import (
+    WorkspaceIndex,
+    WorkspaceIndexRegistry,
+)
+
+
+def _touch(base_dir, relative_path, content=""):
+    path = os.path.join(base_dir, relative_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+
+
+def _indexed_files(index, under=None, include_hidden=True):
+    return [
+        os.path.relpath(entry.path, index.root).replace(os.sep, "/")
+        for entry in index.files(under, include_hidden=include_hidden)
+    ]
+
+
+class TestWorkspaceIndex:
+    """Tests para el índice incremental de archivos del workspace"""
+
+    def test_index_follows_changes(self, temp_dir):
+        """Test que altas, bajas y nuevas reglas de exclusión se reflejan en el índice"""
+        for use_inotify in (True, False):
+            root = os.path.join(temp_dir, f"inotify_{use_inotify}")
+            _touch(root, "src/main.py")
+            _touch(root, "src/util.py", "x")
+            index = WorkspaceIndex(root, poll_interval=0, use_inotify=use_inotify)
+            assert _indexed_files(index) == ["src/main.py", "src/util.py"]
+
+            _touch(root, "src/nuevo/modulo.py")
+            os.remove(os.path.join(root, "src", "util.py"))
+            assert _indexed_files(index) == ["src/main.py", "src/nuevo/modulo.py"]
+
+            _touch(root, ".gitignore", "nuevo/\n")
+            assert _indexed_files(index) == [".gitignore", "src/main.py"]
+            index.close()
+
+    def test_polling_rebuilds_only_when_ignore_file_changes(self, temp_dir):
+        """Test que crear archivos junto a un .gitignore no reconstruye el índice"""
+        _touch(temp_dir, ".gitignore", "build/\n")
+        _touch(temp_dir, "main.py")
+        index = WorkspaceIndex(temp_dir, poll_interval=0, use_inotify=False)
+        index.refresh()
+        rebuilds = []
+        rebuild = index._rebuild
+        index._rebuild = lambda: rebuilds.append(1) or rebuild()
+
+        _touch(temp_dir, "nuevo.py")
+        assert _indexed_files(index) == [".gitignore", "main.py", "nuevo.py"]
+        assert rebuilds == []
+
+        _touch(temp_dir, ".gitignore", "build/\nnuevo.py\n")
+        assert _indexed_files(index) == [".gitignore", "main.py"]
+        assert rebuilds == [1]
+        index.close()
+
+    def test_hidden_filter_and_walk_order(self, temp_dir):
+        """Test que los ocultos se filtran respecto al directorio consultado"""
+        _touch(temp_dir, ".config/ajustes.json")
+        _touch(temp_dir, "b/.env")
+        _touch(temp_dir, "b/z.py")
+        _touch(temp_dir, "a-b.txt")
+        _touch(temp_dir, "a/uno.py")
+        index = WorkspaceIndex(temp_dir)
+
+        assert _indexed_files(index, include_hidden=False) == [
+            "a-b.txt",
+            "a/uno.py",
+            "b/z.py",
+        ]
+        assert _indexed_files(
+            index, os.path.join(temp_dir, ".config"), include_hidden=False
+        ) == [".config/ajustes.json"]
+        assert [os.path.relpath(d, temp_dir) for d, _, _ in index.walk()] == [
+            ".",
+            ".config",
+            "a",
+            "b",
+        ]
+        index.close()
+
+    def test_registry_shares_workspace_index(self, temp_dir):
+        """Test que las consultas sobre subdirectorios reutilizan el índice del workspace"""
+        _touch(temp_dir, "pkg/modulo.py")
+        _touch(temp_dir, "node_modules/lib/index.js")
+        registry = WorkspaceIndexRegistry()
+
+        workspace_index = registry.get_index(temp_dir, temp_dir)
+        assert registry.get_index(os.path.join(temp_dir, "pkg"), temp_dir) is (
+            workspace_index
+        )
+
+        ignored_dir = os.path.join(temp_dir, "node_modules")
+        ignored_index = registry.get_index(ignored_dir, temp_dir)
+        assert ignored_index is not workspace_index
+        assert _indexed_files(ignored_index) == ["lib/index.js"]
+        registry.close_all()
+
+    def test_registry_keeps_workspace_index_for_uncovered_paths(self, temp_dir):
+        """Test que las rutas no cubiertas no reconstruyen ni desalojan el workspace"""
+        _touch(temp_dir, "pkg/modulo.py")
+        for name in ("uno", "dos", "tres"):
+            _touch(temp_dir, f"node_modules/{name}/index.js")
+        registry = WorkspaceIndexRegistry(max_indexes=2)
+
+        workspace_index = registry.get_index(temp_dir, temp_dir)
+        module_path = os.path.join(temp_dir, "pkg", "modulo.py")
+        assert registry.get_index(module_path, temp_dir) is workspace_index
+
+        for name in ("uno", "dos", "tres"):
+            ignored_dir = os.path.join(temp_dir, "node_modules", name)
+            ignored_index = registry.get_index(ignored_dir, temp_dir)
+            assert registry.get_index(ignored_dir, temp_dir) is ignored_index
+            assert registry.find_index(temp_dir) is workspace_index
+        registry.close_all()
+
+    def test_recursive_listing_stops_at_limit_without_index(
+        self, temp_dir, monkeypatch
+    ):
+        """Test que list_files sin índice previo no indexa el árbol entero"""
+        for i in range(30):
+            _touch(temp_dir, f"d{i:02d}/archivo.txt")
+        registry = WorkspaceIndexRegistry()
+        monkeypatch.setattr(file_operations, "workspace_index_registry", registry)
+
+        walked = []
+        walk = file_operations.workspace_walker.walk
+
+        def counting_walk(root):
+            for item in walk(root):
+                walked.append(item[0])
+                yield item
+
+        monkeypatch.setattr(file_operations.workspace_walker, "walk", counting_walk)
+        lazy = run_tool_coroutine(
+            list_files_tool.execute(path=temp_dir, recursive=True, limit=35)
+        )
+        assert lazy.content["truncated"] and lazy.content["total_items"] == 35
+        assert registry.find_index(temp_dir) is None
+        assert len(walked) < 31
+
+        registry.get_index(temp_dir)
+        indexed = run_tool_coroutine(
+            list_files_tool.execute(path=temp_dir, recursive=True, limit=35)
+        )
+        assert indexed.content == lazy.content
+        registry.close_all()
+
+    def test_top_level_listing_matches_index(self, temp_dir, monkeypatch):
+        """Test que el listado de un nivel es igual desde el disco y desde el índice"""
+        _touch(temp_dir, "b.txt", "xyz")
+        _touch(temp_dir, "a/uno.py")
+        _touch(temp_dir, "node_modules/lib.js")
+        registry = WorkspaceIndexRegistry()
+        monkeypatch.setattr(file_operations, "workspace_index_registry", registry)
+
+        from_disk = run_tool_coroutine(list_files_tool.execute(path=temp_dir))
+        registry.get_index(temp_dir)
+        monkeypatch.setattr(
+            file_operations.workspace_walker,
+            "list_directory",
+            lambda directory: pytest.fail("el índice debería servir el listado"),
+        )
+        from_index = run_tool_coroutine(list_files_tool.execute(path=temp_dir))
+
+        assert from_index.content == from_disk.content
+        assert [f["name"] for f in from_index.content["files"]] == ["b.txt"]
+        registry.close_all()
@@ -0,0 +1,71 @@
+import os
+
+from src.cli_coding_agent.agent.tools.workspace_walker import (
+    WorkspaceWalker,
+    parse_ignore_lines,
+)
+
+
+def _touch(base_dir, relative_path, content=""):
+    path = os.path.join(base_dir, relative_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+
+
+def _walk_files(walker, root):
+    return sorted(
+        os.path.relpath(path, root).replace(os.sep, "/")
+        for path in walker.iter_files(root)
+    )
+
+
+class TestWorkspaceWalker:
+    """Tests para el recorrido compartido que respeta .gitignore"""
+
+    def test_nested_gitignore_rules(self, temp_dir):
+        """Test de reglas anidadas, negaciones, anclajes y directorios"""
+        _touch(temp_dir, ".gitignore", "build/\n*.log\n!keep.log\n/top.txt\n")
+        _touch(temp_dir, "pkg/.gitignore", "*.tmp\n!important.tmp\n")
+        for path in [
+            "top.txt",
+            "pkg/top.txt",
+            "debug.log",
+            "keep.log",
+            "build/out.py",
+            "pkg/build/out.py",
+            "pkg/cache.tmp",
+            "pkg/deep/cache.tmp",
+            "pkg/important.tmp",
+            "node_modules/lib/index.js",
+            "src/main.py",
+        ]:
+            _touch(temp_dir, path)
+
+        assert _walk_files(WorkspaceWalker(), temp_dir) == [
+            ".gitignore",
+            "keep.log",
+            "pkg/.gitignore",
+            "pkg/important.tmp",
+            "pkg/top.txt",
+            "src/main.py",
+        ]
+
+    def test_hidden_entries_can_be_excluded(self, temp_dir):
+        """Test que el recorrido sin ocultos omite archivos y directorios con punto"""
+        _touch(temp_dir, ".env", "SECRET=1")
+        _touch(temp_dir, ".config/settings.json")
+        _touch(temp_dir, "visible.py")
+
+        walker = WorkspaceWalker(include_hidden=False)
+
+        assert _walk_files(walker, temp_dir) == ["visible.py"]
+
+    def test_double_star_patterns(self):
+        """Test de traducción de '**' según la semántica de gitignore"""
+        (rule,) = parse_ignore_lines(["src/**/gen_*"])
+
+        assert rule.anchored
+        assert rule.matches("src/gen_a.py", "gen_a.py", False)
+        assert rule.matches("src/x/y/gen_b.py", "gen_b.py", False)
+        assert not rule.matches("lib/gen_c.py", "gen_c.py", False)